@@ -0,0 +1,217 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2015 Christian Zielinski
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""Speed and memory benchmarks of the public portfolio optimization
+functions on synthetic universes of different sizes, in long-only and
+long/short mode, and of importing the package.
+
+Run from the repository root with
+
+    python -m benchmarks.run [--sizes 5 50 500] [--update]
+
+Every benchmark reports the best time per call over several repeats and
+the peak memory allocated during one call (as traced by tracemalloc,
+i.e. NumPy and pandas allocations, but not cvxopt's internal buffers).
+The results are compared against the baselines in baselines.json, and
+the run fails if a benchmark is slower or allocates more memory than
+the given tolerances allow. Use --update to store new baselines after
+intended changes, on the machine the baselines are checked on."""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import timeit
+import tracemalloc
+import warnings
+
+import portfolioopt as pfopt
+
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINES = os.path.join(BENCHMARKS_DIR, 'baselines.json')
+
+SIZES = [5, 50, 500]
+FULL_SIZES = [5, 50, 500, 5000]
+
+
+def benchmarks(num_assets):
+    """
+    Returns (name, function) pairs of all benchmarks for a universe size.
+    Every benchmark gets its own copy of the inputs, so that the results
+    do not depend on the order in which the benchmarks are run.
+    """
+    cov_mat, avg_rets = pfopt.synthetic_moments(num_assets, num_factors=10, seed=0)
+    target_ret = avg_rets.quantile(0.7)
+    weights = pfopt.min_var_portfolio(cov_mat, allow_short=True)
+
+    def case(name, func, *args, **kwargs):
+        args = tuple(arg.copy() for arg in args)
+        return name.format(n=num_assets), lambda: func(*args, **kwargs)
+
+    cases = []
+    for mode, allow_short in [('long_only', False), ('long_short', True)]:
+        cases += [case('markowitz_portfolio[' + mode + ',n={n}]', pfopt.markowitz_portfolio,
+                       cov_mat, avg_rets, target_ret=target_ret, allow_short=allow_short),
+                  case('min_var_portfolio[' + mode + ',n={n}]', pfopt.min_var_portfolio,
+                       cov_mat, allow_short=allow_short),
+                  case('tangency_portfolio[' + mode + ',n={n}]', pfopt.tangency_portfolio,
+                       cov_mat, avg_rets, allow_short=allow_short)]
+
+    # Without pandas' copy-on-write these write into their argument,
+    # so every call gets a fresh copy
+    cases += [case('max_ret_portfolio[n={n}]',
+                   lambda rets: pfopt.max_ret_portfolio(rets.copy()), avg_rets),
+              case('truncate_weights[n={n}]',
+                   lambda weights: pfopt.truncate_weights(weights.copy(),
+                                                          min_weight=0.5 / num_assets),
+                   weights)]
+
+    return cases
+
+
+def measure(func, repeat=3, min_time=0.2):
+    """
+    Returns the best time per call in seconds and the
+    peak memory allocated by a single call in bytes.
+    """
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    if elapsed < min_time:
+        number = max(number, int(number * min_time / elapsed))
+
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return best, peak
+
+
+# Measures the import of the package in a fresh interpreter
+IMPORT_SCRIPT = '''
+import sys, time, tracemalloc
+if sys.argv[1] == 'peakmem':
+    tracemalloc.start()
+start = time.perf_counter()
+import portfolioopt
+elapsed = time.perf_counter() - start
+print(tracemalloc.get_traced_memory()[1] if sys.argv[1] == 'peakmem' else elapsed)
+'''
+
+
+def measure_import(repeat=5):
+    """
+    Returns the best time for "import portfolioopt" in a new
+    process in seconds and the peak memory it allocates in bytes.
+    """
+    def run(quantity):
+        output = subprocess.check_output([sys.executable, '-c', IMPORT_SCRIPT, quantity],
+                                         cwd=os.path.dirname(BENCHMARKS_DIR))
+        return float(output)
+
+    best = min(run('time') for i in range(repeat))
+    return best, int(run('peakmem'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES,
+                        help="universe sizes (default: {})".format(SIZES))
+    parser.add_argument('--full', action='store_true',
+                        help="use the sizes {} (slow)".format(FULL_SIZES))
+    parser.add_argument('--time-tolerance', type=float, default=3.0,
+                        help="allowed slowdown relative to the baseline (default: 3.0)")
+    parser.add_argument('--memory-tolerance', type=float, default=1.5,
+                        help="allowed memory increase relative to the baseline (default: 1.5)")
+    parser.add_argument('--update', action='store_true',
+                        help="store the results as new baselines")
+    args = parser.parse_args(argv)
+
+    sizes = FULL_SIZES if args.full else args.sizes
+
+    if os.path.exists(BASELINES):
+        with open(BASELINES) as f:
+            baselines = json.load(f)
+    else:
+        baselines = {}
+
+    results = {}
+    regressions = []
+
+    print("{:<45} {:>12} {:>12} {:>12} {:>12}".format(
+        "benchmark", "time [ms]", "baseline", "peak [kB]", "baseline"))
+
+    cases = [('import portfolioopt', measure_import)]
+    for num_assets in sizes:
+        cases += [(name, lambda func=func: measure(func))
+                  for name, func in benchmarks(num_assets)]
+
+    for name, run in cases:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            seconds, peak = run()
+
+        results[name] = {'time': seconds, 'peakmem': peak}
+        baseline = baselines.get(name)
+
+        if baseline is None:
+            print("{:<45} {:>12.3f} {:>12} {:>12.1f} {:>12}".format(
+                name, 1e3 * seconds, "-", peak / 1024.0, "-"))
+            continue
+
+        print("{:<45} {:>12.3f} {:>12.3f} {:>12.1f} {:>12.1f}".format(
+            name, 1e3 * seconds, 1e3 * baseline['time'],
+            peak / 1024.0, baseline['peakmem'] / 1024.0))
+
+        if seconds > args.time_tolerance * baseline['time']:
+            regressions.append("{}: {:.3f} ms (baseline {:.3f} ms)".format(
+                name, 1e3 * seconds, 1e3 * baseline['time']))
+
+        if peak > args.memory_tolerance * baseline['peakmem']:
+            regressions.append("{}: {:.1f} kB peak memory (baseline {:.1f} kB)".format(
+                name, peak / 1024.0, baseline['peakmem'] / 1024.0))
+
+    if args.update:
+        baselines.update(results)
+        with open(BASELINES, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print("\nBaselines updated.")
+        return 0
+
+    if regressions:
+        print("\nPerformance regressions:")
+        for regression in regressions:
+            print("  " + regression)
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -28,7 +28,60 @@ variance portfolios and tangency portfolios (i.e. maximum Sharpe ratio
 portfolios) in Python. The construction of long-only, long/short and
 market neutral portfolios is supported."""
 
-from __future__ import absolute_import
+import importlib
 
-from .portfolioopt import *
-from .test_portfolioopt import create_test_data
+
+# Public names and the submodules defining them. Submodules (and thereby
+# pandas and cvxopt) are only imported when one of their names is first
+# used, which keeps "import portfolioopt" fast, e.g. for worker processes.
+_exports = {
+    'markowitz_portfolio': 'portfolioopt',
+    'min_var_portfolio': 'portfolioopt',
+    'tangency_portfolio': 'portfolioopt',
+    'max_ret_portfolio': 'portfolioopt',
+    'truncate_weights': 'portfolioopt',
+    'efficient_frontier': 'portfolioopt',
+    'PortfolioProblem': 'portfolioopt',
+    'SolveResult': 'core',
+    'FactorCovariance': 'covariance',
+    'EWMACovariance': 'covariance',
+    'ledoit_wolf': 'covariance',
+    'ReturnsStore': 'store',
+    'read_returns': 'arrow',
+    'read_covariance': 'arrow',
+    'CriticalLineAlgorithm': 'cla',
+    'batch_portfolios': 'batch',
+    'sweep_portfolios': 'batch',
+    'walk_forward': 'backtest',
+    'AsyncOptimizer': 'aio',
+    'OptimizationServer': 'server',
+    'synthetic_returns': 'synthetic',
+    'synthetic_moments': 'synthetic',
+    'create_test_data': 'synthetic',
+    'QPConstraints': 'solvers',
+    'register_solver': 'solvers',
+    'available_solvers': 'solvers',
+}
+
+_submodules = ['portfolioopt', 'core', 'covariance', 'cla', 'batch',
+               'backtest', 'synthetic', 'solvers', 'store', 'arrow', 'aio', 'server',
+               'test_portfolioopt']
+
+__all__ = sorted(_exports)
+
+
+def __getattr__(name):
+    if name in _exports:
+        module = importlib.import_module('.' + _exports[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+
+    if name in _submodules:
+        return importlib.import_module('.' + name, __name__)
+
+    raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_exports) | set(_submodules))
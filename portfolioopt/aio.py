@@ -0,0 +1,201 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2015 Christian Zielinski
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""asyncio interface to the portfolio optimization functions, running
+the solves in an executor so that they do not block the event loop."""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import os
+
+from . import portfolioopt
+
+
+__all__ = ['AsyncOptimizer']
+
+
+class AsyncOptimizer(object):
+    """
+    Runs the portfolio optimization functions from asyncio code. The
+    solves are offloaded to an executor, while callers exceeding the
+    concurrency limit wait in the event loop instead of piling up in
+    the executor's queue.
+
+    Cancelled or timed out calls which have not started yet are removed
+    from the executor. A solve which is already running cannot be
+    interrupted, it runs to completion and its result is discarded. It
+    keeps occupying its slot until then, so that the limit also bounds
+    the work done in the background.
+
+    Can be used as an asynchronous context manager, which calls
+    close() on exit.
+
+    Parameters
+    ----------
+    max_concurrency: int, optional
+        Maximum number of solves submitted to the executor at a time.
+        Defaults to the number of threads of the default executor,
+        and to no limit if an executor is given.
+    timeout: float, optional
+        Default timeout in seconds of every call, None for no timeout.
+    executor: concurrent.futures.Executor, optional
+        Executor running the solves, e.g. a ProcessPoolExecutor to
+        solve on several CPUs. Defaults to a thread pool owned by
+        the optimizer.
+    """
+
+    def __init__(self, max_concurrency=None, timeout=None, executor=None):
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError("Concurrency limit is not positive")
+
+        self._owns_executor = executor is None
+        if executor is None:
+            if max_concurrency is None:
+                # The default of ThreadPoolExecutor
+                max_concurrency = min(32, (os.cpu_count() or 1) + 4)
+            executor = ThreadPoolExecutor(max_workers=max_concurrency)
+
+        self.executor = executor
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._semaphore = None
+        self._semaphore_loop = None
+        self._closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    async def run(self, func, *args, timeout=None, **kwargs):
+        """
+        Runs func(*args, **kwargs) in the executor.
+
+        Parameters
+        ----------
+        func: callable
+            Function to run, e.g. one of the optimization functions.
+            Must be picklable for a process pool executor.
+        timeout: float, optional
+            Timeout in seconds, overriding the default timeout.
+
+        Returns
+        -------
+        result:
+            The return value of func. Raises asyncio.TimeoutError
+            if the call does not complete within the timeout.
+        """
+        if self._closed:
+            raise ValueError("Optimizer is closed")
+
+        if timeout is None:
+            timeout = self.timeout
+
+        loop = asyncio.get_running_loop()
+        semaphore = self._get_semaphore(loop)
+
+        if semaphore is not None:
+            await semaphore.acquire()
+
+        try:
+            future = self.executor.submit(functools.partial(func, *args, **kwargs))
+        except BaseException:
+            self._release(loop, semaphore)
+            raise
+
+        # The slot is freed once the solve has finished or was cancelled
+        # before it started, not when the caller stops waiting for it
+        future.add_done_callback(lambda future: self._release(loop, semaphore))
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        finally:
+            # No-op if done, removes the call from the executor if not started
+            future.cancel()
+
+    async def markowitz_portfolio(self, cov_mat, exp_rets, target_ret,
+                                  timeout=None, **kwargs):
+        """
+        Computes a Markowitz portfolio, see markowitz_portfolio().
+        Further keyword arguments are passed on.
+        """
+        return await self.run(portfolioopt.markowitz_portfolio, cov_mat, exp_rets,
+                              target_ret, timeout=timeout, **kwargs)
+
+    async def min_var_portfolio(self, cov_mat, timeout=None, **kwargs):
+        """
+        Computes the minimum variance portfolio, see min_var_portfolio().
+        Further keyword arguments are passed on.
+        """
+        return await self.run(portfolioopt.min_var_portfolio, cov_mat,
+                              timeout=timeout, **kwargs)
+
+    async def tangency_portfolio(self, cov_mat, exp_rets, timeout=None, **kwargs):
+        """
+        Computes the tangency portfolio, see tangency_portfolio().
+        Further keyword arguments are passed on.
+        """
+        return await self.run(portfolioopt.tangency_portfolio, cov_mat, exp_rets,
+                              timeout=timeout, **kwargs)
+
+    async def efficient_frontier(self, cov_mat, exp_rets, timeout=None, **kwargs):
+        """
+        Computes portfolios on the efficient frontier, see
+        efficient_frontier(). Further keyword arguments are passed on.
+        """
+        return await self.run(portfolioopt.efficient_frontier, cov_mat, exp_rets,
+                              timeout=timeout, **kwargs)
+
+    def close(self):
+        """
+        Rejects further calls and shuts down an owned executor
+        without waiting for running solves.
+        """
+        self._closed = True
+        if self._owns_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _get_semaphore(self, loop):
+        # Created in the running loop, since before Python 3.10 a semaphore
+        # binds to the event loop current at its creation
+        if self.max_concurrency is None:
+            return None
+
+        if self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+
+        return self._semaphore
+
+    @staticmethod
+    def _release(loop, semaphore):
+        if semaphore is None:
+            return
+
+        try:
+            loop.call_soon_threadsafe(semaphore.release)
+        except RuntimeError:
+            # The event loop is closed
+            pass
@@ -0,0 +1,213 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2015 Christian Zielinski
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""Readers for asset returns and covariance matrices stored in Parquet
+files or Arrow tables. Only the columns of the requested assets are read,
+in groups of columns which are copied straight into float64 (or float32)
+arrays in the layout used by the optimization functions. Requires pyarrow."""
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from .covariance import _BLOCK_ELEMENTS
+
+
+__all__ = ['read_returns',
+           'read_covariance']
+
+
+# Column name pandas uses for an unnamed index
+_PANDAS_INDEX = '__index_level_0__'
+
+
+def read_returns(source, assets=None, index_column=None, dtype=np.float64):
+    """
+    Reads asset returns from a Parquet file or an Arrow table with one
+    column per asset, e.g. as written by DataFrame.to_parquet().
+
+    Parameters
+    ----------
+    source: str, file-like or pyarrow.Table
+        Parquet file or Arrow table.
+    assets: list, optional
+        Assets to read, e.g. the universe being optimized. Defaults
+        to all columns except the index column.
+    index_column: str, optional
+        Column holding the dates. Defaults to the index stored by
+        pandas, if any.
+    dtype: numpy.dtype, optional
+        Type of the returns, e.g. numpy.float32 to halve the memory.
+
+    Returns
+    -------
+    returns: pandas.DataFrame
+        Asset returns with dates as index and assets as columns.
+        Nulls are read as NaN.
+    """
+    reader = _Reader(source, index_column)
+    assets = reader.assets(assets)
+
+    # Column-major, so that every asset is a contiguous column, which
+    # pandas keeps without copying
+    values = np.empty((reader.num_rows, len(assets)), dtype=dtype, order='F')
+
+    for i, column in reader.columns(assets):
+        values[:, i] = column
+
+    return pd.DataFrame(values, index=reader.index(), columns=assets, copy=False)
+
+
+def read_covariance(source, assets=None, index_column=None, dtype=np.float64):
+    """
+    Reads a covariance matrix from a Parquet file or an Arrow table with
+    one column per asset and the assets in an index column, e.g. as
+    written by DataFrame.to_parquet().
+
+    Only the columns of the requested assets are read and restricted
+    to their rows. The matrix is assumed to be symmetric, so that every
+    column can be copied into a contiguous row of the result.
+
+    Parameters
+    ----------
+    source: str, file-like or pyarrow.Table
+        Parquet file or Arrow table.
+    assets: list, optional
+        Assets to read, e.g. the universe being optimized. Defaults
+        to all columns except the index column.
+    index_column: str, optional
+        Column holding the assets. Defaults to the index stored
+        by pandas.
+    dtype: numpy.dtype, optional
+        Type of the covariance matrix, e.g. numpy.float32 to halve the
+        memory. The optimization functions use float32 matrices without
+        copying.
+
+    Returns
+    -------
+    cov_mat: pandas.DataFrame
+        Covariance matrix of the assets.
+    """
+    reader = _Reader(source, index_column)
+    assets = reader.assets(assets)
+
+    if reader.index_column is None:
+        raise ValueError("Covariance matrix has no index column")
+
+    rows = reader.index().get_indexer(assets)
+    if (rows < 0).any():
+        raise ValueError("Assets missing in index of covariance matrix")
+
+    cov_mat = np.empty((len(assets), len(assets)), dtype=dtype)
+
+    for i, column in reader.columns(assets):
+        cov_mat[i] = column[rows]
+
+    return pd.DataFrame(cov_mat, index=assets, columns=assets, copy=False)
+
+
+class _Reader(object):
+    """Reads groups of columns from a Parquet file or an Arrow table."""
+
+    def __init__(self, source, index_column):
+        if pa is None:
+            raise ImportError("Reading Arrow or Parquet data requires pyarrow")
+
+        if isinstance(source, pa.Table):
+            self.table = source
+            self.file = None
+            schema = source.schema
+            self.num_rows = source.num_rows
+        else:
+            self.table = None
+            self.file = pq.ParquetFile(source)
+            schema = self.file.schema_arrow
+            self.num_rows = self.file.metadata.num_rows
+
+        self.range_index = None
+        if index_column is None:
+            # pandas stores a RangeIndex as its start, stop and step
+            # instead of a column
+            metadata = schema.pandas_metadata or {}
+            stored = metadata.get('index_columns', [])
+            if len(stored) == 1 and isinstance(stored[0], str):
+                index_column = stored[0]
+            elif len(stored) == 1 and stored[0].get('kind') == 'range':
+                self.range_index = stored[0]
+        elif index_column not in schema.names:
+            raise ValueError("Index column not found")
+
+        self.index_column = index_column
+        self.names = [name for name in schema.names if name != index_column]
+
+    def assets(self, assets):
+        if assets is None:
+            return pd.Index(self.names)
+
+        assets = pd.Index(assets)
+        if not assets.is_unique:
+            raise ValueError("Assets are not unique")
+
+        if not assets.isin(self.names).all():
+            raise ValueError("Assets missing in columns")
+
+        return assets
+
+    def index(self):
+        if self.range_index is not None:
+            index = pd.RangeIndex(self.range_index['start'], self.range_index['stop'],
+                                  self.range_index['step'], name=self.range_index['name'])
+            # Unless the table was sliced after conversion
+            if len(index) == self.num_rows:
+                return index
+
+        if self.index_column is None:
+            return pd.RangeIndex(self.num_rows)
+
+        index = pd.Index(self._read([self.index_column]).column(0).to_pandas())
+        if self.index_column == _PANDAS_INDEX:
+            index.name = None
+
+        return index
+
+    def columns(self, assets):
+        """Yields the positions and values of the assets' columns."""
+        group_size = max(1, _BLOCK_ELEMENTS // max(1, self.num_rows))
+
+        for start in range(0, len(assets), group_size):
+            table = self._read(list(assets[start:start + group_size]))
+
+            for i, column in enumerate(table.columns):
+                yield start + i, column.to_numpy()
+
+    def _read(self, names):
+        if self.file is not None:
+            return self.file.read(columns=names, use_pandas_metadata=False)
+
+        return self.table.select(names)
@@ -0,0 +1,181 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2015 Christian Zielinski
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""Walk-forward backtests, i.e. optimizing portfolios on rolling windows
+of historical returns. The window moments are updated incrementally
+and every solve is warm-started from the previous window."""
+
+import numpy as np
+import pandas as pd
+
+from .core import PortfolioProblem
+
+
+__all__ = ['walk_forward']
+
+
+def walk_forward(returns, window=250, kind='min_var', target_ret=None,
+                 allow_short=False, step=1, solver='cvxopt', solver_options=None):
+    """
+    Computes portfolios on rolling windows of returns. The covariance
+    matrix and average returns of each window are obtained from the
+    previous window by adding the entering and dropping the leaving
+    rows, which costs O(step*n^2) instead of O(window*n^2) operations
+    per date. Each solve is warm-started from the previous solution.
+
+    Parameters
+    ----------
+    returns: pandas.DataFrame
+        Asset returns with dates as index and assets as columns,
+        e.g. as created by create_test_data(). Missing values are
+        not supported.
+    window: int, optional
+        Number of periods per window.
+    kind: str, optional
+        Kind of portfolio, one of 'min_var', 'markowitz' or 'tangency'.
+    target_ret: float, optional
+        Target return for Markowitz portfolios.
+    allow_short: bool, optional
+        If 'False' construct long-only portfolios.
+        If 'True' allow shorting, i.e. negative weights.
+    step: int, optional
+        Number of periods between two rebalancing dates.
+    solver: str, optional
+        QP solver backend, e.g. 'cvxopt' (default), 'active_set'
+        or 'auto' (see PortfolioProblem).
+    solver_options: dict, optional
+        Options of the solver, e.g. 'abstol', 'reltol', 'feastol',
+        'maxiters' or 'show_progress'.
+
+    Yields
+    ------
+    date: object
+        Last date of the window (inclusive), i.e. the weights only
+        use information available at that date.
+    weights: pandas.Series
+        Optimal asset weights. All weights are NaN if the solver
+        fails, e.g. if the target return is not attainable. As for
+        the other functions, a warning is issued on convergence problems.
+    """
+    if not isinstance(returns, pd.DataFrame):
+        raise ValueError("Returns is not a DataFrame")
+
+    if kind not in ('markowitz', 'min_var', 'tangency'):
+        raise ValueError("Unknown portfolio kind '{}'".format(kind))
+
+    if kind == 'markowitz' and target_ret is None:
+        raise ValueError("Target return is required")
+
+    if not 2 <= window <= len(returns):
+        raise ValueError("Window length is not between 2 and the number of periods")
+
+    if step < 1:
+        raise ValueError("Step is not positive")
+
+    values = np.ascontiguousarray(returns.values, dtype=float)
+    if np.isnan(values).any():
+        raise ValueError("Returns contain missing values")
+
+    moments = _RollingMoments(values[:window])
+    initvals = None
+
+    for end in range(window, len(values) + 1, step):
+        start = end - window
+
+        if end > window:
+            if step < window and moments.updates < 2 * window:
+                moments.drop(values[start - step:start])
+                moments.add(values[end - step:end])
+            else:
+                # Recompute from scratch, so that rounding errors do not accumulate
+                moments.reset(values[start:end])
+
+        problem = PortfolioProblem(moments.cov(),
+                                   moments.mean() if kind != 'min_var' else None,
+                                   allow_short=allow_short, solver=solver,
+                                   solver_options=solver_options)
+
+        try:
+            if kind == 'markowitz':
+                weights, initvals, result = problem.solve(target_ret, initvals=initvals,
+                                                          return_initvals=True,
+                                                          return_result=True)
+            elif kind == 'min_var':
+                weights, initvals, result = problem.min_var(initvals=initvals,
+                                                            return_initvals=True,
+                                                            return_result=True)
+            else:
+                weights, initvals, result = problem.tangency(initvals=initvals,
+                                                             return_initvals=True,
+                                                             return_result=True)
+        except (ValueError, ArithmeticError):
+            # E.g. an unattainable target return
+            weights = np.full(len(returns.columns), np.nan)
+            initvals = None
+        else:
+            if result.status != 'optimal':
+                # Do not start the next window from a bad solution
+                initvals = None
+
+        yield returns.index[end - 1], pd.Series(weights, index=returns.columns)
+
+
+class _RollingMoments(object):
+    """
+    Sample mean and covariance matrix of a rolling window of rows.
+    Sums are kept relative to a shift (the mean of the rows at the
+    last reset) to avoid cancellation.
+    """
+
+    def __init__(self, rows):
+        self.reset(rows)
+
+    def reset(self, rows):
+        self._shift = rows.mean(axis=0)
+        self.updates = 0
+
+        centered = rows - self._shift
+        self._count = len(rows)
+        self._sum = centered.sum(axis=0)
+        self._prod = np.dot(centered.T, centered)
+
+    def add(self, rows):
+        centered = rows - self._shift
+        self._count += len(rows)
+        self._sum += centered.sum(axis=0)
+        self._prod += np.dot(centered.T, centered)
+        self.updates += len(rows)
+
+    def drop(self, rows):
+        centered = rows - self._shift
+        self._count -= len(rows)
+        self._sum -= centered.sum(axis=0)
+        self._prod -= np.dot(centered.T, centered)
+        self.updates += len(rows)
+
+    def mean(self):
+        return self._shift + self._sum / self._count
+
+    def cov(self):
+        mean = self._sum / self._count
+        return (self._prod - self._count * np.outer(mean, mean)) / (self._count - 1)
@@ -0,0 +1,394 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2015 Christian Zielinski
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Batched portfolio optimization, i.e. solving many independent
+portfolio problems (e.g. per desk, region or scenario) or many variants
+of one problem (e.g. a grid of target returns) in parallel."""
+
+import multiprocessing
+from multiprocessing import shared_memory
+import warnings
+
+import numpy as np
+
+from .core import PortfolioProblem
+
+
+__all__ = ['batch_portfolios',
+           'sweep_portfolios']
+
+
+# Inputs shared by all tasks of a worker process, see _init_worker()
+_worker_inputs = None
+
+# Shared arrays and problems of a sweep worker process, see _init_sweep_worker()
+_sweep_state = None
+
+
+def batch_portfolios(cov_mats, exp_rets=None, kind='markowitz', target_ret=None,
+                     allow_short=False, market_neutral=False,
+                     processes=None, chunksize=None, solver='cvxopt',
+                     solver_options=None):
+    """
+    Computes many independent portfolios of the same kind in parallel.
+    The inputs are stacked into contiguous arrays and handed to each
+    worker process once, tasks only carry ranges of problem indices.
+
+    Parameters
+    ----------
+    cov_mats: sequence of pandas.DataFrame or numpy.ndarray
+        Covariance matrices of asset returns, either as a sequence
+        of n x n matrices or as a p x n x n array.
+    exp_rets: sequence of pandas.Series or numpy.ndarray, optional
+        Expected asset returns as a sequence of length n vectors or as
+        a p x n array. Required for Markowitz and tangency portfolios.
+    kind: str, optional
+        Kind of portfolio, one of 'markowitz', 'min_var' or 'tangency'.
+    target_ret: float or sequence of floats, optional
+        Target return(s) for Markowitz portfolios, either one
+        for all problems or one per problem.
+    allow_short: bool, optional
+        If 'False' construct long-only portfolios.
+        If 'True' allow shorting, i.e. negative weights.
+    market_neutral: bool, optional
+        If 'False' sum of weights equals one.
+        If 'True' sum of weights equal zero, i.e. create
+            market neutral portfolios (implies allow_short=True).
+            Only applies to Markowitz portfolios.
+    processes: int, optional
+        Number of worker processes. Defaults to the number of CPUs.
+        If 1, all problems are solved in the calling process.
+    chunksize: int, optional
+        Number of problems per task. Defaults to splitting the
+        problems into about four tasks per worker process.
+    solver: str, optional
+        QP solver backend, e.g. 'cvxopt' (default), 'active_set'
+        or 'auto' (see PortfolioProblem).
+    solver_options: dict, optional
+        Options of the solver, e.g. 'abstol', 'reltol',
+        'feastol', 'maxiters' or 'show_progress'.
+
+    Returns
+    -------
+    weights: numpy.ndarray
+        p x n array of optimal asset weights. Rows of failed
+        problems are set to NaN.
+    status: numpy.ndarray
+        Solver status per problem, either 'optimal', 'unknown'
+        (convergence problem) or 'failed' (exception raised).
+        As for the other functions, a warning is also issued on
+        convergence problems of problems solved in this process.
+    """
+    if kind not in ('markowitz', 'min_var', 'tangency'):
+        raise ValueError("Unknown portfolio kind '{}'".format(kind))
+
+    covs = _stack(cov_mats, 3, "Covariance matrices")
+    p, n = covs.shape[0], covs.shape[1]
+
+    if covs.shape[2] != n:
+        raise ValueError("Covariance matrices are not square")
+
+    if kind != 'min_var':
+        if exp_rets is None:
+            raise ValueError("Expected returns are required")
+
+        rets = _stack(exp_rets, 2, "Expected returns")
+        if rets.shape != (p, n):
+            raise ValueError("Expected returns do not match covariance matrices")
+    else:
+        rets = None
+
+    if kind == 'markowitz':
+        if target_ret is None:
+            raise ValueError("Target returns are required")
+
+        target_rets = np.ascontiguousarray(np.broadcast_to(target_ret, (p,)), dtype=float)
+    else:
+        target_rets = None
+
+    inputs = (covs, rets, target_rets, kind, allow_short, market_neutral,
+              solver, solver_options)
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    if processes == 1 or p <= 1:
+        return _solve_range(inputs, 0, p)[1:]
+
+    if chunksize is None:
+        chunksize = max(1, int(np.ceil(p / (4.0 * processes))))
+
+    ranges = [(start, min(start + chunksize, p)) for start in range(0, p, chunksize)]
+
+    weights = np.empty((p, n))
+    status = np.empty(p, dtype=object)
+
+    pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=(inputs,))
+    try:
+        for start, chunk_weights, chunk_status in pool.imap_unordered(_solve_task, ranges):
+            weights[start:start + len(chunk_status)] = chunk_weights
+            status[start:start + len(chunk_status)] = chunk_status
+    finally:
+        pool.close()
+        pool.join()
+
+    return weights, status
+
+
+def sweep_portfolios(cov_mat, exp_rets, target_rets, settings=((False, False),),
+                     processes=None, chunksize=None, solver='cvxopt',
+                     solver_options=None):
+    """
+    Computes Markowitz portfolios of one covariance matrix and expected
+    returns for a grid of target returns and constraint settings in
+    parallel. The covariance matrix, the expected returns and the result
+    are placed in shared memory, so that worker processes read the inputs
+    and write their weights without pickling. Every worker sets up the
+    problem once per setting and warm-starts the solver along its range
+    of target returns.
+
+    Parameters
+    ----------
+    cov_mat: pandas.DataFrame or numpy.ndarray
+        Covariance matrix of asset returns. A float32 matrix
+        is shared as float32.
+    exp_rets: pandas.Series or numpy.ndarray
+        Expected asset returns (often historical returns).
+    target_rets: sequence of floats
+        Target returns of the portfolios.
+    settings: sequence of (bool, bool), optional
+        Constraint settings as pairs (allow_short, market_neutral),
+        see markowitz_portfolio(). Defaults to long-only portfolios.
+    processes: int, optional
+        Number of worker processes. Defaults to the number of CPUs.
+        If 1, all portfolios are computed in the calling process.
+    chunksize: int, optional
+        Number of target returns per task. Defaults to splitting the
+        grid into about four tasks per worker process.
+    solver: str, optional
+        QP solver backend, e.g. 'cvxopt' (default), 'active_set'
+        or 'auto' (see PortfolioProblem).
+    solver_options: dict, optional
+        Options of the solver, e.g. 'abstol', 'reltol',
+        'feastol', 'maxiters' or 'show_progress'.
+
+    Returns
+    -------
+    weights: numpy.ndarray
+        s x t x n array of optimal asset weights for s settings and
+        t target returns. Rows of failed problems, e.g. for
+        unattainable target returns, are set to NaN.
+    status: numpy.ndarray
+        s x t array of solver status, either 'optimal', 'unknown'
+        (convergence problem) or 'failed' (exception raised).
+    """
+    cov_mat = np.asarray(cov_mat)
+    dtype = np.float32 if cov_mat.dtype == np.float32 else np.float64
+    cov_mat = np.ascontiguousarray(cov_mat, dtype=dtype)
+    exp_rets = np.ascontiguousarray(exp_rets, dtype=float)
+    target_rets = np.ascontiguousarray(target_rets, dtype=float)
+    settings = [(bool(allow_short), bool(market_neutral))
+                for allow_short, market_neutral in settings]
+
+    if cov_mat.ndim != 2 or cov_mat.shape[0] != cov_mat.shape[1]:
+        raise ValueError("Covariance matrix is not square")
+
+    if exp_rets.shape != (len(cov_mat),):
+        raise ValueError("Expected returns do not match covariance matrix")
+
+    if target_rets.ndim != 1:
+        raise ValueError("Target returns are not a sequence")
+
+    s, t, n = len(settings), len(target_rets), len(cov_mat)
+    status = np.empty((s, t), dtype=object)
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    if chunksize is None:
+        chunksize = max(1, int(np.ceil(s * t / (4.0 * processes))))
+
+    tasks = [(i, start, min(start + chunksize, t))
+             for i in range(s) for start in range(0, t, chunksize)]
+
+    if processes == 1 or len(tasks) <= 1:
+        weights = np.empty((s, t, n))
+        state = {'arrays': (cov_mat, exp_rets, target_rets, weights),
+                 'options': (settings, solver, solver_options), 'problems': {}}
+
+        for task in tasks:
+            i, start, task_status = _solve_sweep_range(state, *task)
+            status[i, start:start + len(task_status)] = task_status
+
+        return weights, status
+
+    # Inputs and output in shared memory, the output is left uninitialized
+    layout = [(cov_mat, cov_mat.shape, dtype), (exp_rets, (n,), np.float64),
+              (target_rets, (t,), np.float64), (None, (s, t, n), np.float64)]
+    segments = []
+    try:
+        for i, (array, shape, array_dtype) in enumerate(layout):
+            size = int(np.prod(shape)) * np.dtype(array_dtype).itemsize
+            segments.append(shared_memory.SharedMemory(create=True, size=max(1, size)))
+            if array is not None:
+                _shared_array(segments[-1], shape, array_dtype)[...] = array
+            layout[i] = (segments[-1].name, shape, array_dtype)
+
+        pool = multiprocessing.Pool(processes, initializer=_init_sweep_worker,
+                                    initargs=(layout, (settings, solver, solver_options)))
+        try:
+            for i, start, task_status in pool.imap_unordered(_solve_sweep_task, tasks):
+                status[i, start:start + len(task_status)] = task_status
+        finally:
+            pool.close()
+            pool.join()
+
+        weights = np.array(_shared_array(segments[-1], (s, t, n), np.float64))
+    finally:
+        for segment in segments:
+            segment.close()
+            segment.unlink()
+
+    return weights, status
+
+
+def _stack(values, ndim, name):
+    """
+    Stacks a sequence of pandas objects or arrays into
+    a contiguous float64 array with ndim dimensions.
+    """
+    if isinstance(values, np.ndarray):
+        array = values
+    else:
+        array = np.array([np.asarray(value, dtype=float) for value in values])
+
+    if array.ndim != ndim:
+        raise ValueError("{} have the wrong number of dimensions".format(name))
+
+    return np.ascontiguousarray(array, dtype=float)
+
+
+def _init_worker(inputs):
+    global _worker_inputs
+    _worker_inputs = inputs
+
+
+def _solve_task(bounds):
+    return _solve_range(_worker_inputs, bounds[0], bounds[1])
+
+
+def _solve_range(inputs, start, stop):
+    """
+    Solves the problems start, ..., stop - 1 of the batch.
+    """
+    (covs, rets, target_rets, kind, allow_short, market_neutral,
+     solver, solver_options) = inputs
+    n = covs.shape[1]
+
+    weights = np.empty((stop - start, n))
+    status = np.empty(stop - start, dtype=object)
+
+    for i in range(start, stop):
+        try:
+            problem = PortfolioProblem(covs[i], rets[i] if rets is not None else None,
+                                       allow_short=allow_short,
+                                       market_neutral=market_neutral,
+                                       solver=solver,
+                                       solver_options=solver_options)
+
+            if kind == 'markowitz':
+                weights[i - start], result = problem.solve(target_rets[i], return_result=True)
+            elif kind == 'min_var':
+                weights[i - start], result = problem.min_var(return_result=True)
+            else:
+                weights[i - start], result = problem.tangency(return_result=True)
+
+            status[i - start] = 'optimal' if result.status == 'optimal' else 'unknown'
+        except (ValueError, ArithmeticError):
+            weights[i - start] = np.nan
+            status[i - start] = 'failed'
+
+    return start, weights, status
+
+
+def _shared_array(segment, shape, dtype):
+    return np.ndarray(shape, dtype=dtype, buffer=segment.buf)
+
+
+def _init_sweep_worker(layout, options):
+    global _sweep_state
+
+    # The segments have to stay open as long as the arrays are used
+    segments = [shared_memory.SharedMemory(name=name) for name, shape, dtype in layout]
+    arrays = tuple(_shared_array(segment, shape, dtype)
+                   for segment, (name, shape, dtype) in zip(segments, layout))
+
+    _sweep_state = {'segments': segments, 'arrays': arrays,
+                    'options': options, 'problems': {}}
+
+
+def _solve_sweep_task(task):
+    return _solve_sweep_range(_sweep_state, *task)
+
+
+def _solve_sweep_range(state, i, start, stop):
+    """
+    Solves the target returns start, ..., stop - 1 for setting i,
+    writing the weights into the output array of the sweep.
+    """
+    cov_mat, exp_rets, target_rets, weights = state['arrays']
+    settings, solver, solver_options = state['options']
+
+    status = np.empty(stop - start, dtype=object)
+    initvals = None
+
+    if i not in state['problems']:
+        # Built once per setting and process, sharing the solver matrices
+        allow_short, market_neutral = settings[i]
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            state['problems'][i] = PortfolioProblem(cov_mat, exp_rets,
+                                                    allow_short=allow_short,
+                                                    market_neutral=market_neutral,
+                                                    solver=solver,
+                                                    solver_options=solver_options)
+    problem = state['problems'][i]
+
+    for j in range(start, stop):
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                weights[i, j], initvals, result = problem.solve(target_rets[j],
+                                                                initvals=initvals,
+                                                                return_initvals=True,
+                                                                return_result=True)
+
+            status[j - start] = 'optimal' if result.status == 'optimal' else 'unknown'
+        except (ValueError, ArithmeticError):
+            weights[i, j] = np.nan
+            status[j - start] = 'failed'
+
+        if status[j - start] != 'optimal':
+            # Do not start the next target return from a bad solution
+            initvals = None
+
+    return i, start, status
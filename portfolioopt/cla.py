@@ -0,0 +1,306 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2015 Christian Zielinski
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Critical Line Algorithm (CLA) for long-only mean-variance portfolios.
+
+The long-only efficient frontier is piecewise linear between a finite
+number of turning points, at which an asset enters or leaves the set of
+invested (free) assets. The CLA computes all turning points in a single
+pass, any other frontier portfolio follows by linear interpolation."""
+
+import numpy as np
+import pandas as pd
+
+
+__all__ = ['CriticalLineAlgorithm']
+
+
+class CriticalLineAlgorithm(object):
+    """
+    Computes the exact long-only efficient frontier with the Critical
+    Line Algorithm, i.e. all turning points from the maximum return
+    portfolio down to the minimum variance portfolio. The inverse of the
+    covariance matrix of the free assets is maintained by rank-one
+    updates whenever an asset enters or leaves the free set, so each
+    step costs O(m^2) operations for m free assets.
+
+    Parameters
+    ----------
+    cov_mat: pandas.DataFrame
+        Covariance matrix of asset returns. Must be positive definite.
+    exp_rets: pandas.Series
+        Expected asset returns (often historical returns).
+
+    Attributes
+    ----------
+    turning_points: pandas.DataFrame
+        Asset weights of the turning points, one row per turning
+        point ordered from maximum return to minimum variance.
+    lambdas: numpy.ndarray
+        Risk tolerance parameter at each turning point.
+    rets: numpy.ndarray
+        Expected returns of the turning points.
+    risks: numpy.ndarray
+        Standard deviations of the turning point returns.
+    """
+
+    def __init__(self, cov_mat, exp_rets):
+        if not isinstance(cov_mat, pd.DataFrame):
+            raise ValueError("Covariance matrix is not a DataFrame")
+
+        if not isinstance(exp_rets, pd.Series):
+            raise ValueError("Expected returns is not a Series")
+
+        if not cov_mat.index.equals(exp_rets.index):
+            raise ValueError("Indices do not match")
+
+        self.cov_mat = cov_mat
+        self.exp_rets = exp_rets
+
+        lambdas, values = _critical_line(np.asarray(cov_mat.values, dtype=float),
+                                         np.asarray(exp_rets.values, dtype=float))
+
+        self.turning_points = pd.DataFrame(values, columns=cov_mat.index)
+        self.lambdas = lambdas
+        self.rets = np.dot(values, exp_rets.values)
+        self.risks = np.sqrt(np.maximum((values * np.dot(values, cov_mat.values)).sum(axis=1),
+                                        0.0))
+
+    def weights(self, target_ret):
+        """
+        Computes the frontier portfolio for a target return by
+        interpolating between the neighbouring turning points.
+        Target returns below the return of the minimum variance
+        portfolio yield the minimum variance portfolio.
+
+        Parameters
+        ----------
+        target_ret: float
+            Target return of portfolio.
+
+        Returns
+        -------
+        weights: pandas.Series
+            Optimal asset weights.
+        """
+        if not isinstance(target_ret, float):
+            raise ValueError("Target return is not a float")
+
+        values = self._interpolate(np.array([target_ret]))[0]
+        return pd.Series(values, index=self.cov_mat.index)
+
+    def frontier(self, n_points=20):
+        """
+        Computes portfolios on the efficient frontier for target returns
+        evenly spaced between the return of the minimum variance portfolio
+        and the maximum expected asset return.
+
+        Parameters
+        ----------
+        n_points: int, optional
+            Number of points on the frontier.
+
+        Returns
+        -------
+        weights: pandas.DataFrame
+            Optimal asset weights, one row per point.
+        risks: numpy.ndarray
+            Standard deviations of the portfolio returns.
+        rets: numpy.ndarray
+            Expected portfolio returns.
+        """
+        if n_points < 1:
+            raise ValueError("Number of points is not positive")
+
+        target_rets = np.linspace(self.rets[-1], self.rets[0], n_points)
+        values = self._interpolate(target_rets)
+
+        variances = (values * np.dot(values, self.cov_mat.values)).sum(axis=1)
+
+        weights = pd.DataFrame(values, columns=self.cov_mat.index)
+        risks = np.sqrt(np.maximum(variances, 0.0))
+        rets = np.dot(values, self.exp_rets.values)
+        return weights, risks, rets
+
+    def _interpolate(self, target_rets):
+        """
+        Interpolates the turning points linearly in the return,
+        which is exact as both the weights and the return are
+        linear in lambda between two turning points.
+        """
+        if (target_rets > self.rets[0] * (1 + 1e-12) + 1e-15).any():
+            raise ValueError("Target return is not attainable")
+
+        values = self.turning_points.values
+
+        # Turning point returns are decreasing, search in reversed order
+        rets = self.rets[::-1]
+        pos = np.searchsorted(rets, target_rets)
+
+        result = np.empty((len(target_rets), values.shape[1]))
+        for i, (target_ret, k) in enumerate(zip(target_rets, pos)):
+            if k == 0:
+                # Below the minimum variance return
+                result[i] = values[-1]
+            elif k == len(rets):
+                result[i] = values[0]
+            else:
+                # Segment between turning points lo and hi = lo - 1
+                lo = len(rets) - k
+                hi = lo - 1
+                t = (target_ret - self.rets[lo]) / (self.rets[hi] - self.rets[lo])
+                result[i] = values[lo] + t * (values[hi] - values[lo])
+
+        return result
+
+
+def _critical_line(cov, mu, tol=1e-12):
+    """
+    Computes the turning points of the long-only frontier of
+    minimize 1/2*w^T*cov*w - lam*mu^T*w subject to sum(w) = 1, w >= 0.
+
+    On the free set F the solution is w_F = a + lam*b with
+
+        a = S*1 / (1^T*S*1)
+        b = S*mu_F - a * (1^T*S*mu_F)
+
+    where S is the inverse of cov_FF. Returns the lambdas and the
+    weights of the turning points.
+    """
+    n = len(mu)
+
+    # Start with the maximum return asset. If several assets share the
+    # maximum return, start with their long-only minimum variance mix,
+    # which is the final turning point of the frontier of the tied assets
+    # for any distinct returns.
+    tied = np.flatnonzero(mu >= mu.max() - tol)
+    if len(tied) == 1:
+        free = [int(tied[0])]
+    else:
+        tied_weights = _critical_line(cov[np.ix_(tied, tied)],
+                                      -np.arange(len(tied), dtype=float), tol)[1][-1]
+        free = [int(j) for j in tied[tied_weights > tol]]
+    S = np.linalg.inv(cov[np.ix_(free, free)])
+
+    lam = np.inf
+    lambdas = []
+    weights = []
+
+    last_moved = None
+
+    while True:
+        ones = np.ones(len(free))
+        S1 = np.dot(S, ones)
+        Smu = np.dot(S, mu[free])
+        s11 = S1.sum()
+
+        a = S1 / s11
+        b = Smu - a * Smu.sum()
+
+        # Budget multiplier gamma = g0 + lam*g1
+        g0 = 1.0 / s11
+        g1 = -Smu.sum() / s11
+
+        next_lam = 0.0
+        action = None
+
+        # A free asset leaves when its weight reaches zero
+        candidates = _event_lambdas(a, b, np.array(free) != last_moved, tol)
+        i = np.argmax(candidates)
+        if next_lam < candidates[i] < lam:
+            next_lam, action = candidates[i], ('remove', i)
+
+        # A bounded asset enters when its multiplier reaches zero
+        bounded = np.setdiff1d(np.arange(n), free)
+        if len(bounded):
+            cov_BF = cov[np.ix_(bounded, free)]
+            c = np.dot(cov_BF, a) - g0
+            d = np.dot(cov_BF, b) - mu[bounded] - g1
+
+            candidates = _event_lambdas(c, d, bounded != last_moved, tol)
+            j = np.argmax(candidates)
+            if next_lam < candidates[j] < lam:
+                next_lam, action = candidates[j], ('add', bounded[j])
+
+        # Turning point at next_lam (the minimum variance portfolio if 0)
+        w = np.zeros(n)
+        w[free] = a + next_lam * b
+        lambdas.append(next_lam)
+        weights.append(w)
+
+        if action is None:
+            break
+
+        lam = next_lam
+
+        if action[0] == 'remove':
+            p = action[1]
+            last_moved = free.pop(p)
+            S = _remove_from_inverse(S, p)
+        else:
+            j = action[1]
+            S = _add_to_inverse(S, cov[np.ix_(free, [j])].ravel(), cov[j, j])
+            free.append(j)
+            last_moved = j
+
+    return np.array(lambdas), np.array(weights)
+
+
+def _event_lambdas(c, d, allowed, tol):
+    """
+    Returns the lambdas at which c + lam*d reaches zero from above
+    while lambda decreases, or -inf where this does not happen.
+    """
+    valid = allowed & (d > tol)
+    candidates = np.full(len(c), -np.inf)
+    candidates[valid] = -c[valid] / d[valid]
+    return candidates
+
+
+def _add_to_inverse(S, cov_Fj, cov_jj):
+    """
+    Updates S = inv(cov_FF) to the inverse of the covariance
+    matrix with asset j appended to the free set.
+    """
+    u = np.dot(S, cov_Fj)
+    schur = cov_jj - np.dot(cov_Fj, u)
+
+    if schur <= 0.0:
+        raise ValueError("Covariance matrix is not positive definite")
+
+    m = len(u)
+    S_new = np.empty((m + 1, m + 1))
+    S_new[:m, :m] = S + np.outer(u, u) / schur
+    S_new[:m, m] = -u / schur
+    S_new[m, :m] = -u / schur
+    S_new[m, m] = 1.0 / schur
+    return S_new
+
+
+def _remove_from_inverse(S, p):
+    """
+    Updates S = inv(cov_FF) to the inverse of the covariance
+    matrix with the asset at position p removed from the free set.
+    """
+    keep = np.arange(len(S)) != p
+    col = S[keep, p]
+    return S[np.ix_(keep, keep)] - np.outer(col, col) / S[p, p]
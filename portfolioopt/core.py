@@ -0,0 +1,992 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2015 Christian Zielinski
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""NumPy core of the portfolio optimization functions.
+
+The functions and the PortfolioProblem class of this module work on
+plain float64 arrays instead of pandas objects. They perform only
+shape checks, hand contiguous arrays to the solvers without further
+copies and return the solutions as arrays, which makes them suitable
+for solving many small problems in tight loops. The pandas functions
+of the package are thin wrappers around this module."""
+
+from collections import namedtuple
+import time
+
+import numpy as np
+import cvxopt as opt
+import cvxopt.solvers as optsolvers
+import cvxopt.lapack as optlapack
+import cvxopt.blas as optblas
+import warnings
+
+from .covariance import FactorCovariance, _woodbury_solver
+from .solvers import QPConstraints, _get_solver, _resolve_solver
+
+
+__all__ = ['markowitz_portfolio',
+           'min_var_portfolio',
+           'tangency_portfolio',
+           'efficient_frontier',
+           'PortfolioProblem',
+           'SolveResult']
+
+
+def markowitz_portfolio(cov_mat, exp_rets, target_ret,
+                        allow_short=False, market_neutral=False,
+                        initvals=None, return_initvals=False,
+                        return_result=False, solver='cvxopt',
+                        solver_options=None):
+    """
+    Computes a Markowitz portfolio.
+
+    Parameters
+    ----------
+    cov_mat: numpy.ndarray or FactorCovariance
+        n x n covariance matrix of asset returns.
+    exp_rets: numpy.ndarray
+        Expected asset returns (often historical returns).
+    target_ret: float
+        Target return of portfolio.
+    allow_short: bool, optional
+        If 'False' construct long-only portfolios.
+        If 'True' allow shorting, i.e. negative weights.
+    market_neutral: bool, optional
+        If 'False' sum of weights equals one.
+        If 'True' sum of weights equal zero, i.e. create
+            market neutral portfolios (implies allow_short=True).
+    initvals: numpy.ndarray or dict, optional
+        Initial values to warm-start the solver. Either the weights
+        of a previous solution or the primal/dual solution returned
+        by a previous call with return_initvals=True.
+    return_initvals: bool, optional
+        If 'True' also return the primal/dual solution, which can be
+        used to warm-start the next call.
+    return_result: bool, optional
+        If 'True' also return a SolveResult with the solver status,
+        iterations, duality gap, residuals and timings.
+    solver: str, optional
+        QP solver backend, e.g. 'cvxopt' (default), 'active_set'
+        or 'auto' (see PortfolioProblem).
+    solver_options: dict, optional
+        Options of the solver for this call, e.g. 'abstol',
+        'reltol', 'feastol', 'maxiters' or 'show_progress'.
+
+    Returns
+    -------
+    weights: numpy.ndarray
+        Optimal asset weights.
+    initvals: dict
+        Primal/dual solution with keys 'x', 's', 'y' and 'z'
+        (only returned if return_initvals=True).
+    result: SolveResult
+        Diagnostics of the solve (only returned if return_result=True).
+    """
+    problem = PortfolioProblem(cov_mat, exp_rets, allow_short=allow_short,
+                               market_neutral=market_neutral,
+                               solver=solver, solver_options=solver_options)
+    return problem.solve(target_ret, initvals=initvals,
+                         return_initvals=return_initvals,
+                         return_result=return_result)
+
+
+def min_var_portfolio(cov_mat, allow_short=False,
+                      initvals=None, return_initvals=False,
+                      return_result=False, solver='cvxopt',
+                      solver_options=None):
+    """
+    Computes the minimum variance portfolio.
+
+    Parameters
+    ----------
+    cov_mat: numpy.ndarray or FactorCovariance
+        n x n covariance matrix of asset returns.
+    allow_short: bool, optional
+        If 'False' construct long-only portfolios.
+        If 'True' allow shorting, i.e. negative weights.
+    initvals: numpy.ndarray or dict, optional
+        Initial values to warm-start the solver. Either the weights
+        of a previous solution or the primal/dual solution returned
+        by a previous call with return_initvals=True.
+    return_initvals: bool, optional
+        If 'True' also return the primal/dual solution, which can be
+        used to warm-start the next call.
+    return_result: bool, optional
+        If 'True' also return a SolveResult with the solver status,
+        iterations, duality gap, residuals and timings.
+    solver: str, optional
+        QP solver backend, e.g. 'cvxopt' (default), 'active_set'
+        or 'auto' (see PortfolioProblem).
+    solver_options: dict, optional
+        Options of the solver for this call, e.g. 'abstol',
+        'reltol', 'feastol', 'maxiters' or 'show_progress'.
+
+    Returns
+    -------
+    weights: numpy.ndarray
+        Optimal asset weights.
+    initvals: dict
+        Primal/dual solution with keys 'x', 's', 'y' and 'z'
+        (only returned if return_initvals=True).
+    result: SolveResult
+        Diagnostics of the solve (only returned if return_result=True).
+    """
+    problem = PortfolioProblem(cov_mat, allow_short=allow_short,
+                               solver=solver, solver_options=solver_options)
+    return problem.min_var(initvals=initvals, return_initvals=return_initvals,
+                           return_result=return_result)
+
+
+def tangency_portfolio(cov_mat, exp_rets, allow_short=False,
+                       initvals=None, return_initvals=False,
+                       return_result=False, solver='cvxopt',
+                       solver_options=None):
+    """
+    Computes a tangency portfolio, i.e. a maximum Sharpe ratio portfolio.
+
+    Parameters
+    ----------
+    cov_mat: numpy.ndarray or FactorCovariance
+        n x n covariance matrix of asset returns.
+    exp_rets: numpy.ndarray
+        Expected asset returns (often historical returns).
+    allow_short: bool, optional
+        If 'False' construct long-only portfolios.
+        If 'True' allow shorting, i.e. negative weights.
+    initvals: numpy.ndarray or dict, optional
+        Initial values to warm-start the solver. Either the weights
+        of a previous solution or the primal/dual solution returned
+        by a previous call with return_initvals=True.
+    return_initvals: bool, optional
+        If 'True' also return the primal/dual solution, which can be
+        used to warm-start the next call.
+    return_result: bool, optional
+        If 'True' also return a SolveResult with the solver status,
+        iterations, duality gap, residuals and timings.
+    solver: str, optional
+        QP solver backend, e.g. 'cvxopt' (default), 'active_set'
+        or 'auto' (see PortfolioProblem).
+    solver_options: dict, optional
+        Options of the solver for this call, e.g. 'abstol',
+        'reltol', 'feastol', 'maxiters' or 'show_progress'.
+
+    Returns
+    -------
+    weights: numpy.ndarray
+        Optimal asset weights.
+    initvals: dict
+        Primal/dual solution with keys 'x', 's', 'y' and 'z'
+        (only returned if return_initvals=True).
+    result: SolveResult
+        Diagnostics of the solve (only returned if return_result=True).
+    """
+    problem = PortfolioProblem(cov_mat, exp_rets, allow_short=allow_short,
+                               solver=solver, solver_options=solver_options)
+    return problem.tangency(initvals=initvals, return_initvals=return_initvals,
+                            return_result=return_result)
+
+
+def efficient_frontier(cov_mat, exp_rets, n_points=20, allow_short=False,
+                       solver='cvxopt', solver_options=None):
+    """
+    Computes portfolios on the efficient frontier for target returns
+    evenly spaced between the return of the minimum variance portfolio
+    and the maximum expected asset return.
+
+    Parameters
+    ----------
+    cov_mat: numpy.ndarray or FactorCovariance
+        n x n covariance matrix of asset returns.
+    exp_rets: numpy.ndarray
+        Expected asset returns (often historical returns).
+    n_points: int, optional
+        Number of points on the frontier.
+    allow_short: bool, optional
+        If 'False' construct long-only portfolios.
+        If 'True' allow shorting, i.e. negative weights.
+    solver: str, optional
+        QP solver backend, e.g. 'cvxopt' (default), 'active_set'
+        or 'auto' (see PortfolioProblem).
+    solver_options: dict, optional
+        Options of the solver for this call, e.g. 'abstol',
+        'reltol', 'feastol', 'maxiters' or 'show_progress'.
+
+    Returns
+    -------
+    weights: numpy.ndarray
+        n_points x n array of optimal asset weights.
+    risks: numpy.ndarray
+        Standard deviations of the portfolio returns.
+    rets: numpy.ndarray
+        Expected portfolio returns.
+    """
+    problem = PortfolioProblem(cov_mat, exp_rets, allow_short=allow_short,
+                               solver=solver, solver_options=solver_options)
+    return problem.frontier(n_points)
+
+
+class PortfolioProblem(object):
+    """
+    Portfolio optimization problem for a fixed covariance matrix and
+    fixed expected returns. The solver matrices (and, for long/short
+    portfolios, the Cholesky factorization of the covariance matrix)
+    are built on first use and shared by all subsequent solves. This
+    makes repeated optimizations, e.g. for many target returns, much
+    cheaper than repeated calls of markowitz_portfolio().
+
+    Parameters
+    ----------
+    cov_mat: numpy.ndarray or FactorCovariance
+        n x n covariance matrix of asset returns. Contiguous
+        float64 or float32 arrays are used without copying, float32
+        matrices are promoted to float64 only within the solver.
+    exp_rets: numpy.ndarray, optional
+        Expected asset returns (often historical returns).
+        Required by solve() and tangency().
+    allow_short: bool, optional
+        If 'False' construct long-only portfolios.
+        If 'True' allow shorting, i.e. negative weights.
+    market_neutral: bool, optional
+        If 'False' sum of weights equals one.
+        If 'True' sum of weights equal zero, i.e. create
+            market neutral portfolios (implies allow_short=True).
+            Only applies to solve().
+    solver: str, optional
+        QP solver backend, 'cvxopt' (interior point), 'active_set'
+        (dense active-set method in pure NumPy, fast for small
+        problems), any name registered via register_solver() or
+        'auto' to choose by problem size.
+    solver_options: dict, optional
+        Options of the solver, e.g. 'abstol', 'reltol', 'feastol',
+        'maxiters' or 'show_progress' for cvxopt. The global
+        cvxopt.solvers.options are neither used nor modified.
+    """
+
+    def __init__(self, cov_mat, exp_rets=None,
+                 allow_short=False, market_neutral=False,
+                 solver='cvxopt', solver_options=None):
+        self._factor_model = isinstance(cov_mat, FactorCovariance)
+
+        if not self._factor_model:
+            cov_mat = np.asarray(cov_mat)
+            dtype = np.float32 if cov_mat.dtype == np.float32 else np.float64
+            cov_mat = np.ascontiguousarray(cov_mat, dtype=dtype)
+
+            if cov_mat.ndim != 2 or cov_mat.shape[0] != cov_mat.shape[1]:
+                raise ValueError("Covariance matrix is not square")
+
+        if exp_rets is not None:
+            exp_rets = np.ascontiguousarray(exp_rets, dtype=np.float64)
+
+            if exp_rets.shape != (len(cov_mat),):
+                raise ValueError("Expected returns do not match covariance matrix")
+
+        if market_neutral and not allow_short:
+            warnings.warn("A market neutral portfolio implies shorting")
+            allow_short = True
+
+        self.cov_mat = cov_mat
+        self.exp_rets = exp_rets
+        self.allow_short = allow_short
+        self.market_neutral = market_neutral
+
+        self.solver = solver
+        self.solver_options = {'show_progress': False}
+        if solver_options is not None:
+            self.solver_options.update(solver_options)
+
+        self._cache = {}
+
+    def solve(self, target_ret, initvals=None, return_initvals=False,
+              return_result=False):
+        """
+        Computes the Markowitz portfolio for a target return.
+
+        Parameters
+        ----------
+        target_ret: float
+            Target return of portfolio.
+        initvals: numpy.ndarray or dict, optional
+            Initial values to warm-start the solver. Either the weights
+            of a previous solution or the primal/dual solution returned
+            by a previous call with return_initvals=True.
+        return_initvals: bool, optional
+            If 'True' also return the primal/dual solution, which can be
+            used to warm-start the next call.
+        return_result: bool, optional
+            If 'True' also return a SolveResult with the solver status,
+            iterations, duality gap, residuals and timings.
+
+        Returns
+        -------
+        weights: numpy.ndarray
+            Optimal asset weights.
+        initvals: dict
+            Primal/dual solution with keys 'x', 's', 'y' and 'z'
+            (only returned if return_initvals=True).
+        result: SolveResult
+            Diagnostics of the solve (only returned if return_result=True).
+        """
+        start = time.perf_counter()
+
+        self._check_exp_rets()
+        target_ret = float(target_ret)
+
+        if self.allow_short:
+            # Only equality constraints can be active, try the closed form first
+            weights = self._markowitz_closed_form(target_ret)
+            if weights is not None:
+                return self._result(weights, {'x': weights}, self._closed_form_info(start),
+                                    return_initvals, return_result)
+
+        # exp_rets*x >= target_ret (and x >= 0 if long-only)
+        # sum(x) = 1 (or sum(x) = 0 if market neutral)
+        constraints = QPConstraints(target_ret=target_ret,
+                                    long_only=not self.allow_short,
+                                    budget=0.0 if self.market_neutral else 1.0)
+
+        weights, solution, info = self._solve_qp(constraints, initvals, start)
+        return self._result(weights, solution, info, return_initvals, return_result)
+
+    def min_var(self, initvals=None, return_initvals=False, return_result=False):
+        """
+        Computes the minimum variance portfolio.
+
+        Parameters
+        ----------
+        initvals: numpy.ndarray or dict, optional
+            Initial values to warm-start the solver. Either the weights
+            of a previous solution or the primal/dual solution returned
+            by a previous call with return_initvals=True.
+        return_initvals: bool, optional
+            If 'True' also return the primal/dual solution, which can be
+            used to warm-start the next call.
+        return_result: bool, optional
+            If 'True' also return a SolveResult with the solver status,
+            iterations, duality gap, residuals and timings.
+
+        Returns
+        -------
+        weights: numpy.ndarray
+            Optimal asset weights.
+        initvals: dict
+            Primal/dual solution with keys 'x', 's', 'y' and 'z'
+            (only returned if return_initvals=True).
+        result: SolveResult
+            Diagnostics of the solve (only returned if return_result=True).
+        """
+        start = time.perf_counter()
+
+        if self.allow_short:
+            # sum(x) = 1 is the only constraint, use the closed form
+            x = self._cov_solve(np.ones(len(self.cov_mat)))
+            if x is not None:
+                weights = x / x.sum()
+                return self._result(weights, {'x': weights}, self._closed_form_info(start),
+                                    return_initvals, return_result)
+
+        # x >= 0 (if long-only) and sum(x) = 1
+        constraints = QPConstraints(target_ret=None,
+                                    long_only=not self.allow_short,
+                                    budget=1.0)
+
+        weights, solution, info = self._solve_qp(constraints, initvals, start)
+        return self._result(weights, solution, info, return_initvals, return_result)
+
+    def tangency(self, initvals=None, return_initvals=False, return_result=False):
+        """
+        Computes the tangency portfolio, i.e. the maximum Sharpe ratio portfolio.
+
+        Note: The returned primal/dual solution refers to the
+        unnormalized solution of the QP, i.e. before the weights
+        are rescaled to sum(weights) = 1.
+
+        Parameters
+        ----------
+        initvals: numpy.ndarray or dict, optional
+            Initial values to warm-start the solver. Either the weights
+            of a previous solution or the primal/dual solution returned
+            by a previous call with return_initvals=True.
+        return_initvals: bool, optional
+            If 'True' also return the primal/dual solution, which can be
+            used to warm-start the next call.
+        return_result: bool, optional
+            If 'True' also return a SolveResult with the solver status,
+            iterations, duality gap, residuals and timings.
+
+        Returns
+        -------
+        weights: numpy.ndarray
+            Optimal asset weights.
+        initvals: dict
+            Primal/dual solution with keys 'x', 's', 'y' and 'z'
+            (only returned if return_initvals=True).
+        result: SolveResult
+            Diagnostics of the solve (only returned if return_result=True).
+        """
+        start = time.perf_counter()
+
+        self._check_exp_rets()
+
+        if self.allow_short:
+            # exp_rets*x >= 1 is always active, use the closed form
+            x = self._cov_solve(self.exp_rets)
+            if x is not None and np.dot(self.exp_rets, x) > 0.0:
+                solution = {'x': x / np.dot(self.exp_rets, x)}
+                return self._result(x / x.sum(), solution, self._closed_form_info(start),
+                                    return_initvals, return_result)
+
+        # exp_rets*x >= 1 (and x >= 0 if long-only)
+        constraints = QPConstraints(target_ret=1.0,
+                                    long_only=not self.allow_short,
+                                    budget=None)
+
+        weights, solution, info = self._solve_qp(constraints, initvals, start)
+
+        # Rescale weights, so that sum(weights) = 1
+        return self._result(weights / weights.sum(), solution, info,
+                            return_initvals, return_result)
+
+    def frontier(self, n_points=20):
+        """
+        Computes portfolios on the efficient frontier for target returns
+        evenly spaced between the return of the minimum variance portfolio
+        and the maximum expected asset return.
+
+        For long/short portfolios every point is a combination of the same
+        two portfolios (two-fund theorem), so the whole frontier follows
+        from a single factorization of the covariance matrix. For long-only
+        portfolios each point is warm-started from its neighbour, except for
+        the maximum return portfolio, which needs no QP.
+
+        Parameters
+        ----------
+        n_points: int, optional
+            Number of points on the frontier.
+
+        Returns
+        -------
+        weights: numpy.ndarray
+            n_points x n array of optimal asset weights.
+        risks: numpy.ndarray
+            Standard deviations of the portfolio returns.
+        rets: numpy.ndarray
+            Expected portfolio returns.
+        """
+        self._check_exp_rets()
+
+        if self.market_neutral:
+            raise ValueError("Frontier of market neutral portfolios is not supported")
+
+        if n_points < 1:
+            raise ValueError("Number of points is not positive")
+
+        mu = self.exp_rets
+        min_var_ret = np.dot(self.min_var(), mu)
+        target_rets = np.linspace(min_var_ret, mu.max(), n_points)
+
+        if self.allow_short:
+            two_fund = self._cached('two_fund', self._build_two_fund)
+        else:
+            two_fund = None
+
+        if two_fund is not None:
+            # All points are linear in the target return
+            X, M = two_fund
+            lagrange = np.linalg.solve(M, np.vstack((np.ones(n_points), target_rets)))
+            weights = np.dot(X, lagrange).T
+        else:
+            weights = np.empty((n_points, len(self.cov_mat)))
+            initvals = None
+
+            # The long-only feasible set of the maximum return degenerates to
+            # the assets with that return, so the top endpoint is computed directly
+            num_qp = n_points - 1 if n_points > 1 and not self.allow_short else n_points
+            for i, target_ret in enumerate(target_rets[:num_qp]):
+                weights[i], initvals = self.solve(target_ret, initvals=initvals,
+                                                  return_initvals=True)
+
+            if num_qp < n_points:
+                weights[-1] = self._max_ret_weights()
+
+        if self._factor_model:
+            variances = (weights * self.cov_mat.dot(weights.T).T).sum(axis=1)
+        else:
+            variances = (weights * np.dot(weights, self.cov_mat)).sum(axis=1)
+
+        risks = np.sqrt(np.maximum(variances, 0.0))
+        rets = np.dot(weights, mu)
+        return weights, risks, rets
+
+    def _max_ret_weights(self):
+        """
+        Computes the long-only portfolio with the maximum expected return,
+        i.e. all weight in the maximum return asset, or the minimum variance
+        mix of several assets sharing the maximum return.
+        """
+        n = len(self.cov_mat)
+        tied = np.flatnonzero(self.exp_rets == self.exp_rets.max())
+
+        weights = np.zeros(n)
+        if len(tied) == 1:
+            weights[tied] = 1.0
+            return weights
+
+        if self._factor_model:
+            columns = np.zeros((n, len(tied)))
+            columns[tied, np.arange(len(tied))] = 1.0
+            cov_tied = self.cov_mat.dot(columns)[tied]
+        else:
+            cov_tied = self.cov_mat[np.ix_(tied, tied)]
+
+        problem = PortfolioProblem(cov_tied, solver=self.solver,
+                                   solver_options=self.solver_options)
+        weights[tied] = problem.min_var()
+        return weights
+
+    def _check_exp_rets(self):
+        if self.exp_rets is None:
+            raise ValueError("Expected returns are required")
+
+    def _cached(self, key, build):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    def _build_P(self):
+        if not self._factor_model:
+            return _dense_matrix(self.cov_mat)
+
+        # Function computing y := alpha*cov_mat*x + beta*y
+        def P(x, y, alpha=1.0, beta=0.0):
+            y[:] = opt.matrix(alpha * self.cov_mat.dot(np.array(x).ravel()) +
+                              beta * np.array(y).ravel())
+
+        return P
+
+    def _build_q(self):
+        return opt.matrix(0.0, (len(self.cov_mat), 1))
+
+    def _build_A(self):
+        return opt.matrix(1.0, (1, len(self.cov_mat)))
+
+    def _build_G_bounds(self):
+        n = len(self.cov_mat)
+
+        # Sparse -I, i.e. O(n) instead of O(n^2) memory and setup time
+        return opt.spmatrix(-1.0, range(n), range(n))
+
+    def _build_G_ret(self):
+        n = len(self.cov_mat)
+
+        if not self.allow_short:
+            # Sparse [-exp_rets^T; -I], i.e. O(n) memory and setup time
+            return opt.spmatrix(np.concatenate((-self.exp_rets, -np.ones(n))),
+                                [0] * n + list(range(1, n + 1)),
+                                list(range(n)) * 2, (n + 1, n))
+        else:
+            return opt.matrix(-self.exp_rets).T
+
+    def _build_cholesky(self):
+        L = _dense_matrix(self.cov_mat)
+
+        try:
+            optlapack.potrf(L)
+        except ArithmeticError:
+            return None
+
+        return L
+
+    def _build_two_fund(self):
+        n = len(self.cov_mat)
+
+        # Solve cov_mat * X = [1, exp_rets] with a single factorization
+        X = self._cov_solve(np.column_stack((np.ones(n), self.exp_rets)))
+        if X is None:
+            return None
+
+        M = np.dot(np.vstack((np.ones(n), self.exp_rets)), X)
+
+        # M is singular if the expected returns are all equal
+        det = M[0, 0] * M[1, 1] - M[0, 1] * M[1, 0]
+        if det <= 1e-12 * abs(M[0, 0] * M[1, 1]):
+            return None
+
+        return X, M
+
+    def _cov_solve(self, rhs):
+        """
+        Solves cov_mat * x = rhs using the cached Cholesky factorization
+        (or the Woodbury identity for factor models).
+        Returns None if cov_mat is not positive definite.
+        """
+        if self._factor_model:
+            return self.cov_mat.solve(rhs)
+
+        L = self._cached('cholesky', self._build_cholesky)
+        if L is None:
+            return None
+
+        x = opt.matrix(np.asarray(rhs, dtype=float))
+        optlapack.potrs(L, x)
+        return np.array(x).reshape(np.shape(rhs))
+
+    def _markowitz_closed_form(self, target_ret):
+        """
+        Computes a long/short Markowitz portfolio analytically, assuming
+        that the target return constraint is active. Returns None if the
+        constraint turns out to be inactive or if the closed form is not
+        applicable, in which case the QP solver has to be used.
+        """
+        two_fund = self._cached('two_fund', self._build_two_fund)
+        if two_fund is None:
+            return None
+
+        X, M = two_fund
+
+        # Constraints A*x = c with A = [1, exp_rets]^T, c = [budget, target_ret]
+        c = np.array([0.0 if self.market_neutral else 1.0, target_ret])
+        lagrange = np.linalg.solve(M, c)
+
+        # A negative multiplier means exp_rets*x >= target_ret is inactive
+        if lagrange[1] < 0.0:
+            return None
+
+        return np.dot(X, lagrange)
+
+    def _initvals(self, initvals, constraints):
+        """
+        Converts initial values to arrays matching the
+        dimensions of the given constraints.
+        """
+        if initvals is None:
+            return None
+
+        if not isinstance(initvals, dict):
+            initvals = {'x': initvals}
+
+        n = len(self.cov_mat)
+        m = constraints.num_inequalities(n)
+        p = constraints.num_equalities()
+        sizes = {'x': n, 's': m, 'y': p, 'z': m}
+
+        checked = {}
+        for key, value in initvals.items():
+            if key not in sizes:
+                raise ValueError("Unknown initial value '{}'".format(key))
+
+            value = np.asarray(value, dtype=float).ravel()
+            if len(value) != sizes[key]:
+                raise ValueError("Initial values do not match problem dimensions")
+
+            checked[key] = value
+
+        return checked
+
+    def _solve_qp(self, constraints, initvals=None, start=None):
+        """
+        Solves the QP with the selected backend. Returns the weights,
+        the primal/dual solution and the diagnostics for SolveResult,
+        with times measured from start (defaults to now).
+        """
+        if start is None:
+            start = time.perf_counter()
+
+        initvals = self._initvals(initvals, constraints)
+
+        name = _resolve_solver(self.solver, self)
+        solver = _get_solver(name, self)
+
+        begin = time.perf_counter()
+        sol = solver(self, constraints, initvals)
+        end = time.perf_counter()
+
+        if sol['status'] != 'optimal':
+            warnings.warn("Convergence problem")
+
+        # Time spent by the backend outside of its solver counts as setup
+        solve_time = sol.get('solve time', end - begin)
+
+        info = {'status': sol['status'],
+                'method': name,
+                'iterations': sol['iterations'],
+                'gap': sol.get('gap'),
+                'primal_infeasibility': sol.get('primal infeasibility'),
+                'dual_infeasibility': sol.get('dual infeasibility'),
+                'setup_time': end - start - solve_time,
+                'solve_time': solve_time,
+                'end': end}
+
+        solution = dict((key, sol[key]) for key in ['x', 's', 'y', 'z'])
+        return sol['x'], solution, info
+
+    def _solve_cvxopt(self, constraints, initvals):
+        """
+        Solves the QP with cvxopt's interior-point solver.
+        """
+        P = self._cached('P', self._build_P)
+        q = self._cached('q', self._build_q)
+
+        # Constraints Gx <= h
+        if constraints.target_ret is not None:
+            # exp_rets*x >= target_ret (and x >= 0 if long-only)
+            G = self._cached('G_ret', self._build_G_ret)
+            h = opt.matrix(0.0, (G.size[0], 1))
+            h[0] = -constraints.target_ret
+        elif constraints.long_only:
+            # x >= 0
+            G = self._cached('G_bounds', self._build_G_bounds)
+            h = opt.matrix(0.0, (G.size[0], 1))
+        else:
+            G = None
+            h = None
+
+        # Constraints Ax = b
+        if constraints.budget is not None:
+            A = self._cached('A', self._build_A)
+            b = opt.matrix(constraints.budget)
+        else:
+            A = None
+            b = None
+
+        if initvals is not None:
+            # cvxopt requires strictly positive slacks and multipliers. A previous
+            # solution has some of them at (almost) zero, so push them into the
+            # interior, otherwise the scaling of the first iteration overflows.
+            initvals = dict((key, opt.matrix(self._interior(value) if key in ('s', 'z')
+                                             else value))
+                            for key, value in initvals.items())
+
+        options = self.solver_options
+        if initvals is not None and 'x' in initvals and 'abstol' not in options:
+            # A warm start begins with a small duality gap, so cvxopt's absolute
+            # gap tolerance stops it early for daily-scale variances. Scale its
+            # default of 1e-7 to the objective of the starting point instead.
+            x = np.asarray(initvals['x']).ravel()
+            objective = 0.5 * np.dot(x, self.cov_mat.dot(x))
+            if np.isfinite(objective) and objective > 0.0:
+                options = dict(options, abstol=1e-7 * min(1.0, objective))
+
+        if self._factor_model or (not self.allow_short and G is not None):
+            # Exploit the structure of the covariance matrix and constraints
+            kktsolver = self._kktsolver(constraints.long_only,
+                                        constraints.target_ret is not None,
+                                        A is not None)
+        else:
+            kktsolver = None
+
+        # Solve (with per-problem options, so that concurrent solves do not interfere)
+        begin = time.perf_counter()
+        sol = optsolvers.qp(P, q, G, h, A, b, kktsolver=kktsolver,
+                            initvals=initvals, options=options)
+        solve_time = time.perf_counter() - begin
+
+        # Views on the cvxopt matrices, no copies
+        solution = dict((key, np.asarray(sol[key]).ravel())
+                        for key in ['x', 's', 'y', 'z'])
+        for key in ['status', 'iterations', 'gap',
+                    'primal infeasibility', 'dual infeasibility']:
+            solution[key] = sol[key]
+        solution['solve time'] = solve_time
+        return solution
+
+    @staticmethod
+    def _interior(value, margin=1e-6):
+        if not len(value):
+            return value
+        return np.maximum(value, margin * max(1.0, np.abs(value).max()))
+
+    def _kktsolver(self, has_bounds, has_ret, has_budget):
+        """
+        Creates a KKT solver for the constraints G = [-exp_rets^T; -I],
+        where the return row is present if has_ret and the bounds block
+        if has_bounds, and A = [1, ..., 1] if has_budget.
+
+        Eliminating the inequality constraints reduces the KKT system to
+        H = P + G^T W^-2 G, which is cov_mat plus a diagonal plus a rank-one
+        term. For a dense cov_mat, H is built in O(n^2) and factorized once
+        per iteration, instead of forming G^T W^-2 G for a dense G. For a
+        factor model, H is again a diagonal plus a low-rank term and is
+        solved via the Woodbury identity in O(n*k^2). The budget constraint
+        is handled by a Schur complement on top of the same factorization.
+        """
+        n = len(self.cov_mat)
+        mu = self.exp_rets if has_ret else None
+        k = 1 if has_ret else 0
+
+        def factor(W):
+            # Near an infeasible or degenerate solution the scalings in W can
+            # under- or overflow. cvxopt detects the resulting non-finite
+            # steps itself, so the floating point warnings are only noise.
+            with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+                d = np.array(W['d']).ravel()
+                d2 = d**2
+
+                if self._factor_model:
+                    H_solve = self._factor_H_solver(d2, has_bounds, has_ret)
+                else:
+                    H_solve = self._dense_H_solver(d2, has_bounds, has_ret)
+
+                if has_budget:
+                    # u = H^-1 * 1 and its Schur complement 1^T * H^-1 * 1
+                    u = H_solve(np.ones(n))
+                    schur = u.sum()
+
+            def solve(x, y, z):
+                with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+                    bz = np.array(z).ravel()
+
+                    # r = bx + G^T * W^-2 * bz
+                    v = bz / d2
+                    r = np.array(x).ravel()
+                    if has_bounds:
+                        r = r - v[k:]
+                    if has_ret:
+                        r = r - mu * v[0]
+
+                    ux = H_solve(r)
+
+                    if has_budget:
+                        uy = (ux.sum() - y[0]) / schur
+                        ux -= uy * u
+                        y[0] = uy
+
+                    # uz = W^-1 * (G * ux - bz)
+                    Gux = -ux if has_bounds else np.zeros(0)
+                    if has_ret:
+                        Gux = np.concatenate(([-np.dot(mu, ux)], Gux))
+
+                    x[:] = opt.matrix(ux)
+                    z[:] = opt.matrix((Gux - bz) / d)
+
+            return solve
+
+        return factor
+
+    def _dense_H_solver(self, d2, has_bounds, has_ret):
+        n = len(self.cov_mat)
+        k = 1 if has_ret else 0
+        P = self._cached('P', self._build_P)
+
+        # H = P + diag(1/d_i^2) + exp_rets*exp_rets^T/d_0^2 (lower triangle)
+        H = opt.matrix(P)
+        if has_bounds:
+            H[::n + 1] += opt.matrix(1.0 / d2[k:])
+        if has_ret:
+            optblas.syr(opt.matrix(self.exp_rets), H, alpha=1.0 / d2[0])
+
+        optlapack.potrf(H)
+
+        def H_solve(rhs):
+            x = opt.matrix(rhs)
+            optlapack.potrs(H, x)
+            return np.array(x).ravel()
+
+        return H_solve
+
+    def _factor_H_solver(self, d2, has_bounds, has_ret):
+        k = 1 if has_ret else 0
+
+        # H = diag(specific_var + 1/d_i^2) + U*C*U^T with U = [loadings, exp_rets]
+        # and C = diag(factor_cov, 1/d_0^2)
+        diag = self.cov_mat.specific_var.values
+        if has_bounds:
+            diag = diag + 1.0 / d2[k:]
+
+        U = self.cov_mat.loadings.values
+        C = self.cov_mat.factor_cov.values
+        if has_ret:
+            U = np.column_stack((U, self.exp_rets))
+            C = np.pad(C, ((0, 1), (0, 1)), mode='constant')
+            C[-1, -1] = 1.0 / d2[0]
+
+        return _woodbury_solver(diag, U, C)
+
+    @staticmethod
+    def _closed_form_info(start):
+        end = time.perf_counter()
+        return {'status': 'optimal', 'method': 'closed_form', 'iterations': 0,
+                'gap': 0.0, 'primal_infeasibility': None, 'dual_infeasibility': None,
+                'setup_time': 0.0, 'solve_time': end - start, 'end': end}
+
+    @staticmethod
+    def _result(weights, solution, info, return_initvals, return_result):
+        result = (weights,)
+        if return_initvals:
+            result += (solution,)
+        if return_result:
+            info = dict(info)
+            info['post_time'] = time.perf_counter() - info.pop('end')
+            result += (SolveResult(**info),)
+
+        return result if len(result) > 1 else weights
+
+
+class SolveResult(namedtuple('SolveResult', ['status', 'method', 'iterations', 'gap',
+                                             'primal_infeasibility', 'dual_infeasibility',
+                                             'setup_time', 'solve_time', 'post_time'])):
+    """
+    Diagnostics of a portfolio optimization, returned if
+    return_result=True is passed to an optimization function.
+
+    Attributes
+    ----------
+    status: str
+        Solver status, 'optimal' on success.
+    method: str
+        'closed_form' if the portfolio was computed analytically,
+        otherwise the name of the QP solver backend.
+    iterations: int
+        Number of solver iterations.
+    gap: float
+        Duality gap of the solution (zero for closed forms).
+    primal_infeasibility: float or None
+        Primal residual as reported by the backend.
+    dual_infeasibility: float or None
+        Dual residual as reported by the backend.
+    setup_time: float
+        Wall time in seconds for building the solver inputs.
+    solve_time: float
+        Wall time in seconds spent in the solver.
+    post_time: float
+        Wall time in seconds for post-processing the solution.
+    """
+    __slots__ = ()
+
+    @property
+    def total_time(self):
+        """Total wall time in seconds."""
+        return self.setup_time + self.solve_time + self.post_time
+
+
+def _dense_matrix(values):
+    """
+    Copies a float64 or float32 array into a cvxopt matrix of doubles,
+    which is the only copy made when promoting a float32 matrix.
+    """
+    if values.dtype == np.float64:
+        return opt.matrix(values, tc='d')
+
+    matrix = opt.matrix(0.0, values.shape)
+    np.asarray(matrix)[...] = values
+    return matrix
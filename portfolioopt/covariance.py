@@ -0,0 +1,427 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2015 Christian Zielinski
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Covariance models and estimators for the portfolio optimization
+functions, i.e. factor models which can be used in place of a dense
+covariance matrix and estimators of covariance matrices from returns."""
+
+import numpy as np
+import pandas as pd
+
+
+__all__ = ['FactorCovariance',
+           'EWMACovariance',
+           'ledoit_wolf']
+
+
+# Number of matrix elements per block processed at once, e.g. rows in
+# ledoit_wolf() or columns read from disk by ReturnsStore and the Arrow readers
+_BLOCK_ELEMENTS = 2**22
+
+
+class FactorCovariance(object):
+    """
+    Covariance matrix of a factor model, i.e.
+
+        cov_mat = loadings * factor_cov * loadings^T + diag(specific_var)
+
+    The dense n x n matrix is never materialized. Matrix-vector products
+    and linear solves with the covariance matrix cost O(n*k) and O(n*k^2)
+    operations respectively, where n is the number of assets and k the
+    number of factors. A FactorCovariance can be passed to the portfolio
+    optimization functions wherever a covariance matrix is expected.
+
+    Parameters
+    ----------
+    loadings: pandas.DataFrame
+        Factor loadings (exposures) with assets as index
+        and factors as columns.
+    factor_cov: pandas.DataFrame
+        Covariance matrix of factor returns.
+    specific_var: pandas.Series
+        Specific (idiosyncratic) variances of the assets.
+        Must be strictly positive.
+    """
+
+    def __init__(self, loadings, factor_cov, specific_var):
+        if not isinstance(loadings, pd.DataFrame):
+            raise ValueError("Factor loadings is not a DataFrame")
+
+        if not isinstance(factor_cov, pd.DataFrame):
+            raise ValueError("Factor covariance matrix is not a DataFrame")
+
+        if not isinstance(specific_var, pd.Series):
+            raise ValueError("Specific variances is not a Series")
+
+        if not loadings.index.equals(specific_var.index):
+            raise ValueError("Indices do not match")
+
+        if not (loadings.columns.equals(factor_cov.index) and
+                loadings.columns.equals(factor_cov.columns)):
+            raise ValueError("Factors do not match")
+
+        if not (specific_var.values > 0.0).all():
+            raise ValueError("Specific variances are not positive")
+
+        self.loadings = loadings
+        self.factor_cov = factor_cov
+        self.specific_var = specific_var
+
+    def __len__(self):
+        return len(self.loadings)
+
+    @property
+    def index(self):
+        """Asset labels."""
+        return self.loadings.index
+
+    def dot(self, x):
+        """
+        Computes the product cov_mat * x.
+
+        Parameters
+        ----------
+        x: numpy.ndarray
+            Vector or matrix with n rows.
+
+        Returns
+        -------
+        y: numpy.ndarray
+            Product cov_mat * x.
+        """
+        B = self.loadings.values
+        F = self.factor_cov.values
+        D = self.specific_var.values
+
+        x = np.asarray(x, dtype=float)
+        if x.ndim == 1:
+            return np.dot(B, np.dot(F, np.dot(B.T, x))) + D * x
+        else:
+            return np.dot(B, np.dot(F, np.dot(B.T, x))) + D[:, None] * x
+
+    def solve(self, rhs):
+        """
+        Solves cov_mat * x = rhs via the Woodbury matrix identity.
+
+        Parameters
+        ----------
+        rhs: numpy.ndarray
+            Vector or matrix with n rows.
+
+        Returns
+        -------
+        x: numpy.ndarray
+            Solution of cov_mat * x = rhs.
+        """
+        solve = _woodbury_solver(self.specific_var.values,
+                                 self.loadings.values,
+                                 self.factor_cov.values)
+        return solve(rhs)
+
+    def to_frame(self):
+        """
+        Materializes the dense covariance matrix.
+
+        Returns
+        -------
+        cov_mat: pandas.DataFrame
+            Covariance matrix of asset returns.
+        """
+        B = self.loadings.values
+        values = np.dot(B, np.dot(self.factor_cov.values, B.T))
+        values[np.diag_indices_from(values)] += self.specific_var.values
+        return pd.DataFrame(values, index=self.index, columns=self.index)
+
+
+class EWMACovariance(object):
+    """
+    Streaming exponentially weighted estimator of the covariance
+    matrix and the average returns, i.e.
+
+        exp_rets = decay * exp_rets + (1 - decay) * r
+        cov_mat = decay * (cov_mat + (1 - decay) * d * d^T)
+
+    for every new observation r, with d = r - exp_rets before the update.
+    The first observation initializes the average returns (the biased
+    estimator of pandas' ewm(alpha=1 - decay, adjust=False)).
+
+    Every observation costs O(n^2) operations. Chunks of observations
+    are merged in a single matrix product. The estimates are kept in
+    preallocated arrays, which are updated in place and exposed as
+    pandas objects without copying.
+
+    Parameters
+    ----------
+    assets: sequence
+        Asset labels, i.e. the columns of the returns.
+    decay: float, optional
+        Decay factor per observation, between 0 and 1 (exclusive).
+        E.g. 0.94 as in RiskMetrics for daily returns.
+    dtype: numpy.dtype, optional
+        Type of the covariance matrix, numpy.float32 halves its
+        memory and the time of the updates.
+    """
+
+    def __init__(self, assets, decay=0.94, dtype=np.float64):
+        if not 0.0 < decay < 1.0:
+            raise ValueError("Decay factor is not between 0 and 1")
+
+        self.index = pd.Index(assets)
+        self.decay = decay
+        self.count = 0
+
+        n = len(self.index)
+        self._mean = np.zeros(n)
+        self._cov = np.zeros((n, n), dtype=dtype)
+
+        # Views on the estimates, which follow every update
+        self._exp_rets = pd.Series(self._mean, index=self.index, copy=False)
+        self._cov_mat = pd.DataFrame(self._cov, index=self.index,
+                                     columns=self.index, copy=False)
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def cov_mat(self):
+        """
+        Covariance matrix (pandas.DataFrame). This is a view which is
+        updated in place, use copy() to keep the current estimate.
+        """
+        self._check_count()
+        return self._cov_mat
+
+    @property
+    def exp_rets(self):
+        """
+        Average returns (pandas.Series). This is a view which is
+        updated in place, use copy() to keep the current estimate.
+        """
+        self._check_count()
+        return self._exp_rets
+
+    def update(self, returns):
+        """
+        Adds one or more observations to the estimates.
+
+        Parameters
+        ----------
+        returns: pandas.Series, pandas.DataFrame or numpy.ndarray
+            A single row of asset returns or a chunk of rows
+            in chronological order.
+
+        Returns
+        -------
+        self: EWMACovariance
+            The updated estimator.
+        """
+        if isinstance(returns, pd.Series):
+            if not returns.index.equals(self.index):
+                raise ValueError("Assets do not match")
+        elif isinstance(returns, pd.DataFrame):
+            if not returns.columns.equals(self.index):
+                raise ValueError("Assets do not match")
+
+        rows = np.asarray(returns, dtype=float)
+        if rows.ndim == 1:
+            rows = rows[None, :]
+
+        if rows.ndim != 2 or rows.shape[1] != len(self.index):
+            raise ValueError("Returns do not match the number of assets")
+
+        if not len(rows):
+            return self
+
+        if self.count == 0:
+            self._mean[:] = rows[0]
+            self._cov[:] = 0.0
+            self.count = 1
+            rows = rows[1:]
+
+        if len(rows) == 1:
+            # Rank-one update
+            diff = rows[0] - self._mean
+            self._mean += (1.0 - self.decay) * diff
+            diff = diff.astype(self._cov.dtype)
+            self._cov *= self.decay
+            self._cov += np.outer(diff, self.decay * (1.0 - self.decay) * diff)
+        elif len(rows):
+            self._merge(rows)
+
+        self.count += len(rows)
+        return self
+
+    def _merge(self, rows):
+        """
+        Merges a chunk of observations into the estimates, treating
+        the current estimates and the chunk as two weighted samples.
+        """
+        k = len(rows)
+
+        # Weights of the previous estimates and of the rows, summing to one
+        prior = self.decay**k
+        weights = (1.0 - self.decay) * self.decay**np.arange(k - 1, -1, -1)
+
+        chunk_mean = np.dot(weights, rows) / (1.0 - prior)
+        centered = (rows - chunk_mean).astype(self._cov.dtype, copy=False)
+        diff = (self._mean - chunk_mean).astype(self._cov.dtype)
+
+        self._cov *= prior
+        self._cov += np.dot(centered.T * weights.astype(self._cov.dtype), centered)
+        self._cov += prior * (1.0 - prior) * np.outer(diff, diff)
+
+        self._mean *= prior
+        self._mean += (1.0 - prior) * chunk_mean
+
+    def _check_count(self):
+        if self.count == 0:
+            raise ValueError("No observations")
+
+
+def ledoit_wolf(returns, block_size=None, dtype=np.float64):
+    """
+    Computes the Ledoit-Wolf shrinkage estimator of the covariance
+    matrix, i.e. the convex combination
+
+        cov_mat = (1 - shrinkage) * sample_cov + shrinkage * mu * I
+
+    of the (biased) sample covariance matrix and a scaled identity with
+    mu = trace(sample_cov) / n, where the shrinkage intensity minimizes
+    the expected Frobenius loss (Ledoit and Wolf, 2004).
+
+    The returns are read once in blocks of rows, accumulating all sums
+    required for the sample covariance and the optimal intensity. The
+    estimate is positive definite with smallest eigenvalue of at least
+    shrinkage * mu, also if there are more assets than observations.
+
+    Parameters
+    ----------
+    returns: pandas.DataFrame
+        Asset returns with dates as index and assets as columns.
+        Missing values are not supported.
+    block_size: int, optional
+        Number of rows per block. Defaults to blocks of about
+        four million elements.
+    dtype: numpy.dtype, optional
+        Type of the n x n matrices, numpy.float32 halves the memory
+        and the time of the matrix products at single precision.
+
+    Returns
+    -------
+    cov_mat: pandas.DataFrame
+        Shrunk covariance matrix.
+    shrinkage: float
+        Shrinkage intensity between 0 and 1.
+    """
+    if not isinstance(returns, pd.DataFrame):
+        raise ValueError("Returns is not a DataFrame")
+
+    values = np.asarray(returns.values, dtype=float)
+    T, n = values.shape
+
+    if T < 2:
+        raise ValueError("At least two observations are required")
+
+    if np.isnan(values).any():
+        raise ValueError("Returns contain missing values")
+
+    if block_size is None:
+        block_size = max(1, _BLOCK_ELEMENTS // n)
+
+    # Sums of shifted rows y_t and of their squared norms a_t = |y_t|^2
+    shift = values[:block_size].mean(axis=0)
+    gram = np.zeros((n, n), dtype=dtype)
+    total = np.zeros(n)
+    weighted = np.zeros(n)
+    norms = 0.0
+    norms_sq = 0.0
+
+    for start in range(0, T, block_size):
+        rows = values[start:start + block_size] - shift
+        sq_norms = np.einsum('ij,ij->i', rows, rows)
+
+        blas_rows = rows.astype(dtype, copy=False)
+        gram += np.dot(blas_rows.T, blas_rows)
+        total += rows.sum(axis=0)
+        weighted += np.dot(sq_norms, rows)
+        norms += sq_norms.sum()
+        norms_sq += np.dot(sq_norms, sq_norms)
+
+    mean = total / T
+
+    # sum_t |y_t - mean|^4, expanded in terms of the accumulated sums
+    c = np.dot(mean, mean)
+    fourth = (norms_sq - 4.0 * np.dot(mean, weighted) +
+              4.0 * np.dot(mean, np.dot(gram, mean.astype(dtype))) +
+              2.0 * c * norms - 4.0 * c * np.dot(mean, total) + T * c**2)
+
+    # The sample covariance and the estimate overwrite the Gram matrix
+    sample_cov = gram
+    sample_cov /= T
+    blas_mean = mean.astype(dtype)
+    sample_cov -= np.outer(blas_mean, blas_mean)
+
+    trace = np.trace(sample_cov)
+    mu = trace / n
+    if mu <= 0.0:
+        raise ValueError("Returns have zero variance")
+
+    sum_sq = (sample_cov**2).sum(dtype=np.float64)
+    delta = (sum_sq - 2.0 * mu * trace + n * mu**2) / n
+    beta = min((fourth / T - sum_sq) / (n * T), delta)
+    shrinkage = max(beta, 0.0) / delta if delta > 0.0 else 0.0
+
+    cov_mat = sample_cov
+    cov_mat *= 1.0 - shrinkage
+    cov_mat[np.diag_indices(n)] += shrinkage * mu
+
+    return (pd.DataFrame(cov_mat, index=returns.columns, columns=returns.columns, copy=False),
+            shrinkage)
+
+
+def _woodbury_solver(diag, U, C):
+    """
+    Returns a function solving (diag(diag) + U * C * U^T) * x = rhs.
+
+    Uses the Woodbury identity in the form
+
+        (D + U*C*U^T)^-1 = D^-1 - D^-1*U*C*(I + U^T*D^-1*U*C)^-1*U^T*D^-1
+
+    which does not require C to be invertible. The setup costs O(n*r^2)
+    and every solve O(n*r) operations, where U is an n x r matrix.
+    """
+    r = U.shape[1]
+
+    DiU = U / diag[:, None]
+    M = np.identity(r) + np.dot(np.dot(U.T, DiU), C)
+    CMi = np.dot(C, np.linalg.inv(M))
+
+    def solve(rhs):
+        rhs = np.asarray(rhs, dtype=float)
+        if rhs.ndim == 1:
+            y = rhs / diag
+        else:
+            y = rhs / diag[:, None]
+
+        return y - np.dot(DiU, np.dot(CMi, np.dot(U.T, y)))
+
+    return solve
@@ -28,28 +28,36 @@ variance portfolios and tangency portfolios (i.e. maximum Sharpe ratio
 portfolios) in Python. The construction of long-only, long/short and
 market neutral portfolios is supported."""
 
-import numpy as np
 import pandas as pd
-import cvxopt as opt
-import cvxopt.solvers as optsolvers
-import warnings
+import time
+
+from . import core
+from .core import SolveResult
+from .covariance import FactorCovariance
+from .cla import CriticalLineAlgorithm
 
 
 __all__ = ['markowitz_portfolio',
            'min_var_portfolio',
            'tangency_portfolio',
            'max_ret_portfolio',
-           'truncate_weights']
+           'truncate_weights',
+           'efficient_frontier',
+           'PortfolioProblem',
+           'SolveResult']
 
 
 def markowitz_portfolio(cov_mat, exp_rets, target_ret,
-                        allow_short=False, market_neutral=False):
+                        allow_short=False, market_neutral=False,
+                        initvals=None, return_initvals=False,
+                        return_result=False, solver='cvxopt',
+                        solver_options=None):
     """
     Computes a Markowitz portfolio.
 
     Parameters
     ----------
-    cov_mat: pandas.DataFrame
+    cov_mat: pandas.DataFrame or FactorCovariance
         Covariance matrix of asset returns.
     exp_rets: pandas.Series
         Expected asset returns (often historical returns).
@@ -62,67 +70,45 @@ def markowitz_portfolio(cov_mat, exp_rets, target_ret,
         If 'False' sum of weights equals one.
         If 'True' sum of weights equal zero, i.e. create a
             market neutral portfolio (implies allow_short=True).
+    initvals: pandas.Series or dict, optional
+        Initial values to warm-start the solver. Either the weights
+        of a previous solution or the primal/dual solution returned
+        by a previous call with return_initvals=True.
+    return_initvals: bool, optional
+        If 'True' also return the primal/dual solution, which can be
+        used to warm-start the next call.
+    return_result: bool, optional
+        If 'True' also return a SolveResult with the solver status,
+        iterations, duality gap, residuals and timings.
+    solver: str, optional
+        QP solver backend, e.g. 'cvxopt' (default), 'active_set'
+        or 'auto' (see PortfolioProblem).
+    solver_options: dict, optional
+        Options of the solver for this call, e.g. 'abstol',
+        'reltol', 'feastol', 'maxiters' or 'show_progress'.
             
     Returns
     -------
     weights: pandas.Series
         Optimal asset weights.
+    initvals: dict
+        Primal/dual solution with keys 'x', 's', 'y' and 'z'
+        (only returned if return_initvals=True).
+    result: SolveResult
+        Diagnostics of the solve (only returned if return_result=True).
     """
-    if not isinstance(cov_mat, pd.DataFrame):
-        raise ValueError("Covariance matrix is not a DataFrame")
-
-    if not isinstance(exp_rets, pd.Series):
-        raise ValueError("Expected returns is not a Series")
-
-    if not isinstance(target_ret, float):
-        raise ValueError("Target return is not a float")
-
-    if not cov_mat.index.equals(exp_rets.index):
-        raise ValueError("Indices do not match")
-
-    if market_neutral and not allow_short:
-        warnings.warn("A market neutral portfolio implies shorting")
-        allow_short=True
-
-    n = len(cov_mat)
-
-    P = opt.matrix(cov_mat.values)
-    q = opt.matrix(0.0, (n, 1))
-
-    # Constraints Gx <= h
-    if not allow_short:
-        # exp_rets*x >= target_ret and x >= 0
-        G = opt.matrix(np.vstack((-exp_rets.values,
-                                  -np.identity(n))))
-        h = opt.matrix(np.vstack((-target_ret,
-                                  +np.zeros((n, 1)))))
-    else:
-        # exp_rets*x >= target_ret
-        G = opt.matrix(-exp_rets.values).T
-        h = opt.matrix(-target_ret)
-
-    # Constraints Ax = b
-    # sum(x) = 1
-    A = opt.matrix(1.0, (1, n))
-
-    if not market_neutral:
-        b = opt.matrix(1.0)
-    else:
-        b = opt.matrix(0.0)
-
-    # Solve
-    optsolvers.options['show_progress'] = False
-    sol = optsolvers.qp(P, q, G, h, A, b)
-
-    if sol['status'] != 'optimal':
-        warnings.warn("Convergence problem")
-
-    # Put weights into a labeled series
-    weights = pd.Series(sol['x'], index=cov_mat.index)
-    return weights
-
-
-def min_var_portfolio(cov_mat, allow_short=False):
+    problem = PortfolioProblem(cov_mat, exp_rets, allow_short=allow_short,
+                               market_neutral=market_neutral,
+                               solver=solver, solver_options=solver_options)
+    return problem.solve(target_ret, initvals=initvals,
+                         return_initvals=return_initvals,
+                         return_result=return_result)
+
+
+def min_var_portfolio(cov_mat, allow_short=False,
+                      initvals=None, return_initvals=False,
+                      return_result=False, solver='cvxopt',
+                      solver_options=None):
     """
     Computes the minimum variance portfolio.
 
@@ -135,52 +121,48 @@ def min_var_portfolio(cov_mat, allow_short=False):
     
     Parameters
     ----------
-    cov_mat: pandas.DataFrame
+    cov_mat: pandas.DataFrame or FactorCovariance
         Covariance matrix of asset returns.
     allow_short: bool, optional
         If 'False' construct a long-only portfolio.
         If 'True' allow shorting, i.e. negative weights.
+    initvals: pandas.Series or dict, optional
+        Initial values to warm-start the solver. Either the weights
+        of a previous solution or the primal/dual solution returned
+        by a previous call with return_initvals=True.
+    return_initvals: bool, optional
+        If 'True' also return the primal/dual solution, which can be
+        used to warm-start the next call.
+    return_result: bool, optional
+        If 'True' also return a SolveResult with the solver status,
+        iterations, duality gap, residuals and timings.
+    solver: str, optional
+        QP solver backend, e.g. 'cvxopt' (default), 'active_set'
+        or 'auto' (see PortfolioProblem).
+    solver_options: dict, optional
+        Options of the solver for this call, e.g. 'abstol',
+        'reltol', 'feastol', 'maxiters' or 'show_progress'.
 
     Returns
     -------
     weights: pandas.Series
         Optimal asset weights.
+    initvals: dict
+        Primal/dual solution with keys 'x', 's', 'y' and 'z'
+        (only returned if return_initvals=True).
+    result: SolveResult
+        Diagnostics of the solve (only returned if return_result=True).
     """
-    if not isinstance(cov_mat, pd.DataFrame):
-        raise ValueError("Covariance matrix is not a DataFrame")
-
-    n = len(cov_mat)
-
-    P = opt.matrix(cov_mat.values)
-    q = opt.matrix(0.0, (n, 1))
-
-    # Constraints Gx <= h
-    if not allow_short:
-        # x >= 0
-        G = opt.matrix(-np.identity(n))
-        h = opt.matrix(0.0, (n, 1))
-    else:
-        G = None
-        h = None
+    problem = PortfolioProblem(cov_mat, allow_short=allow_short,
+                               solver=solver, solver_options=solver_options)
+    return problem.min_var(initvals=initvals, return_initvals=return_initvals,
+                           return_result=return_result)
 
-    # Constraints Ax = b
-    # sum(x) = 1
-    A = opt.matrix(1.0, (1, n))
-    b = opt.matrix(1.0)
 
-    # Solve
-    optsolvers.options['show_progress'] = False
-    sol = optsolvers.qp(P, q, G, h, A, b)
-
-    if sol['status'] != 'optimal':
-        warnings.warn("Convergence problem")
-
-    # Put weights into a labeled series
-    weights = pd.Series(sol['x'], index=cov_mat.index)
-    return weights
-
-
-def tangency_portfolio(cov_mat, exp_rets, allow_short=False):
+def tangency_portfolio(cov_mat, exp_rets, allow_short=False,
+                       initvals=None, return_initvals=False,
+                       return_result=False, solver='cvxopt',
+                       solver_options=None):
     """
     Computes a tangency portfolio, i.e. a maximum Sharpe ratio portfolio.
     
@@ -192,58 +174,344 @@ def tangency_portfolio(cov_mat, exp_rets, allow_short=False):
     
     Parameters
     ----------
-    cov_mat: pandas.DataFrame
+    cov_mat: pandas.DataFrame or FactorCovariance
         Covariance matrix of asset returns.
     exp_rets: pandas.Series
         Expected asset returns (often historical returns).
     allow_short: bool, optional
         If 'False' construct a long-only portfolio.
         If 'True' allow shorting, i.e. negative weights.
+    initvals: pandas.Series or dict, optional
+        Initial values to warm-start the solver. Either the weights
+        of a previous solution or the primal/dual solution returned
+        by a previous call with return_initvals=True.
+    return_initvals: bool, optional
+        If 'True' also return the primal/dual solution, which can be
+        used to warm-start the next call.
+    return_result: bool, optional
+        If 'True' also return a SolveResult with the solver status,
+        iterations, duality gap, residuals and timings.
+    solver: str, optional
+        QP solver backend, e.g. 'cvxopt' (default), 'active_set'
+        or 'auto' (see PortfolioProblem).
+    solver_options: dict, optional
+        Options of the solver for this call, e.g. 'abstol',
+        'reltol', 'feastol', 'maxiters' or 'show_progress'.
 
     Returns
     -------
     weights: pandas.Series
         Optimal asset weights.
+    initvals: dict
+        Primal/dual solution with keys 'x', 's', 'y' and 'z'
+        (only returned if return_initvals=True).
+    result: SolveResult
+        Diagnostics of the solve (only returned if return_result=True).
     """
-    if not isinstance(cov_mat, pd.DataFrame):
-        raise ValueError("Covariance matrix is not a DataFrame")
+    problem = PortfolioProblem(cov_mat, exp_rets, allow_short=allow_short,
+                               solver=solver, solver_options=solver_options)
+    return problem.tangency(initvals=initvals, return_initvals=return_initvals,
+                            return_result=return_result)
 
-    if not isinstance(exp_rets, pd.Series):
-        raise ValueError("Expected returns is not a Series")
 
-    if not cov_mat.index.equals(exp_rets.index):
-        raise ValueError("Indices do not match")
+def efficient_frontier(cov_mat, exp_rets, n_points=20, allow_short=False,
+                       method='qp', solver='cvxopt', solver_options=None):
+    """
+    Computes portfolios on the efficient frontier for target returns
+    evenly spaced between the return of the minimum variance portfolio
+    and the maximum expected asset return.
 
-    n = len(cov_mat)
+    Parameters
+    ----------
+    cov_mat: pandas.DataFrame or FactorCovariance
+        Covariance matrix of asset returns.
+    exp_rets: pandas.Series
+        Expected asset returns (often historical returns).
+    n_points: int, optional
+        Number of points on the frontier.
+    allow_short: bool, optional
+        If 'False' construct long-only portfolios.
+        If 'True' allow shorting, i.e. negative weights.
+    method: str, optional
+        If 'qp' solve a (warm-started) QP per point, or use
+            the two-fund theorem for long/short portfolios.
+        If 'cla' interpolate the exact turning points of the
+            Critical Line Algorithm (long-only portfolios and
+            dense covariance matrices only).
+    solver: str, optional
+        QP solver backend, e.g. 'cvxopt' (default), 'active_set'
+        or 'auto' (see PortfolioProblem).
+    solver_options: dict, optional
+        Options of the solver for this call, e.g. 'abstol',
+        'reltol', 'feastol', 'maxiters' or 'show_progress'.
 
-    P = opt.matrix(cov_mat.values)
-    q = opt.matrix(0.0, (n, 1))
+    Returns
+    -------
+    weights: pandas.DataFrame
+        Optimal asset weights, one row per point.
+    risks: numpy.ndarray
+        Standard deviations of the portfolio returns.
+    rets: numpy.ndarray
+        Expected portfolio returns.
+    """
+    if method == 'cla':
+        if allow_short:
+            raise ValueError("The critical line algorithm requires long-only portfolios")
 
-    # Constraints Gx <= h
-    if not allow_short:
-        # exp_rets*x >= 1 and x >= 0
-        G = opt.matrix(np.vstack((-exp_rets.values,
-                                  -np.identity(n))))
-        h = opt.matrix(np.vstack((-1.0,
-                                  np.zeros((n, 1)))))
-    else:
-        # exp_rets*x >= 1
-        G = opt.matrix(-exp_rets.values).T
-        h = opt.matrix(-1.0)
+        return CriticalLineAlgorithm(cov_mat, exp_rets).frontier(n_points)
 
-    # Solve
-    optsolvers.options['show_progress'] = False
-    sol = optsolvers.qp(P, q, G, h)
+    elif method != 'qp':
+        raise ValueError("Unknown method '{}'".format(method))
 
-    if sol['status'] != 'optimal':
-        warnings.warn("Convergence problem")
+    problem = PortfolioProblem(cov_mat, exp_rets, allow_short=allow_short,
+                               solver=solver, solver_options=solver_options)
+    return problem.frontier(n_points)
 
-    # Put weights into a labeled series
-    weights = pd.Series(sol['x'], index=cov_mat.index)
 
-    # Rescale weights, so that sum(weights) = 1
-    weights /= weights.sum()
-    return weights
+class PortfolioProblem(object):
+    """
+    Portfolio optimization problem for a fixed covariance matrix and
+    fixed expected returns. The solver matrices (and, for long/short
+    portfolios, the Cholesky factorization of the covariance matrix)
+    are built on first use and shared by all subsequent solves. This
+    makes repeated optimizations, e.g. for many target returns, much
+    cheaper than repeated calls of markowitz_portfolio().
+
+    This class validates and labels the pandas inputs and outputs, the
+    optimization itself is done by portfolioopt.core.PortfolioProblem
+    on the underlying arrays.
+
+    Parameters
+    ----------
+    cov_mat: pandas.DataFrame or FactorCovariance
+        Covariance matrix of asset returns. A float32 DataFrame
+        is used without copying.
+    exp_rets: pandas.Series, optional
+        Expected asset returns (often historical returns).
+        Required by solve() and tangency().
+    allow_short: bool, optional
+        If 'False' construct long-only portfolios.
+        If 'True' allow shorting, i.e. negative weights.
+    market_neutral: bool, optional
+        If 'False' sum of weights equals one.
+        If 'True' sum of weights equal zero, i.e. create
+            market neutral portfolios (implies allow_short=True).
+            Only applies to solve().
+    solver: str, optional
+        QP solver backend, 'cvxopt' (interior point), 'active_set'
+        (dense active-set method in pure NumPy, fast for small
+        problems), any name registered via register_solver() or
+        'auto' to choose by problem size.
+    solver_options: dict, optional
+        Options of the solver, e.g. 'abstol', 'reltol', 'feastol',
+        'maxiters' or 'show_progress' for cvxopt. The global
+        cvxopt.solvers.options are neither used nor modified.
+    """
+
+    def __init__(self, cov_mat, exp_rets=None,
+                 allow_short=False, market_neutral=False,
+                 solver='cvxopt', solver_options=None):
+        if not isinstance(cov_mat, (pd.DataFrame, FactorCovariance)):
+            raise ValueError("Covariance matrix is not a DataFrame or FactorCovariance")
+
+        if exp_rets is not None:
+            if not isinstance(exp_rets, pd.Series):
+                raise ValueError("Expected returns is not a Series")
+
+            if not cov_mat.index.equals(exp_rets.index):
+                raise ValueError("Indices do not match")
+
+        self.cov_mat = cov_mat
+        self.exp_rets = exp_rets
+
+        # All computations are done by the NumPy core on the raw arrays
+        self._problem = core.PortfolioProblem(
+            cov_mat if isinstance(cov_mat, FactorCovariance) else cov_mat.values,
+            exp_rets.values if exp_rets is not None else None,
+            allow_short=allow_short, market_neutral=market_neutral,
+            solver=solver, solver_options=solver_options)
+
+        self.allow_short = self._problem.allow_short
+        self.market_neutral = market_neutral
+        self.solver = solver
+        self.solver_options = self._problem.solver_options
+
+    def solve(self, target_ret, initvals=None, return_initvals=False,
+              return_result=False):
+        """
+        Computes the Markowitz portfolio for a target return.
+
+        Parameters
+        ----------
+        target_ret: float
+            Target return of portfolio.
+        initvals: pandas.Series or dict, optional
+            Initial values to warm-start the solver. Either the weights
+            of a previous solution or the primal/dual solution returned
+            by a previous call with return_initvals=True.
+        return_initvals: bool, optional
+            If 'True' also return the primal/dual solution, which can be
+            used to warm-start the next call.
+        return_result: bool, optional
+            If 'True' also return a SolveResult with the solver status,
+            iterations, duality gap, residuals and timings.
+
+        Returns
+        -------
+        weights: pandas.Series
+            Optimal asset weights.
+        initvals: dict
+            Primal/dual solution with keys 'x', 's', 'y' and 'z'
+            (only returned if return_initvals=True).
+        result: SolveResult
+            Diagnostics of the solve (only returned if return_result=True).
+        """
+        if not isinstance(target_ret, float):
+            raise ValueError("Target return is not a float")
+
+        self._check_exp_rets()
+
+        result = self._problem.solve(target_ret, initvals=self._initvals(initvals),
+                                     return_initvals=return_initvals,
+                                     return_result=return_result)
+        return self._result(result, return_initvals, return_result)
+
+    def min_var(self, initvals=None, return_initvals=False, return_result=False):
+        """
+        Computes the minimum variance portfolio.
+
+        Parameters
+        ----------
+        initvals: pandas.Series or dict, optional
+            Initial values to warm-start the solver. Either the weights
+            of a previous solution or the primal/dual solution returned
+            by a previous call with return_initvals=True.
+        return_initvals: bool, optional
+            If 'True' also return the primal/dual solution, which can be
+            used to warm-start the next call.
+        return_result: bool, optional
+            If 'True' also return a SolveResult with the solver status,
+            iterations, duality gap, residuals and timings.
+
+        Returns
+        -------
+        weights: pandas.Series
+            Optimal asset weights.
+        initvals: dict
+            Primal/dual solution with keys 'x', 's', 'y' and 'z'
+            (only returned if return_initvals=True).
+        result: SolveResult
+            Diagnostics of the solve (only returned if return_result=True).
+        """
+        result = self._problem.min_var(initvals=self._initvals(initvals),
+                                       return_initvals=return_initvals,
+                                       return_result=return_result)
+        return self._result(result, return_initvals, return_result)
+
+    def tangency(self, initvals=None, return_initvals=False, return_result=False):
+        """
+        Computes the tangency portfolio, i.e. the maximum Sharpe ratio portfolio.
+
+        Note: The returned primal/dual solution refers to the
+        unnormalized solution of the QP, i.e. before the weights
+        are rescaled to sum(weights) = 1.
+
+        Parameters
+        ----------
+        initvals: pandas.Series or dict, optional
+            Initial values to warm-start the solver. Either the weights
+            of a previous solution or the primal/dual solution returned
+            by a previous call with return_initvals=True.
+        return_initvals: bool, optional
+            If 'True' also return the primal/dual solution, which can be
+            used to warm-start the next call.
+        return_result: bool, optional
+            If 'True' also return a SolveResult with the solver status,
+            iterations, duality gap, residuals and timings.
+
+        Returns
+        -------
+        weights: pandas.Series
+            Optimal asset weights.
+        initvals: dict
+            Primal/dual solution with keys 'x', 's', 'y' and 'z'
+            (only returned if return_initvals=True).
+        result: SolveResult
+            Diagnostics of the solve (only returned if return_result=True).
+        """
+        self._check_exp_rets()
+
+        result = self._problem.tangency(initvals=self._initvals(initvals),
+                                        return_initvals=return_initvals,
+                                        return_result=return_result)
+        return self._result(result, return_initvals, return_result)
+
+    def frontier(self, n_points=20):
+        """
+        Computes portfolios on the efficient frontier for target returns
+        evenly spaced between the return of the minimum variance portfolio
+        and the maximum expected asset return.
+
+        For long/short portfolios every point is a combination of the same
+        two portfolios (two-fund theorem), so the whole frontier follows
+        from a single factorization of the covariance matrix. For long-only
+        portfolios each point is warm-started from its neighbour.
+
+        Parameters
+        ----------
+        n_points: int, optional
+            Number of points on the frontier.
+
+        Returns
+        -------
+        weights: pandas.DataFrame
+            Optimal asset weights, one row per point.
+        risks: numpy.ndarray
+            Standard deviations of the portfolio returns.
+        rets: numpy.ndarray
+            Expected portfolio returns.
+        """
+        self._check_exp_rets()
+
+        values, risks, rets = self._problem.frontier(n_points)
+
+        weights = pd.DataFrame(values, columns=self.cov_mat.index)
+        return weights, risks, rets
+
+    def _check_exp_rets(self):
+        if self.exp_rets is None:
+            raise ValueError("Expected returns is not a Series")
+
+    def _initvals(self, initvals):
+        """
+        Aligns labeled initial values with the assets of the problem.
+        Assets which are not part of a previous solution start at zero.
+        """
+        if initvals is None:
+            return None
+
+        if isinstance(initvals, pd.Series):
+            initvals = {'x': initvals}
+
+        return dict((key, value.reindex(self.cov_mat.index).fillna(0.0).values
+                     if isinstance(value, pd.Series) else value)
+                    for key, value in initvals.items())
+
+    def _result(self, result, return_initvals, return_result):
+        if not (return_initvals or return_result):
+            return pd.Series(result, index=self.cov_mat.index)
+
+        start = time.perf_counter()
+
+        result = list(result)
+        result[0] = pd.Series(result[0], index=self.cov_mat.index)
+
+        if return_result:
+            # Labeling the weights is part of the post-processing
+            post_time = result[-1].post_time + time.perf_counter() - start
+            result[-1] = result[-1]._replace(post_time=post_time)
+
+        return tuple(result)
 
 
 def max_ret_portfolio(exp_rets):
@@ -307,3 +575,5 @@ def truncate_weights(weights, min_weight=0.01, rescale=True):
         adj_weights /= adj_weights.sum()
 
     return adj_weights
+
+
@@ -0,0 +1,534 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2015 Christian Zielinski
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""Local optimization service, i.e. an HTTP server on a TCP port or a
+Unix socket answering portfolio optimization requests in JSON, so that
+client processes need neither cvxopt nor pandas.
+
+Run it with
+
+    python -m portfolioopt.server --port 8765
+    python -m portfolioopt.server --unix /tmp/portfolioopt.sock
+
+Endpoints (all bodies and responses are JSON objects):
+
+    POST /problems  {"cov_mat": matrix, "exp_rets": vector}
+                    -> {"problem": id}
+    POST /solve     {"problem": id or "cov_mat"/"exp_rets" inline,
+                     "kind": "markowitz", "min_var" or "tangency",
+                     "target_ret": float, "allow_short": bool,
+                     "market_neutral": bool}
+                    -> {"weights": [...], "status": str}
+    GET  /stats     -> counters of requests, batches and solves
+
+Matrices and vectors are nested lists of numbers or, more compactly,
+objects {"dtype": "<f8" or "<f4", "shape": [...], "data": base64} of
+the raw little-endian values."""
+
+import argparse
+import asyncio
+import base64
+import collections
+import hashlib
+import json
+
+import numpy as np
+
+from .aio import AsyncOptimizer
+from .core import PortfolioProblem
+
+
+__all__ = ['OptimizationServer']
+
+
+_KINDS = ('markowitz', 'min_var', 'tangency')
+
+_DTYPES = ('<f8', '<f4')
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+            405: 'Method Not Allowed', 413: 'Payload Too Large',
+            500: 'Internal Server Error', 504: 'Gateway Timeout'}
+
+
+class _RequestError(ValueError):
+    """Invalid request, answered with the given HTTP status."""
+
+    def __init__(self, message, status=400):
+        super(_RequestError, self).__init__(message)
+        self.status = status
+
+
+class OptimizationServer(object):
+    """
+    Portfolio optimization service. Concurrent requests for the same
+    problem and constraints are coalesced into one batch, which is solved
+    in a single executor call: identical requests are solved once and
+    Markowitz portfolios are solved in order of their target returns,
+    warm-starting the solver. The problems are kept in memory with their
+    solver matrices and factorizations, least recently used ones are
+    evicted first.
+
+    Parameters
+    ----------
+    max_problems: int, optional
+        Number of problems kept in memory.
+    coalesce_delay: float, optional
+        Time in seconds for which a batch collects requests after the
+        first one arrived.
+    max_concurrency: int, optional
+        Maximum number of batches solved at a time.
+    timeout: float, optional
+        Timeout in seconds of a batch, None for no timeout.
+    max_body_size: int, optional
+        Maximum size of a request body in bytes.
+    solver: str, optional
+        QP solver backend (see PortfolioProblem).
+    solver_options: dict, optional
+        Options of the solver.
+    """
+
+    def __init__(self, max_problems=32, coalesce_delay=0.002, max_concurrency=None,
+                 timeout=None, max_body_size=2**30, solver='cvxopt', solver_options=None):
+        if max_problems < 1:
+            raise ValueError("Number of problems is not positive")
+
+        self.max_problems = max_problems
+        self.coalesce_delay = coalesce_delay
+        self.max_body_size = max_body_size
+        self.solver = solver
+        self.solver_options = solver_options
+        self.stats = {'requests': 0, 'batches': 0, 'solves': 0, 'problems': 0}
+
+        self._optimizer = AsyncOptimizer(max_concurrency=max_concurrency, timeout=timeout)
+        self._problems = collections.OrderedDict()
+        self._pending = {}
+        self._batches = set()
+        self._server = None
+
+    async def start(self, host='127.0.0.1', port=8765, path=None):
+        """
+        Starts listening on a TCP port of host or, if path is given,
+        on a Unix socket. Use port 0 to pick a free port.
+
+        Returns
+        -------
+        address: tuple or str
+            The (host, port) or path the server listens on.
+        """
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self._handle, path=path)
+            return path
+
+        self._server = await asyncio.start_server(self._handle, host=host, port=port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def close(self):
+        """
+        Stops listening, solves the batches still collecting requests,
+        waits for the running batches and shuts down the executor.
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+        for group in list(self._pending):
+            self._flush(group)
+
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+
+        self._optimizer.close()
+
+    def register(self, cov_mat, exp_rets=None):
+        """
+        Keeps a problem in memory.
+
+        Parameters
+        ----------
+        cov_mat: numpy.ndarray
+            Covariance matrix of asset returns (float64 or float32).
+        exp_rets: numpy.ndarray, optional
+            Expected asset returns.
+
+        Returns
+        -------
+        problem: str
+            Identifier of the problem, a hash of its data.
+        """
+        cov_mat, exp_rets = _check_problem(cov_mat, exp_rets)
+        return self._store(_problem_key(cov_mat, exp_rets), cov_mat, exp_rets)
+
+    async def _register(self, cov_mat, exp_rets):
+        # As register(), but hashes large matrices off the event loop
+        cov_mat, exp_rets = _check_problem(cov_mat, exp_rets)
+        key = await self._optimizer.run(_problem_key, cov_mat, exp_rets)
+        return self._store(key, cov_mat, exp_rets)
+
+    def _store(self, key, cov_mat, exp_rets):
+        if key not in self._problems:
+            self._problems[key] = {'cov_mat': cov_mat, 'exp_rets': exp_rets, 'instances': {}}
+            self.stats['problems'] += 1
+
+            while len(self._problems) > self.max_problems:
+                self._problems.popitem(last=False)
+
+        self._problems.move_to_end(key)
+        return key
+
+    async def solve(self, request):
+        """
+        Answers a solve request (a dict as described in the module
+        documentation), coalescing it with concurrent requests.
+
+        Returns
+        -------
+        response: dict
+            Weights (None if the solve failed) and status.
+        """
+        self.stats['requests'] += 1
+
+        kind = request.get('kind', 'markowitz')
+        if kind not in _KINDS:
+            raise _RequestError("Unknown portfolio kind '{}'".format(kind))
+
+        target_ret = None
+        if kind == 'markowitz':
+            if not isinstance(request.get('target_ret'), (int, float)):
+                raise _RequestError("Target return is required")
+            target_ret = float(request['target_ret'])
+
+        if 'problem' in request:
+            key = request['problem']
+            if key not in self._problems:
+                raise _RequestError("Unknown problem '{}'".format(key), status=404)
+            self._problems.move_to_end(key)
+        else:
+            if 'cov_mat' not in request:
+                raise _RequestError("Covariance matrix or problem is required")
+            key = await self._register(_decode_array(request['cov_mat'], 2),
+                                       _decode_array(request['exp_rets'], 1)
+                                       if request.get('exp_rets') is not None else None)
+
+        if kind != 'min_var' and self._problems[key]['exp_rets'] is None:
+            raise _RequestError("Expected returns are required")
+
+        group = (key, bool(request.get('allow_short', False)),
+                 bool(request.get('market_neutral', False)))
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        if group not in self._pending:
+            self._pending[group] = []
+            loop.call_later(self.coalesce_delay, self._flush, group)
+        self._pending[group].append(((kind, target_ret), future))
+
+        weights, status = await future
+        return {'weights': None if weights is None else weights.tolist(), 'status': status}
+
+    def _flush(self, group):
+        # No-op if close() already flushed the group
+        requests = self._pending.pop(group, None)
+        if requests is None:
+            return
+
+        # Keep a reference, the event loop only keeps a weak one
+        batch = asyncio.ensure_future(self._solve_batch(group, requests))
+        self._batches.add(batch)
+        batch.add_done_callback(self._batches.discard)
+
+    async def _solve_batch(self, group, requests):
+        key, allow_short, market_neutral = group
+        problem = self._problems.get(key)
+        tasks = sorted(set(task for task, future in requests), key=_task_order)
+
+        try:
+            if problem is None:
+                raise _RequestError("Unknown problem '{}'".format(key), status=404)
+
+            # Kept with the problem, so that its solver matrices are reused
+            instance = problem['instances'].get((allow_short, market_neutral))
+            if instance is None:
+                instance = PortfolioProblem(problem['cov_mat'], problem['exp_rets'],
+                                            allow_short=allow_short,
+                                            market_neutral=market_neutral,
+                                            solver=self.solver,
+                                            solver_options=self.solver_options)
+                problem['instances'][(allow_short, market_neutral)] = instance
+
+            self.stats['batches'] += 1
+            results = await self._optimizer.run(_solve_tasks, instance, tasks)
+            self.stats['solves'] += len(results)
+        except Exception as error:
+            for task, future in requests:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        for task, future in requests:
+            if not future.done():
+                future.set_result(results[task])
+
+    async def _handle(self, reader, writer):
+        """Serves the HTTP/1.1 requests of one connection."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                try:
+                    method, path, version = line.decode('latin-1').split()
+                except ValueError:
+                    await _respond(writer, 400, {'error': "Malformed request line"}, False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = (version == 'HTTP/1.1' and
+                              headers.get('connection', '').lower() != 'close')
+
+                # Only GET requests may omit the body length
+                length = headers.get('content-length', '0' if method == 'GET' else None)
+                try:
+                    length = int(length)
+                except (TypeError, ValueError):
+                    length = -1
+
+                if length < 0:
+                    await _respond(writer, 400, {'error': "Missing or invalid Content-Length"},
+                                   False)
+                    break
+
+                if length > self.max_body_size:
+                    await _respond(writer, 413, {'error': "Request body too large"}, False)
+                    break
+
+                body = await reader.readexactly(length)
+                status, payload = await self._dispatch(method, path, body)
+                await _respond(writer, status, payload, keep_alive)
+
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, path, body):
+        try:
+            if path == '/stats':
+                if method != 'GET':
+                    raise _RequestError("Use GET", status=405)
+                return 200, dict(self.stats)
+
+            if path not in ('/problems', '/solve'):
+                raise _RequestError("Unknown path '{}'".format(path), status=404)
+
+            if method != 'POST':
+                raise _RequestError("Use POST", status=405)
+
+            try:
+                request = json.loads(body)
+            except ValueError:
+                raise _RequestError("Body is not valid JSON")
+
+            if not isinstance(request, dict):
+                raise _RequestError("Body is not a JSON object")
+
+            if path == '/problems':
+                if 'cov_mat' not in request:
+                    raise _RequestError("Covariance matrix is required")
+                exp_rets = request.get('exp_rets')
+                return 200, {'problem': await self._register(
+                    _decode_array(request['cov_mat'], 2),
+                    _decode_array(exp_rets, 1) if exp_rets is not None else None)}
+
+            return 200, await self.solve(request)
+        except _RequestError as error:
+            return error.status, {'error': str(error)}
+        except asyncio.TimeoutError:
+            return 504, {'error': "Solve timed out"}
+        except Exception as error:
+            return 500, {'error': "{}: {}".format(type(error).__name__, error)}
+
+
+def _check_problem(cov_mat, exp_rets):
+    """
+    Validates a problem and converts it to contiguous float64 (or
+    float32 for the covariance matrix) arrays.
+    """
+    cov_mat = np.ascontiguousarray(cov_mat)
+    if cov_mat.dtype != np.float32:
+        cov_mat = np.ascontiguousarray(cov_mat, dtype=np.float64)
+
+    if cov_mat.ndim != 2 or cov_mat.shape[0] != cov_mat.shape[1]:
+        raise _RequestError("Covariance matrix is not square")
+
+    if exp_rets is not None:
+        exp_rets = np.ascontiguousarray(exp_rets, dtype=np.float64)
+        if exp_rets.shape != (len(cov_mat),):
+            raise _RequestError("Expected returns do not match covariance matrix")
+
+    return cov_mat, exp_rets
+
+
+def _problem_key(cov_mat, exp_rets):
+    """Hashes the data of a problem."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str((cov_mat.shape, cov_mat.dtype.str)).encode())
+    digest.update(cov_mat)
+    if exp_rets is not None:
+        digest.update(exp_rets)
+    return digest.hexdigest()
+
+
+def _task_order(task):
+    # Markowitz portfolios by target return, i.e. along the frontier
+    kind, target_ret = task
+    return kind, target_ret if target_ret is not None else 0.0
+
+
+def _solve_tasks(problem, tasks):
+    """
+    Solves a batch of (kind, target_ret) tasks of one problem in the
+    executor, warm-starting consecutive Markowitz portfolios.
+    """
+    results = {}
+    initvals = None
+
+    for kind, target_ret in tasks:
+        try:
+            # Unattainable target returns overflow in the solver
+            with np.errstate(over='ignore', divide='ignore', invalid='ignore'):
+                if kind == 'markowitz':
+                    weights, initvals, result = problem.solve(target_ret, initvals=initvals,
+                                                              return_initvals=True,
+                                                              return_result=True)
+                    if result.status != 'optimal':
+                        initvals = None
+                elif kind == 'min_var':
+                    weights, result = problem.min_var(return_result=True)
+                else:
+                    weights, result = problem.tangency(return_result=True)
+
+            results[kind, target_ret] = (np.array(weights), result.status)
+        except (ValueError, ArithmeticError):
+            results[kind, target_ret] = (None, 'failed')
+            if kind == 'markowitz':
+                initvals = None
+
+    return results
+
+
+def _decode_array(value, ndim):
+    """Decodes a nested list or a base64 encoded array."""
+    if isinstance(value, dict):
+        try:
+            dtype = value['dtype']
+            shape = tuple(value['shape'])
+            data = base64.b64decode(value['data'], validate=True)
+        except (KeyError, TypeError, ValueError):
+            raise _RequestError("Malformed binary array")
+
+        if dtype not in _DTYPES:
+            raise _RequestError("Binary arrays must be of type {}".format(' or '.join(_DTYPES)))
+
+        if len(data) != int(np.prod(shape)) * np.dtype(dtype).itemsize:
+            raise _RequestError("Binary array does not match its shape")
+
+        array = np.frombuffer(data, dtype=dtype).reshape(shape)
+        array = array.astype(array.dtype.newbyteorder('='), copy=False)
+    else:
+        try:
+            array = np.array(value, dtype=np.float64)
+        except (TypeError, ValueError):
+            raise _RequestError("Array is not numeric")
+
+    if array.ndim != ndim:
+        raise _RequestError("Array has the wrong number of dimensions")
+
+    return array
+
+
+async def _respond(writer, status, payload, keep_alive):
+    body = json.dumps(payload).encode()
+    head = ("HTTP/1.1 {} {}\r\n"
+            "Content-Type: application/json\r\n"
+            "Content-Length: {}\r\n"
+            "Connection: {}\r\n\r\n").format(status, _REASONS.get(status, ''), len(body),
+                                             'keep-alive' if keep_alive else 'close')
+    writer.write(head.encode('latin-1') + body)
+    await writer.drain()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m portfolioopt.server',
+                                     description="Local portfolio optimization service")
+    parser.add_argument('--host', default='127.0.0.1',
+                        help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8765,
+                        help="TCP port to listen on (default: 8765)")
+    parser.add_argument('--unix', metavar='PATH',
+                        help="Listen on a Unix socket instead of a TCP port")
+    parser.add_argument('--max-problems', type=int, default=32,
+                        help="Number of problems kept in memory (default: 32)")
+    parser.add_argument('--coalesce-delay', type=float, default=0.002,
+                        help="Seconds a batch collects requests (default: 0.002)")
+    parser.add_argument('--max-concurrency', type=int,
+                        help="Maximum number of batches solved at a time")
+    parser.add_argument('--timeout', type=float,
+                        help="Timeout of a batch in seconds")
+    parser.add_argument('--solver', default='cvxopt',
+                        help="QP solver backend (default: cvxopt)")
+    args = parser.parse_args(argv)
+
+    async def serve():
+        server = OptimizationServer(max_problems=args.max_problems,
+                                    coalesce_delay=args.coalesce_delay,
+                                    max_concurrency=args.max_concurrency,
+                                    timeout=args.timeout, solver=args.solver)
+        address = await server.start(host=args.host, port=args.port, path=args.unix)
+        print("Serving portfolio optimization on {}".format(address))
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
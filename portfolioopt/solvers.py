@@ -0,0 +1,382 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2015 Christian Zielinski
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""QP solver backends for the portfolio optimization functions.
+
+Backends are registered by name and selected per problem, either
+explicitly or with 'auto' based on the problem size. Besides cvxopt's
+interior-point solver a dense primal active-set solver written in pure
+NumPy is provided, which is much faster for small universes."""
+
+from collections import namedtuple
+import time
+
+import numpy as np
+
+
+__all__ = ['QPConstraints',
+           'register_solver',
+           'available_solvers']
+
+
+# Largest universe solved with the active-set method if solver='auto'
+AUTO_ACTIVE_SET_MAX_ASSETS = 30
+
+
+class QPConstraints(namedtuple('QPConstraints', ['target_ret', 'long_only', 'budget'])):
+    """
+    Constraints of a portfolio QP
+
+        exp_rets^T * x >= target_ret  (if target_ret is not None)
+        x >= 0                        (if long_only)
+        sum(x) = budget               (if budget is not None)
+
+    The inequality rows are ordered as [return row, bounds],
+    which defines the layout of the 's' and 'z' solution vectors.
+    """
+    __slots__ = ()
+
+    def num_inequalities(self, n):
+        return (1 if self.target_ret is not None else 0) + (n if self.long_only else 0)
+
+    def num_equalities(self):
+        return 1 if self.budget is not None else 0
+
+
+_solvers = {}
+
+
+def register_solver(name, solve):
+    """
+    Registers a QP solver backend, which can then be selected
+    via the 'solver' argument of the optimization functions.
+
+    Parameters
+    ----------
+    name: str
+        Name of the backend.
+    solve: callable
+        Function solve(problem, constraints, initvals), where problem
+        is a portfolioopt.core.PortfolioProblem, constraints are QPConstraints and initvals
+        is None or a dict of initial values ('x', 's', 'y', 'z' arrays).
+        Must return a dict with keys 'status' ('optimal' on success),
+        'iterations' and the primal/dual solution 'x', 's', 'y', 'z'
+        as numpy arrays. May also contain 'gap', 'primal infeasibility',
+        'dual infeasibility' and 'solve time' (seconds spent in the
+        solver itself), which are reported in SolveResult.
+    """
+    if not callable(solve):
+        raise ValueError("Solver is not callable")
+
+    _solvers[name] = solve
+
+
+def available_solvers():
+    """
+    Returns the names of all registered QP solver backends.
+
+    Returns
+    -------
+    names: list
+        Names of the backends, which can be passed as 'solver'.
+        'auto' is always accepted in addition.
+    """
+    return sorted(_solvers)
+
+
+def _resolve_solver(name, problem):
+    """
+    Returns the backend name for a solver name. 'auto' selects the
+    active-set solver for small dense problems and cvxopt otherwise.
+    """
+    if name == 'auto':
+        if not problem._factor_model and len(problem.cov_mat) <= AUTO_ACTIVE_SET_MAX_ASSETS:
+            return 'active_set'
+        else:
+            return 'cvxopt'
+
+    return name
+
+
+def _get_solver(name, problem):
+    """
+    Returns the backend for a solver name, see _resolve_solver().
+    """
+    name = _resolve_solver(name, problem)
+
+    if name not in _solvers:
+        raise ValueError("Unknown solver '{}'".format(name))
+
+    return _solvers[name]
+
+
+def _cvxopt_solver(problem, constraints, initvals):
+    return problem._solve_cvxopt(constraints, initvals)
+
+
+def _active_set_solver(problem, constraints, initvals):
+    """
+    Solves the portfolio QP with the dense active-set method,
+    starting from a feasible point built from the constraints.
+    """
+    if problem._factor_model:
+        P = problem.cov_mat.to_frame().values
+    else:
+        P = np.asarray(problem.cov_mat, dtype=float)
+
+    n = len(P)
+    mu = problem.exp_rets if constraints.target_ret is not None else None
+
+    # Constraints Gx <= h
+    G_rows, h_rows = [], []
+    if constraints.target_ret is not None:
+        # exp_rets*x >= target_ret
+        G_rows.append(-mu[None, :])
+        h_rows.append([-constraints.target_ret])
+    if constraints.long_only:
+        # x >= 0
+        G_rows.append(-np.identity(n))
+        h_rows.append(np.zeros(n))
+
+    G = np.vstack(G_rows) if G_rows else np.zeros((0, n))
+    h = np.concatenate(h_rows) if h_rows else np.zeros(0)
+
+    # Constraints Ax = b
+    if constraints.budget is not None:
+        A = np.ones((1, n))
+        b = np.array([constraints.budget])
+    else:
+        A = np.zeros((0, n))
+        b = np.zeros(0)
+
+    options = problem.solver_options
+    tol = options.get('feastol', 1e-9)
+
+    x0 = None
+    if initvals is not None and 'x' in initvals:
+        x0 = initvals['x']
+        if not (np.all(np.dot(G, x0) - h <= tol) and np.allclose(np.dot(A, x0), b)):
+            x0 = None
+
+    if x0 is None:
+        x0 = _feasible_point(constraints, n, mu, tol)
+
+    if x0 is None:
+        raise ValueError("Constraints are infeasible")
+
+    # As cvxopt, reject problems whose objective is not bounded by P and the
+    # constraints, e.g. a singular covariance matrix without bounds. The
+    # covariance matrix is scaled to the constraint rows for the rank test.
+    scale = np.abs(P).max()
+    stacked = np.vstack((P / scale if scale > 0.0 else P, A, G))
+    if np.linalg.matrix_rank(stacked) < n:
+        raise ValueError("Rank(A) < p or Rank([P; A; G]) < n")
+
+    begin = time.perf_counter()
+    sol = _active_set_qp(P, np.zeros(n), G, h, A, b, x0,
+                         maxiters=options.get('maxiters'), tol=tol)
+    sol['solve time'] = time.perf_counter() - begin
+    return sol
+
+
+def _feasible_point(constraints, n, mu, tol):
+    """
+    Constructs a feasible starting point for the portfolio
+    constraints, or returns None if they are infeasible.
+    Target returns are attainable up to tol relative to the
+    largest absolute expected return.
+    """
+    target_ret, long_only, budget = constraints
+
+    if not long_only:
+        # Minimum norm solution of the constraints, taken as equalities
+        rows, rhs = [], []
+        if budget is not None:
+            rows.append(np.ones(n))
+            rhs.append(budget)
+        if target_ret is not None:
+            rows.append(mu)
+            rhs.append(target_ret)
+
+        rows, rhs = np.array(rows), np.array(rhs)
+        x = np.linalg.lstsq(rows, rhs, rcond=None)[0]
+
+        # Inconsistent equalities, e.g. a target return for equal returns
+        if not np.allclose(np.dot(rows, x), rhs):
+            return None
+
+        return x
+
+    uniform = np.ones(n) / n
+
+    if target_ret is None:
+        return uniform * (budget if budget is not None else 1.0)
+
+    k = np.argmax(mu)
+
+    if budget is None:
+        # exp_rets*x >= target_ret without budget, scale a positive portfolio
+        if mu[k] <= 0.0:
+            return None
+
+        x = uniform if np.dot(uniform, mu) > 0.0 else np.identity(n)[k]
+        return x * max(target_ret / np.dot(x, mu), 0.0)
+
+    if mu[k] < target_ret - tol * max(1.0, np.abs(mu).max()):
+        return None
+
+    # Mix the uniform and the maximum return portfolio to reach target_ret
+    mean_ret = np.dot(uniform, mu)
+    if mean_ret >= target_ret:
+        return uniform
+
+    t = max(mu[k] - target_ret, 0.0) / (mu[k] - mean_ret)
+    x = t * uniform
+    x[k] += 1.0 - t
+    return x
+
+
+def _active_set_qp(P, q, G, h, A, b, x0, maxiters=None, tol=1e-9):
+    """
+    Solves the QP
+
+        minimize    (1/2)*x'*P*x + q'*x
+        subject to  G*x <= h
+                    A*x = b
+
+    with a primal active-set method, starting from the feasible
+    point x0 with an empty working set. Each iteration solves the
+    equality constrained subproblem on the current working set via
+    its dense KKT system. Rows of G which are simple bounds fix a
+    variable when they are in the working set and are eliminated
+    from the KKT system instead of being added to it. The multipliers
+    follow cvxopt's convention, i.e. P*x + q + A'*y + G'*z = 0 with
+    z >= 0 at the optimum.
+    """
+    n = len(q)
+    m = len(h)
+    p = len(b)
+
+    if maxiters is None:
+        maxiters = 10 * (n + m) + 10
+
+    # Variable bounded by each row of G, or -1 for general rows
+    nonzeros = (G != 0.0).sum(axis=1)
+    bound_var = np.where(nonzeros == 1, np.argmax(G != 0.0, axis=1), -1)
+
+    x = np.array(x0, dtype=float)
+    working = []
+    status = 'unknown'
+    y = np.zeros(p)
+    z = np.zeros(m)
+
+    for iteration in range(1, maxiters + 1):
+        general = [i for i in working if bound_var[i] < 0]
+        free = np.ones(n, dtype=bool)
+        free[[bound_var[i] for i in working if bound_var[i] >= 0]] = False
+
+        Aw = np.vstack((A, G[general]))
+        k = len(Aw)
+        nf = free.sum()
+
+        K = np.zeros((nf + k, nf + k))
+        K[:nf, :nf] = P[np.ix_(free, free)]
+        K[:nf, nf:] = Aw[:, free].T
+        K[nf:, :nf] = Aw[:, free]
+
+        grad = np.dot(P, x) + q
+        rhs = np.concatenate((-grad[free], np.zeros(k)))
+
+        try:
+            sol = np.linalg.solve(K, rhs)
+        except np.linalg.LinAlgError:
+            sol = None
+
+        if sol is None or not np.all(np.isfinite(sol)):
+            # Singular KKT system, e.g. a singular covariance matrix with many
+            # free variables. A consistent system has a minimum norm solution,
+            # an inconsistent one a descent direction without curvature.
+            sol = np.linalg.lstsq(K, rhs, rcond=None)[0]
+            if not np.allclose(np.dot(K, sol), rhs, rtol=1e-6,
+                               atol=1e-9 * max(1.0, np.abs(rhs).max())):
+                raise ValueError("Objective is unbounded on the constraints")
+
+        step = np.zeros(n)
+        step[free] = sol[:nf]
+        lagrange = sol[nf:]
+
+        if np.abs(step).max() <= tol * max(1.0, np.abs(x).max()):
+            # Multipliers of the working set, bounds follow from stationarity
+            residual = grad + np.dot(Aw.T, lagrange)
+            z_working = np.empty(len(working))
+            for pos, i in enumerate(working):
+                if bound_var[i] < 0:
+                    z_working[pos] = lagrange[p + general.index(i)]
+                else:
+                    z_working[pos] = -residual[bound_var[i]] / G[i, bound_var[i]]
+
+            scale = max(1.0, np.abs(lagrange).max() if k else 0.0,
+                        np.abs(z_working).max() if working else 0.0)
+
+            if not working or z_working.min() >= -tol * scale:
+                y = lagrange[:p]
+                z[:] = 0.0
+                z[working] = np.maximum(z_working, 0.0)
+                status = 'optimal'
+                break
+
+            # Drop the constraint with the most negative multiplier
+            del working[int(np.argmin(z_working))]
+        else:
+            # Longest feasible step along the search direction
+            Gstep = np.dot(G, step)
+            slack = np.maximum(h - np.dot(G, x), 0.0)
+
+            candidates = Gstep > tol * max(1.0, np.abs(step).max())
+            candidates[working] = False
+
+            alpha = 1.0
+            blocking = None
+            if candidates.any():
+                ratios = np.full(m, np.inf)
+                ratios[candidates] = slack[candidates] / Gstep[candidates]
+                i = int(np.argmin(ratios))
+                if ratios[i] < 1.0:
+                    alpha, blocking = ratios[i], i
+
+            x += alpha * step
+            if blocking is not None:
+                working.append(blocking)
+
+    s = np.maximum(h - np.dot(G, x), 0.0)
+    residual = np.dot(P, x) + q + np.dot(A.T, y) + np.dot(G.T, z)
+    violation = np.concatenate((np.dot(G, x) - h, np.abs(np.dot(A, x) - b), [0.0]))
+
+    return {'status': status, 'iterations': iteration,
+            'x': x, 's': s, 'y': y, 'z': z,
+            'gap': float(np.dot(s, z)),
+            'primal infeasibility': float(violation.max()),
+            'dual infeasibility': float(np.abs(residual).max())}
+
+
+register_solver('cvxopt', _cvxopt_solver)
+register_solver('active_set', _active_set_solver)
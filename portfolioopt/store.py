@@ -0,0 +1,325 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2015 Christian Zielinski
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""Out-of-core storage of asset returns in memory-mapped .npy files,
+e.g. for universes whose returns do not fit into memory, and blockwise
+estimation of the portfolio optimization inputs from such a store."""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from .covariance import _BLOCK_ELEMENTS
+
+
+__all__ = ['ReturnsStore']
+
+
+_VALUES_FILE = 'returns.npy'
+_LABELS_FILE = 'labels.json'
+
+
+class ReturnsStore(object):
+    """
+    Asset returns stored on disk in a directory holding a memory-mapped
+    .npy file of dates x assets and the date and asset labels.
+
+    The values are stored in column-major (Fortran) order, so that the
+    returns of a block of assets are contiguous on disk. The moments are
+    computed reading blocks of columns, so the peak memory apart from the
+    n x n covariance matrix is bounded by the block size.
+
+    Parameters
+    ----------
+    path: str
+        Directory of an existing store.
+    mode: str, optional
+        Either 'r' to open the store read-only or 'r+' to allow
+        writing returns into it.
+    """
+
+    def __init__(self, path, mode='r'):
+        if mode not in ('r', 'r+'):
+            raise ValueError("Mode must be 'r' or 'r+'")
+
+        with open(os.path.join(path, _LABELS_FILE)) as f:
+            labels = json.load(f)
+
+        self.path = path
+        self.index = _load_index(labels)
+        self.columns = pd.Index(labels['columns'])
+        self.values = np.load(os.path.join(path, _VALUES_FILE), mmap_mode=mode)
+
+        if self.values.shape != (len(self.index), len(self.columns)):
+            raise ValueError("Returns do not match labels")
+
+    @classmethod
+    def create(cls, path, index, columns, dtype=np.float64):
+        """
+        Creates an empty store (filled with NaN) for the given dates and
+        assets, opened for writing. The returns can then be written by
+        assigning to store.values or with write().
+
+        Parameters
+        ----------
+        path: str
+            Directory of the store, created if it does not exist.
+        index: pandas.Index
+            Dates of the returns.
+        columns: pandas.Index
+            Assets of the returns.
+        dtype: numpy.dtype, optional
+            Type in which the returns are stored, e.g. numpy.float32
+            to halve the file size.
+
+        Returns
+        -------
+        store: ReturnsStore
+            The new store.
+        """
+        index = pd.Index(index)
+        columns = pd.Index(columns)
+
+        if not columns.is_unique:
+            raise ValueError("Assets are not unique")
+
+        if isinstance(index, pd.DatetimeIndex):
+            index_tz = None if index.tz is None else str(index.tz)
+            index_labels = [date.isoformat() for date in index.tz_localize(None)]
+        else:
+            index_tz = None
+            index_labels = index.tolist()
+
+        labels = {'index': index_labels,
+                  'index_tz': index_tz,
+                  'is_datetime': isinstance(index, pd.DatetimeIndex),
+                  'columns': columns.tolist()}
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        with open(os.path.join(path, _LABELS_FILE), 'w') as f:
+            json.dump(labels, f)
+
+        values = np.lib.format.open_memmap(os.path.join(path, _VALUES_FILE),
+                                           mode='w+', dtype=dtype,
+                                           shape=(len(index), len(columns)),
+                                           fortran_order=True)
+        values[:] = np.nan
+        values.flush()
+        del values
+
+        return cls(path, mode='r+')
+
+    @classmethod
+    def from_frame(cls, path, returns, dtype=np.float64):
+        """
+        Creates a store holding the given returns.
+
+        Parameters
+        ----------
+        path: str
+            Directory of the store, created if it does not exist.
+        returns: pandas.DataFrame
+            Asset returns with dates as index and assets as columns.
+        dtype: numpy.dtype, optional
+            Type in which the returns are stored.
+
+        Returns
+        -------
+        store: ReturnsStore
+            The new store, opened for writing.
+        """
+        if not isinstance(returns, pd.DataFrame):
+            raise ValueError("Returns is not a DataFrame")
+
+        store = cls.create(path, returns.index, returns.columns, dtype=dtype)
+        store.write(returns)
+        return store
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def write(self, returns):
+        """
+        Writes the returns of some or all assets into the store,
+        e.g. when loading a large universe asset by asset.
+
+        Parameters
+        ----------
+        returns: pandas.DataFrame or pandas.Series
+            Returns with the dates of the store as index and a subset of
+            its assets as columns, or the returns of a single asset.
+        """
+        if isinstance(returns, pd.Series):
+            returns = returns.to_frame()
+
+        if not isinstance(returns, pd.DataFrame):
+            raise ValueError("Returns is not a DataFrame")
+
+        if not returns.index.equals(self.index):
+            raise ValueError("Returns do not match the dates of the store")
+
+        positions = self.columns.get_indexer(returns.columns)
+        if (positions < 0).any():
+            raise ValueError("Returns contain assets not in the store")
+
+        # Contiguous runs of columns are written as one slice
+        values = np.asarray(returns.values, dtype=self.values.dtype)
+        order = np.argsort(positions, kind='stable')
+        positions = positions[order]
+        breaks = np.flatnonzero(np.diff(positions) != 1) + 1
+
+        for run in np.split(np.arange(len(positions)), breaks):
+            start = positions[run[0]]
+            self.values[:, start:start + len(run)] = values[:, order[run]]
+
+    def flush(self):
+        """Writes pending changes to disk."""
+        self.values.flush()
+
+    def moments(self, block_size=None, dtype=np.float64):
+        """
+        Computes the expected returns (means) and the covariance matrix
+        of the stored returns, the inputs of the portfolio optimization
+        functions, streaming blocks of columns from disk.
+
+        Missing values are excluded pairwise, as by DataFrame.mean() and
+        DataFrame.cov(). Every block is read once for the diagonal and
+        once for every later block, i.e. the returns are read about
+        n / (2 * block_size) times in total.
+
+        Parameters
+        ----------
+        block_size: int, optional
+            Number of assets per block. Defaults to blocks of about
+            four million elements.
+        dtype: numpy.dtype, optional
+            Type of the covariance matrix, numpy.float32 halves its
+            memory. The blocks are always computed in float64.
+
+        Returns
+        -------
+        cov_mat: pandas.DataFrame
+            Covariance matrix of asset returns.
+        avg_rets: pandas.Series
+            Average asset returns.
+        """
+        T, n = self.values.shape
+
+        if T < 2:
+            raise ValueError("At least two observations are required")
+
+        if block_size is None:
+            block_size = max(1, _BLOCK_ELEMENTS // T)
+
+        cov_mat = np.empty((n, n), dtype=dtype)
+        avg_rets = np.empty(n)
+
+        for i in range(0, n, block_size):
+            rows, mask, mean = self._read_block(i, i + block_size)
+            avg_rets[i:i + len(mean)] = mean
+            cols = slice(i, i + len(mean))
+            cov_mat[cols, cols] = _block_cov(rows, mask, rows, mask)
+
+            for j in range(i + block_size, n, block_size):
+                other_rows, other_mask, other_mean = self._read_block(j, j + block_size)
+                other = slice(j, j + len(other_mean))
+                block = _block_cov(rows, mask, other_rows, other_mask)
+                cov_mat[cols, other] = block
+                cov_mat[other, cols] = block.T
+
+                # Release the block before reading the next one
+                del other_rows, other_mask
+
+        cov_mat = pd.DataFrame(cov_mat, index=self.columns,
+                               columns=self.columns, copy=False)
+        return cov_mat, pd.Series(avg_rets, index=self.columns, copy=False)
+
+    def _read_block(self, start, stop):
+        """
+        Reads a block of columns into memory and returns the returns
+        shifted by their means with missing values set to zero, the
+        mask of valid values (None if there are no missing values) and
+        the means of the columns.
+        """
+        rows = np.array(self.values[:, start:stop], dtype=np.float64)
+        missing = np.isnan(rows)
+
+        if not missing.any():
+            mean = rows.mean(axis=0)
+            rows -= mean
+            return rows, None, mean
+
+        mask = (~missing).astype(np.float64)
+        rows[missing] = 0.0
+        counts = mask.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = rows.sum(axis=0) / counts
+
+        rows -= np.where(counts > 0, mean, 0.0)
+        rows[missing] = 0.0
+        return rows, mask, mean
+
+
+def _block_cov(x, x_mask, y, y_mask):
+    """
+    Covariances between the columns of two blocks of shifted returns,
+    using the rows where both returns are valid. Covariances are
+    invariant to the shifts, which only serve numerical accuracy.
+    """
+    cross = np.dot(x.T, y)
+
+    if x_mask is None and y_mask is None:
+        # Shifted by the exact means, so the sums of the columns vanish
+        return cross / (x.shape[0] - 1)
+
+    if x_mask is None:
+        x_mask = np.ones_like(x)
+    if y_mask is None:
+        y_mask = np.ones_like(y)
+
+    counts = np.dot(x_mask.T, y_mask)
+    x_sums = np.dot(x.T, y_mask)
+    y_sums = np.dot(x_mask.T, y)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = (cross - x_sums * y_sums / counts) / (counts - 1)
+
+    cov[counts < 2] = np.nan
+    return cov
+
+
+def _load_index(labels):
+    """Restores the date labels saved by ReturnsStore.create()."""
+    if not labels['is_datetime']:
+        return pd.Index(labels['index'])
+
+    index = pd.DatetimeIndex(labels['index'])
+    if labels['index_tz'] is not None:
+        index = index.tz_localize(labels['index_tz'])
+
+    return index
@@ -0,0 +1,215 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2015 Christian Zielinski
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""Synthetic market data for tests and benchmarks.
+
+Returns are generated by a factor model
+
+    returns = exp_rets + factor_returns * loadings^T + specific_returns
+
+whose parameters are drawn from a numpy.random.Generator. The same seed
+gives the same model in synthetic_returns() and synthetic_moments(),
+so the latter are the population moments of the former. They are
+computed without generating any returns."""
+
+import numpy as np
+import pandas as pd
+
+from .covariance import FactorCovariance
+
+
+__all__ = ['synthetic_returns',
+           'synthetic_moments',
+           'create_test_data']
+
+
+def synthetic_returns(num_assets=5, num_days=100, num_factors=3, tail_dof=None,
+                      missing_rate=0.0, dtype=np.float64, seed=None):
+    """
+    Creates synthetic daily asset returns from a random factor model.
+
+    Parameters
+    ----------
+    num_assets: int, optional
+        Number of assets.
+    num_days: int, optional
+        Number of days.
+    num_factors: int, optional
+        Number of factors, zero for uncorrelated assets.
+    tail_dof: float, optional
+        If given, factor and specific returns follow Student's t
+        distributions with this number of degrees of freedom (> 2)
+        and unchanged variances, i.e. returns have fat tails.
+        Normal distributions otherwise.
+    missing_rate: float, optional
+        Fraction of returns which are randomly set to NaN.
+    dtype: numpy.dtype, optional
+        Data type of the returns, numpy.float64 or numpy.float32.
+    seed: int or numpy.random.Generator, optional
+        Seed of the random number generator.
+
+    Returns
+    -------
+    returns: pandas.DataFrame
+        Asset returns with dates as index and assets as columns.
+    """
+    if tail_dof is not None and tail_dof <= 2.0:
+        raise ValueError("Degrees of freedom are not larger than two")
+
+    if not 0.0 <= missing_rate < 1.0:
+        raise ValueError("Missing rate is not between 0 and 1")
+
+    rng = np.random.default_rng(seed)
+    exp_rets, loadings, factor_vol, specific_vol = _draw_model(
+        rng, num_assets, num_factors, dtype)
+
+    factor_rets = _draw_shocks(rng, (num_days, num_factors), tail_dof, dtype) * factor_vol
+    values = _draw_shocks(rng, (num_days, num_assets), tail_dof, dtype)
+    values *= specific_vol
+    values += np.dot(factor_rets, loadings.T)
+    values += exp_rets
+
+    if missing_rate > 0.0:
+        values[rng.random((num_days, num_assets)) < missing_rate] = np.nan
+
+    dates = pd.date_range('1/1/2000', periods=num_days, freq='D', tz='UTC')
+    return pd.DataFrame(values, index=dates, columns=_asset_names(num_assets))
+
+
+def synthetic_moments(num_assets=5, num_factors=3, factor_model=False,
+                      dtype=np.float64, seed=None):
+    """
+    Creates the covariance matrix and the expected returns of the
+    factor model of synthetic_returns() with the same seed, without
+    generating any returns.
+
+    Parameters
+    ----------
+    num_assets: int, optional
+        Number of assets.
+    num_factors: int, optional
+        Number of factors, zero for uncorrelated assets.
+    factor_model: bool, optional
+        If 'True' return the covariance matrix as FactorCovariance,
+        which needs O(num_assets * num_factors) instead of
+        O(num_assets^2) memory.
+    dtype: numpy.dtype, optional
+        Data type of the moments, numpy.float64 or numpy.float32.
+    seed: int or numpy.random.Generator, optional
+        Seed of the random number generator.
+
+    Returns
+    -------
+    cov_mat: pandas.DataFrame or FactorCovariance
+        Covariance matrix of asset returns.
+    exp_rets: pandas.Series
+        Expected asset returns.
+    """
+    rng = np.random.default_rng(seed)
+    exp_rets, loadings, factor_vol, specific_vol = _draw_model(
+        rng, num_assets, num_factors, dtype)
+
+    assets = _asset_names(num_assets)
+    factors = ['factor_{}'.format(i) for i in range(num_factors)]
+    exp_rets = pd.Series(exp_rets, index=assets)
+
+    if factor_model:
+        cov_mat = FactorCovariance(pd.DataFrame(loadings, index=assets, columns=factors),
+                                   pd.DataFrame(np.diag(factor_vol**2), index=factors,
+                                                columns=factors),
+                                   pd.Series(specific_vol**2, index=assets))
+        return cov_mat, exp_rets
+
+    scaled = loadings * factor_vol
+    values = np.dot(scaled, scaled.T)
+    values[np.diag_indices(num_assets)] += specific_vol**2
+
+    return pd.DataFrame(values, index=assets, columns=assets), exp_rets
+
+
+def create_test_data(my_seed=42, num_days=100):
+    """
+    Creates some test returns data together with
+    its covariance matrix and average returns.
+    
+    Parameters
+    ----------
+    my_seed: integer, optional
+        Seed of NumPy's global random number generator.
+    num_days: integer, optional
+        Number of days.
+
+    Returns
+    -------
+    returns: pandas.DataFrame
+        Test returns.
+    cov_mat: pandas.DataFrame
+        Test covariance matrix.
+    avg_rets: pandas.Series
+        Test average returns.
+    """
+    np.random.seed(my_seed)
+
+    data = np.random.normal(loc=0.001, scale=0.05, size=(num_days, 5))
+    dates = pd.date_range('1/1/2000', periods=num_days, freq='D', tz='UTC')
+    assets = ['asset_a', 'asset_b', 'asset_c', 'asset_d', 'asset_e']
+
+    returns = pd.DataFrame(data, columns=assets, index=dates)
+    avg_rets = returns.mean()
+    cov_mat = returns.cov()
+
+    return returns, cov_mat, avg_rets
+
+
+def _draw_model(rng, num_assets, num_factors, dtype):
+    """
+    Draws expected returns, factor loadings, factor volatilities and
+    specific volatilities of a daily factor model. The first factor is
+    a market factor to which all assets are positively exposed.
+    """
+    exp_rets = rng.normal(5e-4, 5e-4, size=num_assets).astype(dtype)
+
+    loadings = rng.normal(0.0, 0.5, size=(num_assets, num_factors)).astype(dtype)
+    if num_factors:
+        loadings[:, 0] += 1.0
+
+    factor_vol = rng.uniform(0.005, 0.015, size=num_factors).astype(dtype)
+    specific_vol = rng.uniform(0.01, 0.03, size=num_assets).astype(dtype)
+
+    return exp_rets, loadings, factor_vol, specific_vol
+
+
+def _draw_shocks(rng, size, tail_dof, dtype):
+    """
+    Draws random variables with zero mean and unit variance.
+    """
+    if tail_dof is None:
+        return rng.standard_normal(size, dtype=dtype)
+
+    shocks = rng.standard_t(tail_dof, size=size).astype(dtype, copy=False)
+    shocks *= np.sqrt((tail_dof - 2.0) / tail_dof)
+    return shocks
+
+
+def _asset_names(num_assets):
+    return ['asset_{}'.format(i) for i in range(num_assets)]
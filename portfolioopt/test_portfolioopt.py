@@ -31,49 +31,93 @@ portfolios) in Python. The construction of long-only, long/short and
 market neutral portfolios is supported."""
 
 import unittest
+import asyncio
+import threading
+import time
+import warnings
 import sys
+import os
+import subprocess
+import shutil
+import tempfile
+import json
+import base64
+import socket
+import http.client
+
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import pandas as pd
+import cvxopt as opt
+import cvxopt.solvers as optsolvers
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
 
 import portfolioopt as pfopt
+from portfolioopt.synthetic import create_test_data
 
 
 __all__ = ['create_test_data']
 
 
-def create_test_data(my_seed=42, num_days=100):
-    """
-    Creates some test returns data together with
-    its covariance matrix and average returns.
-    
-    Parameters
-    ----------
-    my_seed: integer, optional
-        Covariance matrix of asset returns.
-    num_days: integer, optional
-        Expected asset returns (often historical returns).
-
-    Returns
-    -------
-    returns: pandas.DataFrame
-        Test returns.
-    cov_mat: pandas.DataFrame
-        Test covariance matrix.
-    avg_rets: pandas.Series
-        Test average returns.
-    """
-    np.random.seed(my_seed)
-
-    data = np.random.normal(loc=0.001, scale=0.05, size=(num_days, 5))
-    dates = pd.date_range('1/1/2000', periods=num_days, freq='D', tz='UTC')
-    assets = ['asset_a', 'asset_b', 'asset_c', 'asset_d', 'asset_e']
-
-    returns = pd.DataFrame(data, columns=assets, index=dates)
-    avg_rets = returns.mean()
-    cov_mat = returns.cov()
-
-    return returns, cov_mat, avg_rets
+# Tight solver tolerances for reference solutions of warm-started solves
+ACCURATE_OPTIONS = {'abstol': 1e-15, 'reltol': 1e-12, 'feastol': 1e-12}
+
+
+class TestLazyImport(unittest.TestCase):
+    def test_import(self):
+        script = ("import sys, portfolioopt\n"
+                  "print(sorted(name for name in ['numpy', 'pandas', 'cvxopt', 'unittest']\n"
+                  "             if name in sys.modules))\n"
+                  "portfolioopt.min_var_portfolio\n"
+                  "print('pandas' in sys.modules and 'cvxopt' in sys.modules)")
+
+        output = subprocess.check_output([sys.executable, '-c', script],
+                                         cwd=os.path.dirname(os.path.dirname(pfopt.__file__)))
+
+        self.assertEqual(output.decode().split(), ['[]', 'True'])
+
+    def test_names(self):
+        for name in pfopt.__all__:
+            self.assertTrue(hasattr(pfopt, name))
+
+        self.assertRaises(AttributeError, getattr, pfopt, 'unknown')
+
+
+class TestSyntheticData(unittest.TestCase):
+    def test_returns(self):
+        returns = pfopt.synthetic_returns(num_assets=8, num_days=50, seed=1)
+
+        self.assertEqual(returns.shape, (50, 8))
+        self.assertTrue(returns.equals(pfopt.synthetic_returns(num_assets=8, num_days=50, seed=1)))
+        self.assertFalse(returns.equals(pfopt.synthetic_returns(num_assets=8, num_days=50, seed=2)))
+
+        returns = pfopt.synthetic_returns(num_assets=8, num_days=500, tail_dof=4.0,
+                                          missing_rate=0.2, dtype=np.float32, seed=1)
+
+        self.assertTrue((returns.dtypes == np.float32).all())
+        self.assertTrue(0.15 < returns.isnull().values.mean() < 0.25)
+
+    def test_moments(self):
+        cov_mat, avg_rets = pfopt.synthetic_moments(num_assets=6, num_factors=2, seed=3)
+        returns = pfopt.synthetic_returns(num_assets=6, num_days=100000, num_factors=2, seed=3)
+
+        self.assertTrue(np.allclose(returns.cov().values, cov_mat.values, atol=2e-5))
+        self.assertTrue(np.allclose(returns.mean().values, avg_rets.values, atol=2e-4))
+
+        factor_cov_mat, factor_avg_rets = pfopt.synthetic_moments(
+            num_assets=6, num_factors=2, factor_model=True, seed=3)
+
+        self.assertTrue(np.allclose(factor_cov_mat.to_frame().values, cov_mat.values))
+        self.assertTrue(factor_avg_rets.equals(avg_rets))
+
+    def test_invalid_input(self):
+        self.assertRaises(ValueError, pfopt.synthetic_returns, tail_dof=2.0)
+        self.assertRaises(ValueError, pfopt.synthetic_returns, missing_rate=1.0)
 
 
 class TestMarkowitzPortfolio(unittest.TestCase):
@@ -93,8 +137,8 @@ class TestMarkowitzPortfolio(unittest.TestCase):
 
         calc_weights = pfopt.markowitz_portfolio(cov_mat, avg_rets, target_ret,
                                                  allow_short=True).values
-        exp_weights = [0.24132125485063094, 0.28750580615601806, -0.0065950973956575331,
-                       0.36542391192949747, 0.11234412445951109]
+        exp_weights = [0.2413217069956286, 0.2875049926734763, -0.006593861254760543,
+                       0.36542257478202855, 0.112344586803627]
 
         self.assertTrue(np.allclose(calc_weights, exp_weights))
 
@@ -111,6 +155,16 @@ class TestMarkowitzPortfolio(unittest.TestCase):
         self.assertTrue(np.isclose(calc_weights.sum(), 0.0))
         self.assertTrue(np.allclose(calc_weights, exp_weights))
 
+    def test_inactive_target(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        target_ret = avg_rets.min()
+
+        calc_weights = pfopt.markowitz_portfolio(cov_mat, avg_rets, target_ret,
+                                                 allow_short=True).values
+        exp_weights = pfopt.min_var_portfolio(cov_mat, allow_short=True).values
+
+        self.assertTrue(np.allclose(calc_weights, exp_weights, atol=1e-5))
+
 
 class TestMinVarPortfolio(unittest.TestCase):
     def test_long_only(self):
@@ -152,6 +206,1231 @@ class TestTangencyPortfolio(unittest.TestCase):
         self.assertTrue(np.allclose(calc_weights, exp_weights))
 
 
+class TestPortfolioProblem(unittest.TestCase):
+    def test_solve(self):
+        returns, cov_mat, avg_rets = create_test_data()
+
+        for allow_short in [False, True]:
+            problem = pfopt.PortfolioProblem(cov_mat, avg_rets, allow_short=allow_short)
+
+            for quantile in [0.5, 0.7, 0.9]:
+                target_ret = avg_rets.quantile(quantile)
+
+                calc_weights = problem.solve(target_ret).values
+                exp_weights = pfopt.markowitz_portfolio(cov_mat, avg_rets, target_ret,
+                                                        allow_short=allow_short).values
+
+                self.assertTrue(np.allclose(calc_weights, exp_weights))
+
+    def test_min_var_tangency(self):
+        returns, cov_mat, avg_rets = create_test_data()
+
+        for allow_short in [False, True]:
+            problem = pfopt.PortfolioProblem(cov_mat, avg_rets, allow_short=allow_short)
+
+            self.assertTrue(np.allclose(problem.min_var().values,
+                                        pfopt.min_var_portfolio(cov_mat, allow_short).values))
+            self.assertTrue(np.allclose(problem.tangency().values,
+                                        pfopt.tangency_portfolio(cov_mat, avg_rets,
+                                                                 allow_short).values))
+
+    def test_missing_exp_rets(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        problem = pfopt.PortfolioProblem(cov_mat)
+
+        self.assertRaises(ValueError, problem.solve, avg_rets.mean())
+        self.assertRaises(ValueError, problem.tangency)
+
+
+class TestWarmStart(unittest.TestCase):
+    def test_return_initvals(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        target_ret = avg_rets.quantile(0.7)
+
+        weights, initvals = pfopt.markowitz_portfolio(cov_mat, avg_rets, target_ret,
+                                                      return_initvals=True)
+
+        self.assertEqual(sorted(initvals.keys()), ['s', 'x', 'y', 'z'])
+        self.assertTrue(np.allclose(initvals['x'], weights.values))
+        self.assertEqual(len(initvals['s']), len(cov_mat) + 1)
+
+    def test_warm_start(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        target_ret = avg_rets.quantile(0.7)
+
+        weights, initvals = pfopt.markowitz_portfolio(cov_mat, avg_rets, target_ret,
+                                                      return_initvals=True)
+
+        # Re-solve a slightly perturbed problem starting from the previous solution
+        returns, cov_mat, avg_rets = create_test_data(num_days=101)
+        exp_weights = pfopt.markowitz_portfolio(cov_mat, avg_rets, target_ret)
+        calc_weights = pfopt.markowitz_portfolio(cov_mat, avg_rets, target_ret,
+                                                 initvals=initvals)
+
+        self.assertTrue(np.allclose(calc_weights.values, exp_weights.values, atol=1e-3))
+
+    def test_degenerate_initvals(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        target_ret = avg_rets.quantile(0.7)
+
+        weights, initvals = pfopt.markowitz_portfolio(cov_mat, avg_rets, target_ret,
+                                                      return_initvals=True)
+
+        # Slacks and multipliers on the boundary, as for an active constraint
+        initvals['s'][1:] = 0.0
+        initvals['z'][1:] = 0.0
+
+        calc_weights = pfopt.markowitz_portfolio(cov_mat, avg_rets, target_ret,
+                                                 initvals=initvals)
+        exp_weights = pfopt.markowitz_portfolio(cov_mat, avg_rets, target_ret,
+                                                solver_options=ACCURATE_OPTIONS)
+        self.assertTrue(np.allclose(calc_weights.values, exp_weights.values, atol=1e-3))
+
+    def test_partial_initvals(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        target_ret = avg_rets.quantile(0.7)
+
+        weights, initvals = pfopt.markowitz_portfolio(cov_mat, avg_rets, target_ret,
+                                                      return_initvals=True)
+        del initvals['x']
+
+        calc_weights = pfopt.markowitz_portfolio(cov_mat, avg_rets, target_ret,
+                                                 initvals=initvals)
+        exp_weights = pfopt.markowitz_portfolio(cov_mat, avg_rets, target_ret,
+                                                solver_options=ACCURATE_OPTIONS)
+        self.assertTrue(np.allclose(calc_weights.values, exp_weights.values, atol=1e-3))
+
+    def test_initial_weights(self):
+        returns, cov_mat, avg_rets = create_test_data()
+
+        # Weights of a previous universe are aligned to the current one
+        prev_weights = pd.Series([0.5, 0.5], index=['asset_b', 'asset_z'])
+
+        calc_weights = pfopt.min_var_portfolio(cov_mat, initvals=prev_weights).values
+        exp_weights = pfopt.min_var_portfolio(cov_mat).values
+
+        self.assertTrue(np.allclose(calc_weights, exp_weights, atol=1e-3))
+
+    def test_dimension_mismatch(self):
+        returns, cov_mat, avg_rets = create_test_data()
+
+        self.assertRaises(ValueError, pfopt.min_var_portfolio, cov_mat,
+                          initvals={'x': np.ones(3)})
+        self.assertRaises(ValueError, pfopt.min_var_portfolio, cov_mat,
+                          initvals={'w': np.ones(5)})
+
+
+class TestCore(unittest.TestCase):
+    def test_wrappers(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        target_ret = avg_rets.quantile(0.7)
+
+        for allow_short in [False, True]:
+            calc_weights = pfopt.core.markowitz_portfolio(cov_mat.values, avg_rets.values,
+                                                          target_ret, allow_short=allow_short)
+            exp_weights = pfopt.markowitz_portfolio(cov_mat, avg_rets, target_ret,
+                                                    allow_short=allow_short)
+            self.assertIsInstance(calc_weights, np.ndarray)
+            self.assertTrue(np.allclose(calc_weights, exp_weights.values))
+
+            calc_weights = pfopt.core.min_var_portfolio(cov_mat.values, allow_short=allow_short)
+            exp_weights = pfopt.min_var_portfolio(cov_mat, allow_short=allow_short)
+            self.assertTrue(np.allclose(calc_weights, exp_weights.values))
+
+            calc_weights = pfopt.core.tangency_portfolio(cov_mat.values, avg_rets.values,
+                                                         allow_short=allow_short)
+            exp_weights = pfopt.tangency_portfolio(cov_mat, avg_rets, allow_short=allow_short)
+            self.assertTrue(np.allclose(calc_weights, exp_weights.values))
+
+    def test_warm_start(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        problem = pfopt.core.PortfolioProblem(cov_mat.values, avg_rets.values)
+
+        weights, initvals = problem.solve(avg_rets.quantile(0.6), return_initvals=True)
+        calc_weights = problem.solve(avg_rets.quantile(0.7), initvals=initvals)
+        exp_weights = pfopt.core.markowitz_portfolio(cov_mat.values, avg_rets.values,
+                                                     avg_rets.quantile(0.7),
+                                                     solver_options=ACCURATE_OPTIONS)
+
+        self.assertTrue(np.allclose(calc_weights, exp_weights, atol=1e-3))
+
+    def test_infeasible_target(self):
+        returns, cov_mat, avg_rets = create_test_data()
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', RuntimeWarning)
+            with self.assertRaises(ValueError):
+                pfopt.core.markowitz_portfolio(cov_mat.values, avg_rets.values,
+                                               avg_rets.max() + 1e-3)
+
+    def test_sparse_constraints(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        target_ret = avg_rets.quantile(0.7)
+        n = len(cov_mat)
+        problem = pfopt.core.PortfolioProblem(cov_mat.values, avg_rets.values,
+                                              solver_options=ACCURATE_OPTIONS)
+
+        G_ret = problem._build_G_ret()
+        G_bounds = problem._build_G_bounds()
+        self.assertIsInstance(G_ret, opt.spmatrix)
+        self.assertIsInstance(G_bounds, opt.spmatrix)
+
+        G_dense = np.vstack((-avg_rets.values, -np.identity(n)))
+        self.assertTrue(np.array_equal(np.array(opt.matrix(G_ret)), G_dense))
+        self.assertTrue(np.array_equal(np.array(opt.matrix(G_bounds)), G_dense[1:]))
+
+        # Same weights as with dense constraint matrices
+        P = opt.matrix(cov_mat.values)
+        q = opt.matrix(0.0, (n, 1))
+        A = opt.matrix(1.0, (1, n))
+        b = opt.matrix(1.0)
+        h = opt.matrix(np.concatenate(([-target_ret], np.zeros(n))))
+
+        exp_weights = optsolvers.qp(P, q, opt.matrix(G_dense), h, A, b,
+                                    options=dict(ACCURATE_OPTIONS, show_progress=False))['x']
+        self.assertTrue(np.allclose(problem.solve(target_ret), np.array(exp_weights).ravel(),
+                                    atol=1e-6))
+
+        exp_weights = optsolvers.qp(P, q, opt.matrix(G_dense[1:]), h[1:], A, b,
+                                    options=dict(ACCURATE_OPTIONS, show_progress=False))['x']
+        self.assertTrue(np.allclose(problem.min_var(), np.array(exp_weights).ravel(),
+                                    atol=1e-6))
+
+    def test_kkt_solver(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        factor_cov_mat, factor_avg_rets = pfopt.synthetic_moments(20, factor_model=True, seed=0)
+        options = {'show_progress': False}
+
+        cases = [(cov_mat.values, avg_rets.values, False),
+                 (cov_mat.values, avg_rets.values, True),
+                 (factor_cov_mat, factor_avg_rets.values, False),
+                 (factor_cov_mat, factor_avg_rets.values, True)]
+
+        for cov, mu, allow_short in cases:
+            problem = pfopt.core.PortfolioProblem(cov, mu, allow_short=allow_short)
+            dense_cov = cov.to_frame().values if hasattr(cov, 'to_frame') else cov
+            n = len(mu)
+
+            P = opt.matrix(dense_cov)
+            q = opt.matrix(0.0, (n, 1))
+            A = opt.matrix(1.0, (1, n))
+            b = opt.matrix(1.0)
+
+            # Markowitz (and for long-only portfolios minimum variance) constraints
+            constraints = [(True, np.vstack((-mu, -np.identity(n))),
+                            np.concatenate(([-np.median(mu)], np.zeros(n))))]
+            if allow_short:
+                constraints = [(True, -mu[None, :], np.array([-np.median(mu)]))]
+            else:
+                constraints.append((False, -np.identity(n), np.zeros(n)))
+
+            for has_ret, G, h in constraints:
+                G, h = opt.matrix(G), opt.matrix(h)
+                kktsolver = problem._kktsolver(not allow_short, has_ret, True)
+
+                calc_sol = optsolvers.qp(P, q, G, h, A, b, kktsolver=kktsolver, options=options)
+                exp_sol = optsolvers.qp(P, q, G, h, A, b, options=options)
+
+                # Up to rounding the same iterates as the default KKT solver
+                self.assertEqual(calc_sol['status'], 'optimal')
+                self.assertEqual(calc_sol['iterations'], exp_sol['iterations'])
+                for key in ['x', 'y', 'z']:
+                    self.assertTrue(np.allclose(calc_sol[key], exp_sol[key], atol=1e-8))
+
+    def test_dimension_mismatch(self):
+        returns, cov_mat, avg_rets = create_test_data()
+
+        self.assertRaises(ValueError, pfopt.core.PortfolioProblem, cov_mat.values[:, :3])
+        self.assertRaises(ValueError, pfopt.core.PortfolioProblem,
+                          cov_mat.values, avg_rets.values[:3])
+
+
+class TestSolverOptions(unittest.TestCase):
+    def test_per_call_options(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        target_ret = avg_rets.quantile(0.7)
+
+        global_options = dict(optsolvers.options)
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            pfopt.markowitz_portfolio(cov_mat, avg_rets, target_ret,
+                                      solver_options={'maxiters': 1})
+
+        self.assertTrue(any("Convergence problem" in str(w.message) for w in caught))
+        self.assertEqual(dict(optsolvers.options), global_options)
+
+    def test_tolerances(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        target_ret = avg_rets.quantile(0.7)
+
+        options = {'abstol': 1e-12, 'reltol': 1e-12, 'feastol': 1e-12}
+        calc_weights = pfopt.markowitz_portfolio(cov_mat, avg_rets, target_ret,
+                                                 solver_options=options).values
+        exp_weights = pfopt.CriticalLineAlgorithm(cov_mat, avg_rets).weights(target_ret).values
+
+        self.assertTrue(np.allclose(calc_weights, exp_weights, atol=1e-6))
+
+    def test_thread_pool(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        target_rets = np.linspace(avg_rets.quantile(0.3), avg_rets.quantile(0.9), 16)
+
+        def solve(target_ret):
+            return pfopt.markowitz_portfolio(cov_mat, avg_rets, target_ret).values
+
+        exp_weights = [solve(target_ret) for target_ret in target_rets]
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            calc_weights = list(executor.map(solve, target_rets))
+
+        self.assertTrue(np.allclose(calc_weights, exp_weights))
+
+
+class TestSolveResult(unittest.TestCase):
+    def test_qp(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        target_ret = avg_rets.quantile(0.7)
+
+        for solver in ['cvxopt', 'active_set']:
+            weights, initvals, result = pfopt.markowitz_portfolio(
+                cov_mat, avg_rets, target_ret, return_initvals=True,
+                return_result=True, solver=solver)
+
+            self.assertIsInstance(weights, pd.Series)
+            self.assertIn('z', initvals)
+            self.assertIsInstance(result, pfopt.SolveResult)
+            self.assertEqual(result.status, 'optimal')
+            self.assertEqual(result.method, solver)
+            self.assertTrue(result.iterations > 0)
+            self.assertTrue(abs(result.gap) < 1e-6)
+            self.assertTrue(result.primal_infeasibility < 1e-6)
+            self.assertTrue(min(result.setup_time, result.solve_time, result.post_time) >= 0.0)
+            self.assertAlmostEqual(result.total_time, result.setup_time +
+                                   result.solve_time + result.post_time)
+
+    def test_closed_form(self):
+        returns, cov_mat, avg_rets = create_test_data()
+
+        weights, result = pfopt.min_var_portfolio(cov_mat, allow_short=True,
+                                                  return_result=True)
+
+        self.assertIsInstance(weights, pd.Series)
+        self.assertEqual(result.status, 'optimal')
+        self.assertEqual(result.method, 'closed_form')
+        self.assertEqual(result.iterations, 0)
+
+    def test_convergence_problem(self):
+        returns, cov_mat, avg_rets = create_test_data()
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            weights, result = pfopt.core.tangency_portfolio(
+                cov_mat.values, avg_rets.values, return_result=True,
+                solver_options={'maxiters': 1})
+
+        self.assertNotEqual(result.status, 'optimal')
+        self.assertEqual(result.iterations, 1)
+
+
+class TestSolverBackends(unittest.TestCase):
+    def test_available(self):
+        self.assertIn('cvxopt', pfopt.available_solvers())
+        self.assertIn('active_set', pfopt.available_solvers())
+
+    def test_active_set(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        target_ret = avg_rets.quantile(0.7)
+
+        for solver in ['active_set', 'auto']:
+            calc_weights = pfopt.markowitz_portfolio(cov_mat, avg_rets, target_ret,
+                                                     solver=solver).values
+            exp_weights = pfopt.CriticalLineAlgorithm(cov_mat, avg_rets).weights(target_ret).values
+            self.assertTrue(np.allclose(calc_weights, exp_weights, atol=1e-6))
+
+            calc_weights = pfopt.min_var_portfolio(cov_mat, solver=solver).values
+            exp_weights = pfopt.min_var_portfolio(cov_mat).values
+            self.assertTrue(np.allclose(calc_weights, exp_weights, atol=1e-4))
+
+            calc_weights = pfopt.tangency_portfolio(cov_mat, avg_rets, solver=solver).values
+            exp_weights = pfopt.tangency_portfolio(cov_mat, avg_rets).values
+            self.assertTrue(np.allclose(calc_weights, exp_weights, atol=1e-4))
+
+    def test_inactive_target(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        target_ret = avg_rets.min()
+
+        calc_weights = pfopt.markowitz_portfolio(cov_mat, avg_rets, target_ret,
+                                                 allow_short=True, solver='active_set').values
+        exp_weights = pfopt.min_var_portfolio(cov_mat, allow_short=True).values
+
+        self.assertTrue(np.allclose(calc_weights, exp_weights, atol=1e-8))
+
+    def test_singular_covariance(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        returns = returns.iloc[:3]
+        cov_mat, avg_rets = returns.cov(), returns.mean()
+        target_ret = avg_rets.quantile(0.7)
+
+        for solver in ['active_set', 'cvxopt', 'auto']:
+            with self.assertRaises(ValueError):
+                pfopt.markowitz_portfolio(cov_mat, avg_rets, target_ret,
+                                          allow_short=True, solver=solver)
+
+    def test_infeasible_target(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        target_ret = avg_rets.max() + 1e-6
+
+        for solver in ['active_set', 'auto']:
+            with self.assertRaises(ValueError):
+                pfopt.markowitz_portfolio(cov_mat, avg_rets, target_ret, solver=solver)
+
+        # The maximum return up to rounding is attainable
+        target_ret = avg_rets.max() * (1 + 1e-15)
+        exp_weights = pfopt.markowitz_portfolio(cov_mat, avg_rets, target_ret).values
+        for solver in ['active_set', 'auto']:
+            calc_weights = pfopt.markowitz_portfolio(cov_mat, avg_rets, target_ret,
+                                                     solver=solver).values
+            self.assertTrue(np.allclose(calc_weights, exp_weights, atol=1e-6))
+
+    def test_register_solver(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        calls = []
+
+        def solve(problem, constraints, initvals):
+            calls.append(constraints)
+            return problem._solve_cvxopt(constraints, initvals)
+
+        pfopt.register_solver('test_solver', solve)
+        pfopt.min_var_portfolio(cov_mat, solver='test_solver')
+
+        self.assertIn('test_solver', pfopt.available_solvers())
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(calls[0].long_only)
+
+    def test_unknown_solver(self):
+        returns, cov_mat, avg_rets = create_test_data()
+
+        with self.assertRaises(ValueError):
+            pfopt.min_var_portfolio(cov_mat, solver='unknown')
+
+
+class TestFactorCovariance(unittest.TestCase):
+    def create_factor_model(self):
+        returns, cov_mat, avg_rets = create_test_data()
+
+        # Two factor model fitted to the test returns
+        np.random.seed(7)
+        factors = ['factor_a', 'factor_b']
+        loadings = pd.DataFrame(np.random.normal(loc=1.0, scale=0.5, size=(5, 2)),
+                                index=cov_mat.index, columns=factors)
+        factor_cov = pd.DataFrame([[4e-4, 1e-4], [1e-4, 2e-4]],
+                                  index=factors, columns=factors)
+        specific_var = pd.Series(np.diag(cov_mat.values), index=cov_mat.index)
+
+        return pfopt.FactorCovariance(loadings, factor_cov, specific_var), avg_rets
+
+    def test_dense_equivalence(self):
+        factor_cov, avg_rets = self.create_factor_model()
+        dense_cov = factor_cov.to_frame()
+
+        x = np.arange(5.0)
+        self.assertTrue(np.allclose(factor_cov.dot(x), np.dot(dense_cov.values, x)))
+        self.assertTrue(np.allclose(factor_cov.solve(x), np.linalg.solve(dense_cov.values, x)))
+
+    def test_optimizers(self):
+        factor_cov, avg_rets = self.create_factor_model()
+        dense_cov = factor_cov.to_frame()
+        target_ret = avg_rets.quantile(0.7)
+
+        for allow_short in [False, True]:
+            self.assertTrue(np.allclose(pfopt.min_var_portfolio(factor_cov, allow_short),
+                                        pfopt.min_var_portfolio(dense_cov, allow_short)))
+            self.assertTrue(np.allclose(pfopt.tangency_portfolio(factor_cov, avg_rets,
+                                                                 allow_short),
+                                        pfopt.tangency_portfolio(dense_cov, avg_rets,
+                                                                 allow_short)))
+
+            for market_neutral in set([False, allow_short]):
+                calc_weights = pfopt.markowitz_portfolio(factor_cov, avg_rets, target_ret,
+                                                         allow_short, market_neutral)
+                exp_weights = pfopt.markowitz_portfolio(dense_cov, avg_rets, target_ret,
+                                                        allow_short, market_neutral)
+
+                self.assertTrue(np.allclose(calc_weights, exp_weights))
+
+    def test_inactive_target(self):
+        factor_cov, avg_rets = self.create_factor_model()
+        target_ret = avg_rets.min()
+
+        calc_weights = pfopt.markowitz_portfolio(factor_cov, avg_rets, target_ret,
+                                                 allow_short=True)
+        exp_weights = pfopt.min_var_portfolio(factor_cov, allow_short=True)
+
+        self.assertTrue(np.allclose(calc_weights, exp_weights, atol=1e-5))
+
+    def test_invalid_specific_var(self):
+        factor_cov, avg_rets = self.create_factor_model()
+        specific_var = factor_cov.specific_var.copy()
+        specific_var.iloc[0] = 0.0
+
+        self.assertRaises(ValueError, pfopt.FactorCovariance, factor_cov.loadings,
+                          factor_cov.factor_cov, specific_var)
+
+
+class TestEWMACovariance(unittest.TestCase):
+    def test_pandas_equivalence(self):
+        returns, cov_mat, avg_rets = create_test_data(num_days=200)
+        ewm = returns.ewm(alpha=0.1, adjust=False)
+        exp_cov_mat = ewm.cov(bias=True).loc[returns.index[-1]]
+        exp_avg_rets = ewm.mean().iloc[-1]
+
+        by_row = pfopt.EWMACovariance(returns.columns, decay=0.9)
+        for date in returns.index:
+            by_row.update(returns.loc[date])
+
+        by_chunk = pfopt.EWMACovariance(returns.columns, decay=0.9)
+        by_chunk.update(returns.iloc[:70]).update(returns.iloc[70]).update(returns.values[71:])
+
+        for estimator in [by_row, by_chunk]:
+            self.assertEqual(estimator.count, 200)
+            self.assertTrue(np.allclose(estimator.cov_mat, exp_cov_mat, rtol=1e-10, atol=0))
+            self.assertTrue(np.allclose(estimator.exp_rets, exp_avg_rets, rtol=1e-10, atol=0))
+
+    def test_views(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        estimator = pfopt.EWMACovariance(returns.columns).update(returns.iloc[:50])
+
+        ewma_cov_mat = estimator.cov_mat
+        snapshot = ewma_cov_mat.copy()
+        estimator.update(returns.iloc[50:])
+
+        self.assertFalse(np.allclose(ewma_cov_mat, snapshot))
+        self.assertTrue(ewma_cov_mat is estimator.cov_mat)
+
+        weights = pfopt.markowitz_portfolio(estimator.cov_mat, estimator.exp_rets,
+                                            estimator.exp_rets.quantile(0.7))
+        self.assertAlmostEqual(weights.sum(), 1.0)
+
+    def test_invalid_input(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        estimator = pfopt.EWMACovariance(returns.columns)
+
+        self.assertRaises(ValueError, lambda: estimator.cov_mat)
+        self.assertRaises(ValueError, estimator.update, returns.iloc[:, :3])
+        self.assertRaises(ValueError, estimator.update, returns.iloc[0, ::-1])
+        self.assertRaises(ValueError, pfopt.EWMACovariance, returns.columns, 1.0)
+
+
+class TestLedoitWolf(unittest.TestCase):
+    def test_shrinkage(self):
+        returns, cov_mat, avg_rets = create_test_data()
+
+        # Direct computation of the estimator from the centered returns
+        X = returns.values - returns.values.mean(axis=0)
+        T, n = X.shape
+        S = np.dot(X.T, X) / T
+        mu = np.trace(S) / n
+        delta = ((S - mu * np.identity(n))**2).sum() / n
+        beta = sum(((np.outer(x, x) - S)**2).sum() for x in X) / (n * T**2)
+        exp_shrinkage = min(beta, delta) / delta
+        exp_cov_mat = (1 - exp_shrinkage) * S + exp_shrinkage * mu * np.identity(n)
+
+        for block_size in [None, 7]:
+            calc_cov_mat, calc_shrinkage = pfopt.ledoit_wolf(returns, block_size=block_size)
+
+            self.assertAlmostEqual(calc_shrinkage, exp_shrinkage)
+            self.assertTrue(np.allclose(calc_cov_mat.values, exp_cov_mat))
+            self.assertTrue(calc_cov_mat.index.equals(returns.columns))
+
+    def test_more_assets_than_observations(self):
+        np.random.seed(42)
+        returns = pd.DataFrame(np.random.normal(0.001, 0.05, size=(20, 50)))
+
+        cov_mat, shrinkage = pfopt.ledoit_wolf(returns)
+
+        self.assertTrue(0.0 < shrinkage <= 1.0)
+        self.assertTrue(np.linalg.eigvalsh(cov_mat.values).min() > 0.0)
+
+        weights, result = pfopt.min_var_portfolio(cov_mat, return_result=True)
+        self.assertEqual(result.status, 'optimal')
+
+    def test_invalid_input(self):
+        returns, cov_mat, avg_rets = create_test_data()
+
+        self.assertRaises(ValueError, pfopt.ledoit_wolf, returns.values)
+        self.assertRaises(ValueError, pfopt.ledoit_wolf, returns.iloc[:1])
+        self.assertRaises(ValueError, pfopt.ledoit_wolf, returns * 0.0)
+
+
+class TestReturnsStore(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_moments(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        store = pfopt.ReturnsStore.from_frame(self.path, returns)
+        store.flush()
+
+        store = pfopt.ReturnsStore(self.path)
+        self.assertTrue(store.index.equals(returns.index))
+        self.assertTrue(store.columns.equals(returns.columns))
+
+        for block_size in [None, 3]:
+            calc_cov_mat, calc_avg_rets = store.moments(block_size=block_size)
+
+            self.assertTrue(np.allclose(calc_cov_mat.values, returns.cov().values))
+            self.assertTrue(np.allclose(calc_avg_rets.values, returns.mean().values))
+
+        weights = pfopt.min_var_portfolio(calc_cov_mat)
+        exp_weights = pfopt.min_var_portfolio(returns.cov())
+        self.assertTrue(np.allclose(weights.values, exp_weights.values, atol=1e-5))
+
+    def test_missing_values(self):
+        returns = pfopt.synthetic_returns(num_assets=11, num_days=60,
+                                          missing_rate=0.1, seed=1)
+        store = pfopt.ReturnsStore.create(self.path, returns.index, returns.columns)
+
+        # Written asset by asset, in random order
+        for asset in np.random.RandomState(0).permutation(returns.columns):
+            store.write(returns[asset])
+
+        calc_cov_mat, calc_avg_rets = store.moments(block_size=4)
+
+        self.assertTrue(np.allclose(calc_cov_mat.values, returns.cov().values))
+        self.assertTrue(np.allclose(calc_avg_rets.values, returns.mean().values))
+
+    def test_invalid_input(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        store = pfopt.ReturnsStore.create(self.path, returns.index, returns.columns)
+
+        self.assertRaises(ValueError, store.write, returns.iloc[1:])
+        self.assertRaises(ValueError, store.write, returns.add_suffix('x'))
+        self.assertRaises(ValueError, pfopt.ReturnsStore, self.path, 'w')
+        self.assertRaises(ValueError, pfopt.ReturnsStore.create, self.path,
+                          returns.index, ['a', 'a'])
+
+
+@unittest.skipIf(pa is None, "pyarrow is not installed")
+class TestArrowReaders(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_read_returns(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        filename = os.path.join(self.path, 'returns.parquet')
+        returns.to_parquet(filename)
+
+        self.assertTrue(pfopt.read_returns(filename).equals(returns))
+        self.assertTrue(pfopt.read_returns(pa.Table.from_pandas(returns)).equals(returns))
+
+        assets = ['asset_d', 'asset_a']
+        calc_returns = pfopt.read_returns(filename, assets=assets)
+        self.assertTrue(calc_returns.equals(returns[assets]))
+
+    def test_range_index(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        returns = returns.reset_index(drop=True).iloc[5:25]
+        filename = os.path.join(self.path, 'returns.parquet')
+        returns.to_parquet(filename)
+
+        # Stored as metadata rather than as a column
+        for source in [filename, pa.Table.from_pandas(returns)]:
+            calc_returns = pfopt.read_returns(source)
+            self.assertTrue(calc_returns.index.equals(pd.RangeIndex(5, 25)))
+            self.assertTrue(calc_returns.equals(returns))
+
+    def test_read_covariance(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        filename = os.path.join(self.path, 'cov_mat.parquet')
+        cov_mat.to_parquet(filename)
+
+        assets = ['asset_e', 'asset_b', 'asset_c']
+        calc_cov_mat = pfopt.read_covariance(filename, assets=assets)
+
+        self.assertTrue(calc_cov_mat.equals(cov_mat.loc[assets, assets]))
+        self.assertTrue(calc_cov_mat.values.flags['C_CONTIGUOUS'])
+
+        weights = pfopt.min_var_portfolio(calc_cov_mat)
+        exp_weights = pfopt.min_var_portfolio(cov_mat.loc[assets, assets])
+        self.assertTrue(np.allclose(weights.values, exp_weights.values))
+
+    def test_invalid_input(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        table = pa.Table.from_pandas(cov_mat)
+
+        self.assertRaises(ValueError, pfopt.read_returns, table, assets=['asset_x'])
+        self.assertRaises(ValueError, pfopt.read_returns, table, index_column='dates')
+        self.assertRaises(ValueError, pfopt.read_covariance,
+                          pa.Table.from_pandas(cov_mat, preserve_index=False))
+        self.assertRaises(ValueError, pfopt.read_covariance,
+                          pa.Table.from_pandas(cov_mat.iloc[1:]))
+
+
+class TestFloat32(unittest.TestCase):
+    def test_portfolios(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        cov_mat32 = cov_mat.astype(np.float32)
+
+        # Same solution as for the promoted matrix, for every solver path
+        for allow_short in [False, True]:
+            for solver in ['cvxopt', 'active_set']:
+                weights = pfopt.markowitz_portfolio(cov_mat32, avg_rets, 0.002,
+                                                    allow_short=allow_short, solver=solver)
+                exp_weights = pfopt.markowitz_portfolio(cov_mat32.astype(float), avg_rets, 0.002,
+                                                        allow_short=allow_short, solver=solver)
+                self.assertTrue(np.allclose(weights.values, exp_weights.values))
+
+            weights = pfopt.min_var_portfolio(cov_mat32, allow_short=allow_short)
+            exp_weights = pfopt.min_var_portfolio(cov_mat, allow_short=allow_short)
+            self.assertTrue(np.allclose(weights.values, exp_weights.values, atol=1e-5))
+
+    def test_no_copy(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        cov_mat32 = cov_mat.astype(np.float32)
+
+        problem = pfopt.PortfolioProblem(cov_mat32, avg_rets)
+        self.assertEqual(problem._problem.cov_mat.dtype, np.float32)
+        self.assertTrue(np.shares_memory(problem._problem.cov_mat, cov_mat32.values))
+
+    def test_estimators(self):
+        returns, cov_mat, avg_rets = create_test_data()
+
+        cov_mat64, shrinkage64 = pfopt.ledoit_wolf(returns)
+        cov_mat32, shrinkage32 = pfopt.ledoit_wolf(returns, dtype=np.float32)
+        self.assertEqual(cov_mat32.values.dtype, np.float32)
+        self.assertAlmostEqual(shrinkage32, shrinkage64, places=5)
+        self.assertTrue(np.allclose(cov_mat32.values, cov_mat64.values, rtol=1e-5, atol=0.0))
+
+        ewma64 = pfopt.EWMACovariance(returns.columns).update(returns)
+        ewma32 = pfopt.EWMACovariance(returns.columns, dtype=np.float32)
+        for date, row in returns.iloc[:10].iterrows():
+            ewma32.update(row)
+        ewma32.update(returns.iloc[10:])
+        self.assertEqual(ewma32.cov_mat.values.dtype, np.float32)
+        self.assertTrue(np.allclose(ewma32.cov_mat.values, ewma64.cov_mat.values,
+                                    rtol=1e-5, atol=0.0))
+
+
+class TestEfficientFrontier(unittest.TestCase):
+    def test_long_only(self):
+        returns, cov_mat, avg_rets = create_test_data()
+
+        weights, risks, rets = pfopt.efficient_frontier(cov_mat, avg_rets, 10)
+
+        self.assertEqual(weights.shape, (10, 5))
+        self.assertTrue((np.diff(risks) > 0).all())
+        self.assertTrue(np.isclose(rets[-1], avg_rets.max()))
+        self.assertTrue((weights.values > -1e-6).all())
+
+        exp_weights = pfopt.markowitz_portfolio(cov_mat, avg_rets, rets[5]).values
+        self.assertTrue(np.allclose(weights.values[5], exp_weights, atol=1e-4))
+
+    def test_max_ret_endpoint(self):
+        cov_mat, avg_rets = pfopt.synthetic_moments(200, factor_model=True, seed=0)
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            weights, risks, rets = pfopt.core.efficient_frontier(cov_mat, avg_rets.values, 5)
+
+        # All weight in the maximum return asset, without a degenerate QP
+        exp_weights = np.zeros(200)
+        exp_weights[np.argmax(avg_rets.values)] = 1.0
+        self.assertTrue(np.array_equal(weights[-1], exp_weights))
+        self.assertEqual(rets[-1], avg_rets.max())
+        self.assertFalse(caught)
+
+        # Several maximum return assets are mixed for minimum variance
+        cov_mat = np.diag([0.04, 0.01, 0.02])
+        weights, risks, rets = pfopt.core.efficient_frontier(cov_mat, np.array([0.1, 0.1, 0.05]), 3)
+        self.assertTrue(np.allclose(weights[-1], [0.2, 0.8, 0.0], atol=1e-6))
+
+        # Long/short portfolios of equal returns are all the minimum variance portfolio
+        cov_mat = np.array([[0.04, 0.018, 0.0], [0.018, 0.01, 0.0], [0.0, 0.0, 0.02]])
+        weights, risks, rets = pfopt.core.efficient_frontier(cov_mat, np.full(3, 0.05), 3,
+                                                             allow_short=True)
+        exp_weights = pfopt.core.min_var_portfolio(cov_mat, allow_short=True)
+        self.assertTrue(np.allclose(weights, exp_weights, atol=1e-6))
+        self.assertTrue(np.allclose(weights[-1], [-0.449, 1.236, 0.214], atol=1e-3))
+
+    def test_allow_short(self):
+        returns, cov_mat, avg_rets = create_test_data()
+
+        weights, risks, rets = pfopt.efficient_frontier(cov_mat, avg_rets, 10,
+                                                        allow_short=True)
+
+        exp_weights = pfopt.min_var_portfolio(cov_mat, allow_short=True).values
+        self.assertTrue(np.allclose(weights.values[0], exp_weights))
+
+        for i in [3, 9]:
+            exp_weights = pfopt.markowitz_portfolio(cov_mat, avg_rets, rets[i],
+                                                    allow_short=True).values
+            self.assertTrue(np.allclose(weights.values[i], exp_weights))
+
+        exp_risks = np.sqrt(np.diag(np.dot(np.dot(weights.values, cov_mat.values),
+                                           weights.values.T)))
+        self.assertTrue(np.allclose(risks, exp_risks))
+
+
+class TestCriticalLineAlgorithm(unittest.TestCase):
+    def test_turning_points(self):
+        returns, cov_mat, avg_rets = create_test_data()
+
+        cla = pfopt.CriticalLineAlgorithm(cov_mat, avg_rets)
+
+        # From the maximum return to the minimum variance portfolio
+        self.assertTrue(np.allclose(cla.turning_points.values[0],
+                                    pfopt.max_ret_portfolio(avg_rets.copy()).values))
+        self.assertTrue(np.allclose(cla.turning_points.values[-1],
+                                    pfopt.min_var_portfolio(cov_mat).values, atol=1e-5))
+
+        self.assertTrue((np.diff(cla.rets) < 0).all())
+        self.assertTrue((cla.turning_points.values >= 0).all())
+        self.assertTrue(np.allclose(cla.turning_points.sum(axis=1), 1.0))
+
+    def test_weights(self):
+        returns, cov_mat, avg_rets = create_test_data()
+
+        cla = pfopt.CriticalLineAlgorithm(cov_mat, avg_rets)
+
+        for quantile in [0.3, 0.7, 0.9]:
+            target_ret = avg_rets.quantile(quantile)
+
+            calc_weights = cla.weights(target_ret).values
+            exp_weights = pfopt.markowitz_portfolio(cov_mat, avg_rets, target_ret).values
+
+            self.assertTrue(np.allclose(calc_weights, exp_weights, atol=2e-3))
+            self.assertTrue(np.dot(calc_weights, np.dot(cov_mat.values, calc_weights)) <=
+                            np.dot(exp_weights, np.dot(cov_mat.values, exp_weights)))
+
+        self.assertRaises(ValueError, cla.weights, avg_rets.max() + 0.01)
+
+    def test_tied_returns(self):
+        cov_mat = pd.DataFrame(np.diag([0.04, 0.01, 0.02]))
+        avg_rets = pd.Series([0.1, 0.1, 0.05])
+
+        # The maximum return portfolio is the minimum variance mix of the tied assets
+        cla = pfopt.CriticalLineAlgorithm(cov_mat, avg_rets)
+        self.assertTrue(np.allclose(cla.turning_points.values[0], [0.2, 0.8, 0.0]))
+        self.assertTrue(np.allclose(cla.weights(0.1).values, [0.2, 0.8, 0.0]))
+
+        # A mix with a negative unconstrained weight is long-only
+        cov_mat = pd.DataFrame([[0.04, 0.027, 0.0], [0.027, 0.02, 0.0], [0.0, 0.0, 0.03]])
+        cla = pfopt.CriticalLineAlgorithm(cov_mat, avg_rets)
+        self.assertTrue(np.allclose(cla.turning_points.values[0], [0.0, 1.0, 0.0]))
+        self.assertTrue(np.allclose(cla.turning_points.values[-1],
+                                    pfopt.min_var_portfolio(cov_mat).values, atol=1e-5))
+
+    def test_frontier(self):
+        returns, cov_mat, avg_rets = create_test_data()
+
+        weights, risks, rets = pfopt.efficient_frontier(cov_mat, avg_rets, 10, method='cla')
+
+        self.assertEqual(weights.shape, (10, 5))
+        self.assertTrue(np.isclose(rets[-1], avg_rets.max()))
+        self.assertTrue((np.diff(risks) > 0).all())
+
+        for i in range(10):
+            exp_weights = pfopt.markowitz_portfolio(cov_mat, avg_rets, rets[i]).values
+            exp_risk = np.sqrt(np.dot(exp_weights, np.dot(cov_mat.values, exp_weights)))
+            self.assertTrue(risks[i] <= exp_risk + 1e-8)
+
+
+class TestBatchPortfolios(unittest.TestCase):
+    def create_batch(self):
+        cov_mats, avg_rets = [], []
+        for seed in range(6):
+            returns, cov_mat, rets = create_test_data(my_seed=seed)
+            cov_mats.append(cov_mat)
+            avg_rets.append(rets)
+
+        return cov_mats, avg_rets
+
+    def test_markowitz(self):
+        cov_mats, avg_rets = self.create_batch()
+        target_rets = [rets.quantile(0.7) for rets in avg_rets]
+
+        for processes in [1, 2]:
+            weights, status = pfopt.batch_portfolios(cov_mats, avg_rets, 'markowitz',
+                                                     target_rets, processes=processes)
+
+            self.assertEqual(weights.shape, (6, 5))
+            self.assertTrue((status == 'optimal').all())
+
+            for i in range(6):
+                exp_weights = pfopt.markowitz_portfolio(cov_mats[i], avg_rets[i],
+                                                        target_rets[i]).values
+                self.assertTrue(np.allclose(weights[i], exp_weights))
+
+    def test_min_var_stacked(self):
+        cov_mats, avg_rets = self.create_batch()
+        stacked = np.array([cov_mat.values for cov_mat in cov_mats])
+
+        weights, status = pfopt.batch_portfolios(stacked, kind='min_var', allow_short=True,
+                                                 processes=2, chunksize=1)
+
+        for i in range(6):
+            exp_weights = pfopt.min_var_portfolio(cov_mats[i], allow_short=True).values
+            self.assertTrue(np.allclose(weights[i], exp_weights))
+
+    def test_failed_problem(self):
+        cov_mats, avg_rets = self.create_batch()
+        cov_mats[2] = cov_mats[2] * np.nan
+
+        weights, status = pfopt.batch_portfolios(cov_mats, avg_rets, 'tangency',
+                                                 processes=1)
+
+        self.assertEqual(status[2], 'failed')
+        self.assertTrue(np.isnan(weights[2]).all())
+        self.assertTrue((status[[0, 1, 3, 4, 5]] == 'optimal').all())
+
+    def test_unknown_status(self):
+        cov_mats, avg_rets = self.create_batch()
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            weights, status = pfopt.batch_portfolios(cov_mats, kind='min_var', processes=1,
+                                                     solver_options={'maxiters': 1})
+
+        # The status comes from the solver result, warnings reach the caller
+        self.assertTrue((status == 'unknown').all())
+        self.assertEqual(sum("Convergence problem" in str(w.message) for w in caught),
+                         len(cov_mats))
+
+
+class TestSweepPortfolios(unittest.TestCase):
+    def test_sweep(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        target_rets = np.linspace(avg_rets.min(), avg_rets.max(), 6)
+        settings = [(False, False), (True, False), (True, True)]
+
+        for processes in [1, 2]:
+            weights, status = pfopt.sweep_portfolios(cov_mat, avg_rets, target_rets, settings,
+                                                     processes=processes, chunksize=2)
+
+            self.assertEqual(weights.shape, (3, 6, 5))
+            self.assertTrue((status == 'optimal').all())
+
+            for i, (allow_short, market_neutral) in enumerate(settings):
+                for j, target_ret in enumerate(target_rets):
+                    exp_weights = pfopt.markowitz_portfolio(cov_mat, avg_rets, float(target_ret),
+                                                            allow_short=allow_short,
+                                                            market_neutral=market_neutral)
+                    self.assertTrue(np.allclose(weights[i, j], exp_weights.values, atol=1e-4))
+
+    def test_unattainable_target(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        target_rets = [avg_rets.mean(), 2.0 * avg_rets.max(), avg_rets.mean()]
+
+        weights, status = pfopt.sweep_portfolios(cov_mat, avg_rets, target_rets, processes=1)
+
+        self.assertEqual(list(status[0, [0, 2]]), ['optimal', 'optimal'])
+        self.assertNotEqual(status[0, 1], 'optimal')
+        self.assertTrue(np.allclose(weights[0, 0], weights[0, 2], atol=1e-4))
+
+    def test_invalid_input(self):
+        returns, cov_mat, avg_rets = create_test_data()
+
+        self.assertRaises(ValueError, pfopt.sweep_portfolios, cov_mat.iloc[1:], avg_rets, [0.0])
+        self.assertRaises(ValueError, pfopt.sweep_portfolios, cov_mat, avg_rets[1:], [0.0])
+        self.assertRaises(ValueError, pfopt.sweep_portfolios, cov_mat, avg_rets, [[0.0]])
+
+
+class TestAsyncOptimizer(unittest.TestCase):
+    def test_portfolios(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        target_rets = [avg_rets.quantile(q) for q in [0.3, 0.5, 0.7]]
+
+        async def solve():
+            async with pfopt.AsyncOptimizer(max_concurrency=2) as optimizer:
+                return await asyncio.gather(
+                    optimizer.min_var_portfolio(cov_mat),
+                    optimizer.tangency_portfolio(cov_mat, avg_rets, allow_short=True),
+                    *[optimizer.markowitz_portfolio(cov_mat, avg_rets, target_ret)
+                      for target_ret in target_rets])
+
+        results = asyncio.run(solve())
+
+        self.assertTrue(np.allclose(results[0], pfopt.min_var_portfolio(cov_mat)))
+        self.assertTrue(np.allclose(results[1], pfopt.tangency_portfolio(cov_mat, avg_rets,
+                                                                         allow_short=True)))
+        for target_ret, weights in zip(target_rets, results[2:]):
+            exp_weights = pfopt.markowitz_portfolio(cov_mat, avg_rets, target_ret)
+            self.assertTrue(np.allclose(weights, exp_weights))
+
+    def test_concurrency_limit(self):
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def work():
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+
+        async def run():
+            async with pfopt.AsyncOptimizer(max_concurrency=2) as optimizer:
+                await asyncio.gather(*[optimizer.run(work) for _ in range(8)])
+
+        asyncio.run(run())
+        self.assertEqual(running[1], 2)
+
+    def test_event_loops(self):
+        # Created outside of an event loop and used by two loops in turn
+        optimizer = pfopt.AsyncOptimizer(max_concurrency=1)
+
+        async def run():
+            return await asyncio.gather(*[optimizer.run(time.sleep, 0.01) for _ in range(3)])
+
+        try:
+            for _ in range(2):
+                self.assertEqual(asyncio.run(run()), [None] * 3)
+        finally:
+            optimizer.close()
+
+    def test_timeout_and_cancellation(self):
+        started = []
+
+        async def run():
+            async with pfopt.AsyncOptimizer(max_concurrency=1) as optimizer:
+                with self.assertRaises(asyncio.TimeoutError):
+                    await optimizer.run(time.sleep, 0.2, timeout=0.01)
+
+                # Waits for the slot of the running solve, then is cancelled
+                task = asyncio.ensure_future(optimizer.run(started.append, True))
+                await asyncio.sleep(0.01)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+
+                await asyncio.sleep(0.3)
+                return await optimizer.run(started.append, False)
+
+        asyncio.run(run())
+        self.assertEqual(started, [False])
+
+
+class TestOptimizationServer(unittest.TestCase):
+    def request(self, connection, method, path, payload=None):
+        body = json.dumps(payload) if payload is not None else None
+        connection.request(method, path, body)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+
+    def serve(self, client, **kwargs):
+        """Runs client(address) in a thread while the server is running."""
+        async def run():
+            server = pfopt.OptimizationServer()
+            address = await server.start(**kwargs)
+            try:
+                return await asyncio.get_running_loop().run_in_executor(None, client, address)
+            finally:
+                await server.close()
+
+        return asyncio.run(run())
+
+    def test_http(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        target_ret = avg_rets.quantile(0.7)
+
+        def client(address):
+            connection = http.client.HTTPConnection(*address)
+            status, response = self.request(connection, 'POST', '/problems',
+                                            {'cov_mat': cov_mat.values.tolist(),
+                                             'exp_rets': avg_rets.values.tolist()})
+            self.assertEqual(status, 200)
+            problem = response['problem']
+
+            status, response = self.request(connection, 'POST', '/solve',
+                                            {'problem': problem, 'target_ret': target_ret})
+            self.assertEqual((status, response['status']), (200, 'optimal'))
+            exp_weights = pfopt.markowitz_portfolio(cov_mat, avg_rets, target_ret)
+            self.assertTrue(np.allclose(response['weights'], exp_weights.values))
+
+            # Inline float32 matrix in the binary encoding
+            values = cov_mat.values.astype('<f4')
+            encoded = {'dtype': '<f4', 'shape': list(values.shape),
+                       'data': base64.b64encode(values.tobytes()).decode('ascii')}
+            status, response = self.request(connection, 'POST', '/solve',
+                                             {'cov_mat': encoded, 'kind': 'min_var'})
+            self.assertEqual((status, response['status']), (200, 'optimal'))
+            exp_weights = pfopt.min_var_portfolio(cov_mat)
+            self.assertTrue(np.allclose(response['weights'], exp_weights.values, atol=1e-5))
+
+            self.assertEqual(self.request(connection, 'POST', '/solve', {'problem': 'x'})[0], 400)
+            self.assertEqual(self.request(connection, 'POST', '/solve',
+                                          {'problem': 'x', 'kind': 'min_var'})[0], 404)
+            self.assertEqual(self.request(connection, 'GET', '/solve')[0], 405)
+            self.assertEqual(self.request(connection, 'GET', '/stats')[1]['requests'], 4)
+            connection.close()
+
+        self.serve(client, port=0)
+
+    def test_invalid_content_length(self):
+        def client(address):
+            statuses = []
+            for header in [b'', b'Content-Length: x\r\n', b'Content-Length: -1\r\n']:
+                with socket.create_connection(address) as sock:
+                    sock.sendall(b'POST /solve HTTP/1.1\r\n' + header + b'\r\n')
+                    statuses.append(sock.makefile('rb').readline().split()[1])
+            return statuses
+
+        self.assertEqual(self.serve(client, port=0), [b'400'] * 3)
+
+    def test_close_and_eviction(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        server = pfopt.OptimizationServer(max_problems=1, coalesce_delay=60.0)
+
+        async def solve():
+            try:
+                # The problem is evicted before its batch is solved
+                problem = server.register(cov_mat.values)
+                evicted = asyncio.ensure_future(server.solve({'problem': problem,
+                                                              'kind': 'min_var'}))
+                await asyncio.sleep(0)
+                problem = server.register(2.0 * cov_mat.values)
+
+                # Pending batches are solved on close
+                pending = asyncio.ensure_future(server.solve({'problem': problem,
+                                                              'kind': 'min_var'}))
+                await asyncio.sleep(0)
+            finally:
+                await server.close()
+
+            with self.assertRaises(ValueError):
+                await evicted
+            return await pending
+
+        response = asyncio.run(solve())
+
+        self.assertEqual(response['status'], 'optimal')
+        self.assertEqual(server.stats['batches'], 1)
+        self.assertEqual(server.stats['solves'], 1)
+
+    @unittest.skipIf(not hasattr(socket, 'AF_UNIX'), "Unix sockets are not supported")
+    def test_unix_socket(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        path = tempfile.mkdtemp()
+
+        class UnixConnection(http.client.HTTPConnection):
+            def connect(self):
+                self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self.sock.connect(self.host)
+
+        def client(address):
+            connection = UnixConnection(address)
+            try:
+                return self.request(connection, 'POST', '/solve',
+                                    {'cov_mat': cov_mat.values.tolist(), 'kind': 'min_var',
+                                     'allow_short': True})
+            finally:
+                connection.close()
+
+        try:
+            status, response = self.serve(client, path=os.path.join(path, 'server.sock'))
+        finally:
+            shutil.rmtree(path)
+
+        self.assertEqual(status, 200)
+        exp_weights = pfopt.min_var_portfolio(cov_mat, allow_short=True)
+        self.assertTrue(np.allclose(response['weights'], exp_weights.values))
+
+    def test_coalescing(self):
+        returns, cov_mat, avg_rets = create_test_data()
+        target_rets = [avg_rets.quantile(q) for q in [0.7, 0.3, 0.7, 0.5]]
+        server = pfopt.OptimizationServer()
+        problem = server.register(cov_mat.values, avg_rets.values)
+
+        async def solve():
+            try:
+                return await asyncio.gather(*[server.solve({'problem': problem,
+                                                            'target_ret': target_ret})
+                                              for target_ret in target_rets])
+            finally:
+                await server.close()
+
+        responses = asyncio.run(solve())
+
+        # One batch, identical requests are solved once
+        self.assertEqual(server.stats['batches'], 1)
+        self.assertEqual(server.stats['solves'], 3)
+
+        # Warm-started solves agree up to the solver tolerance
+        for target_ret, response in zip(target_rets, responses):
+            exp_weights = pfopt.markowitz_portfolio(cov_mat, avg_rets, target_ret,
+                                                    solver_options=ACCURATE_OPTIONS)
+            self.assertTrue(np.allclose(response['weights'], exp_weights.values, atol=1e-3))
+
+
+class TestWalkForward(unittest.TestCase):
+    def test_min_var(self):
+        returns, cov_mat, avg_rets = create_test_data(num_days=120)
+
+        for allow_short in [False, True]:
+            results = list(pfopt.walk_forward(returns, window=30, allow_short=allow_short))
+            self.assertEqual(len(results), 91)
+
+            for date, calc_weights in results[::10]:
+                window = returns.loc[:date].iloc[-30:]
+                exp_weights = pfopt.min_var_portfolio(window.cov(), allow_short=allow_short)
+                self.assertTrue(np.allclose(calc_weights.values, exp_weights.values, atol=1e-3))
+
+    def test_tangency_step(self):
+        returns, cov_mat, avg_rets = create_test_data(num_days=120)
+
+        results = list(pfopt.walk_forward(returns, window=30, kind='tangency',
+                                          allow_short=True, step=7))
+        self.assertEqual([date for date, weights in results], list(returns.index[29::7]))
+
+        for date, calc_weights in results:
+            window = returns.loc[:date].iloc[-30:]
+            exp_weights = pfopt.tangency_portfolio(window.cov(), window.mean(), allow_short=True)
+            self.assertTrue(np.allclose(calc_weights.values, exp_weights.values))
+
+    def test_daily_returns(self):
+        # Daily-scale variances are far below cvxopt's absolute tolerances
+        returns = pfopt.synthetic_returns(num_assets=40, num_days=300, seed=1)
+        target_ret = returns.mean().quantile(0.6)
+
+        results = list(pfopt.walk_forward(returns, window=250, kind='markowitz',
+                                          target_ret=target_ret, step=5))
+
+        # Compare the warm-started solves to accurate cold-started ones
+        for date, calc_weights in results[1:]:
+            window = returns.loc[:date].iloc[-250:]
+            exp_weights = pfopt.markowitz_portfolio(window.cov(), window.mean(), target_ret,
+                                                    solver_options=ACCURATE_OPTIONS)
+            self.assertTrue(np.allclose(calc_weights.values, exp_weights.values, atol=1e-3))
+
+    def test_unattainable_target(self):
+        returns, cov_mat, avg_rets = create_test_data(num_days=60)
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            results = list(pfopt.walk_forward(returns, window=30, kind='markowitz',
+                                              target_ret=1.0))
+
+        num_failed = sum(weights.isnull().all() for date, weights in results)
+        num_warned = sum("Convergence problem" in str(w.message) for w in caught)
+        self.assertEqual(num_failed + num_warned, len(results))
+
+    def test_invalid_input(self):
+        returns, cov_mat, avg_rets = create_test_data(num_days=60)
+
+        self.assertRaises(ValueError, list, pfopt.walk_forward(returns, window=61))
+        self.assertRaises(ValueError, list, pfopt.walk_forward(returns, kind='markowitz'))
+
+        returns.iloc[3, 2] = np.nan
+        self.assertRaises(ValueError, list, pfopt.walk_forward(returns, window=30))
+
+
 class TestMaxRetPortfolio(unittest.TestCase):
     def test_one_max(self):
         returns, cov_mat, avg_rets = create_test_data()
@@ -42,11 +42,15 @@ setup(
     download_url = 'https://github.com/czielinski/portfolioopt/tarball/master',
     test_suite = 'portfolioopt.test_portfolioopt.make_test_suite',
     license = 'MIT',
+    python_requires = '>=3.9',
     install_requires = [
         'numpy',
         'pandas',
         'cvxopt'
     ],
+    extras_require = {
+        'arrow': ['pyarrow']
+    },
     keywords = [
         'portfolio',
         'optimization',
@@ -59,6 +63,12 @@ setup(
         'License :: OSI Approved :: MIT License',
         'Operating System :: OS Independent',
         'Programming Language :: Python',
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3 :: Only',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
+        'Programming Language :: Python :: 3.12',
         'Topic :: Software Development :: Libraries :: Python Modules',
         'Topic :: Scientific/Engineering :: Mathematics'
     ],